@@ -14,6 +14,11 @@ config = context.config
 if config.config_file_name is not None:
     fileConfig(config.config_file_name)
 
+# Dùng cùng DATABASE_URL với app (.env) thay cho giá trị mẫu trong alembic.ini
+from app.core.config import get_settings
+
+config.set_main_option("sqlalchemy.url", get_settings().DATABASE_URL.replace("%", "%%"))
+
 # add your model's MetaData object here
 # for 'autogenerate' support
 # from myapp import mymodel
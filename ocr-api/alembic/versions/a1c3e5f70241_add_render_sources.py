@@ -0,0 +1,54 @@
+"""add render sources
+
+Lưu video gốc và audio TTS để mọi bản render dựng lại từ nguồn chưa encode lại.
+
+Revision ID: a1c3e5f70241
+Revises:
+Create Date: 2026-10-19 09:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a1c3e5f70241'
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+NEW_COLUMNS = {
+    "videos": [
+        sa.Column("source_url", sa.String(500), nullable=True),
+    ],
+    "video_tts": [
+        sa.Column("audio_url", sa.String(500), nullable=True),
+        sa.Column("voice", sa.String(100), nullable=True),
+        sa.Column("render_key", sa.String(64), nullable=True),
+    ],
+}
+
+
+def _existing_columns(table):
+    return {column["name"] for column in sa.inspect(op.get_bind()).get_columns(table)}
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # App tự create_all khi khởi động, nên database mới có thể đã có sẵn các cột này
+    for table, columns in NEW_COLUMNS.items():
+        existing = _existing_columns(table)
+        for column in columns:
+            if column.name not in existing:
+                op.add_column(table, column)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table, columns in NEW_COLUMNS.items():
+        existing = _existing_columns(table)
+        for column in columns:
+            if column.name in existing:
+                op.drop_column(table, column.name)
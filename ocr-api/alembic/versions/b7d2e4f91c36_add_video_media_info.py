@@ -0,0 +1,57 @@
+"""add video media info
+
+Thông tin media của bản gốc (ffprobe một lần lúc upload) lưu trên videos.
+
+Revision ID: b7d2e4f91c36
+Revises: a1c3e5f70241
+Create Date: 2026-10-19 15:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7d2e4f91c36'
+down_revision: Union[str, None] = 'a1c3e5f70241'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+NEW_COLUMNS = {
+    "videos": [
+        sa.Column("duration", sa.Float(), nullable=True),
+        sa.Column("fps", sa.String(20), nullable=True),
+        sa.Column("width", sa.Integer(), nullable=True),
+        sa.Column("height", sa.Integer(), nullable=True),
+        sa.Column("video_codec", sa.String(32), nullable=True),
+        sa.Column("audio_codec", sa.String(32), nullable=True),
+        sa.Column("keyframe_interval", sa.Float(), nullable=True),
+        sa.Column("file_size", sa.BigInteger(), nullable=True),
+        sa.Column("content_hash", sa.String(64), nullable=True),
+    ],
+}
+
+
+def _existing_columns(table):
+    return {column["name"] for column in sa.inspect(op.get_bind()).get_columns(table)}
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # App tự create_all khi khởi động, nên database mới có thể đã có sẵn các cột này
+    for table, columns in NEW_COLUMNS.items():
+        existing = _existing_columns(table)
+        for column in columns:
+            if column.name not in existing:
+                op.add_column(table, column)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table, columns in NEW_COLUMNS.items():
+        existing = _existing_columns(table)
+        for column in columns:
+            if column.name in existing:
+                op.drop_column(table, column.name)
@@ -0,0 +1,64 @@
+"""unique subtitle track language
+
+Mỗi video chỉ có một track phụ đề cho mỗi ngôn ngữ.
+
+Revision ID: c4e8a1d25b97
+Revises: b7d2e4f91c36
+Create Date: 2026-10-19 18:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4e8a1d25b97'
+down_revision: Union[str, None] = 'b7d2e4f91c36'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TABLE = "subtitle_track"
+CONSTRAINT = "uq_subtitle_track_video_language"
+
+
+def _has_constraint(bind):
+    return any(
+        constraint["name"] == CONSTRAINT
+        for constraint in sa.inspect(bind).get_unique_constraints(TABLE)
+    )
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    bind = op.get_bind()
+    # App tự create_all khi khởi động, nên database mới có thể đã có sẵn ràng buộc này
+    if not sa.inspect(bind).has_table(TABLE) or _has_constraint(bind):
+        return
+
+    # Xóa track trùng (video_id, language) do upsert đồng thời trước đây, giữ bản mới nhất
+    track = sa.table(
+        TABLE, sa.column("track_id"), sa.column("video_id"), sa.column("language"), sa.column("created_at")
+    )
+    rows = bind.execute(
+        sa.select(track.c.track_id, track.c.video_id, track.c.language)
+        .order_by(track.c.created_at.desc(), track.c.track_id.desc())
+    ).fetchall()
+    seen = set()
+    duplicates = []
+    for track_id, video_id, language in rows:
+        if (video_id, language) in seen:
+            duplicates.append(track_id)
+        seen.add((video_id, language))
+    if duplicates:
+        bind.execute(track.delete().where(track.c.track_id.in_(duplicates)))
+
+    op.create_unique_constraint(CONSTRAINT, TABLE, ["video_id", "language"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    bind = op.get_bind()
+    if sa.inspect(bind).has_table(TABLE) and _has_constraint(bind):
+        op.drop_constraint(CONSTRAINT, TABLE, type_="unique")
@@ -0,0 +1,49 @@
+"""add video tts srt
+
+Lưu bản SRT đã dùng khi tạo video TTS, để export dựng lại đúng phụ đề khớp với audio TTS.
+
+Revision ID: d5a7c3e9b180
+Revises: c4e8a1d25b97
+Create Date: 2026-10-19 20:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd5a7c3e9b180'
+down_revision: Union[str, None] = 'c4e8a1d25b97'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+NEW_COLUMNS = {
+    "video_tts": [
+        sa.Column("srt_url", sa.String(500), nullable=True),
+    ],
+}
+
+
+def _existing_columns(table):
+    return {column["name"] for column in sa.inspect(op.get_bind()).get_columns(table)}
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # App tự create_all khi khởi động, nên database mới có thể đã có sẵn các cột này
+    for table, columns in NEW_COLUMNS.items():
+        existing = _existing_columns(table)
+        for column in columns:
+            if column.name not in existing:
+                op.add_column(table, column)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table, columns in NEW_COLUMNS.items():
+        existing = _existing_columns(table)
+        for column in columns:
+            if column.name in existing:
+                op.drop_column(table, column.name)
@@ -3,7 +3,9 @@ from fastapi.middleware.cors import CORSMiddleware
 from app.api.v1 import api_router
 from app.core.config import get_settings
 from contextlib import asynccontextmanager
+import asyncio
 from app.modules.video_process import ocr as global_ocr
+from app.core.workspace import run_workspace_janitor
 
 settings = get_settings()
 
@@ -12,9 +14,12 @@ async def lifespan(app: FastAPI):
     # Load the ML model and other resources
     print("Application startup: Initializing resources...")
     # Nothing specific to do for OCR object on startup beyond its global initialization
+    # Dọn định kỳ các workspace mồ côi của job (process chết giữa chừng)
+    janitor = asyncio.create_task(run_workspace_janitor())
     yield
     # Clean up the ML model and other resources
     print("Application shutdown: Cleaning up resources...")
+    janitor.cancel()
     try:
         del global_ocr
         print("Global OCR object deleted.")
@@ -1,34 +1,44 @@
-from fastapi import APIRouter, Depends, HTTPException, File, UploadFile, Request
-from fastapi.responses import JSONResponse, FileResponse, Response
+from fastapi import APIRouter, Depends, HTTPException, File, UploadFile, Request, Form
+from fastapi.responses import JSONResponse, FileResponse, Response, StreamingResponse
 from starlette.background import BackgroundTask
 from sqlalchemy.orm import Session
 from app.core.database import get_db
 from app.core.security import get_current_user
 from app.models.user import User
-from app.models.video import Video, SRT, VIDEO_TTS
+from app.models.video import Video, SRT, VIDEO_TTS, SubtitleTrack
 from app.schemas.video import (
     VideoUpdate, Video as VideoSchema, 
     SRTCreate, SRTUpdate, SRT as SRTSchema, 
-    VideoTTSCreate, VideoTTS as VideoTTSSchema
+    VideoTTSCreate, VideoTTS as VideoTTSSchema,
+    SubtitleTrackCreate
     )
 from app.service import video_service
 from app.core.config import get_settings
-from app.modules.video_process import extract_subtitles, translate_srt, compress_file
+from app.core.workspace import Workspace, WorkspaceQuotaExceeded
+from app.modules.video_process import extract_subtitles, translate_srt, normalize_file, INGEST_NORMALIZE
+from app.modules.module.module_subtitle_pipeline import run_subtitle_pipeline, translate_srt_to_languages, retranslate_srt_incremental
 from app.modules.module.module_meger_video_with_srt_translate import add_subtitles_to_video
-from app.modules.module.module_text_to_speech_v2 import generate_audio_from_srt
-from app.modules.module.module_process_with_video_sync import process_video_with_sync
-from app.modules.s3_process import upload_file_to_s3, download_file_from_s3, delete_file_from_s3, replace_file_on_s3, get_s3_client
-from app.modules.module.module_export_video import export_final_video
+from app.modules.module.module_ass import ASS_PRESETS
+from app.modules.module.module_soft_subtitles import SUBTITLE_DELIVERY, SUBTITLE_DELIVERY_MODES, mux_soft_subtitles, srt_to_vtt
+from app.modules.module.module_text_to_speech_v2 import generate_audio_from_srt, voice_for_choice
+from app.modules.module.module_ffmpeg_render import (
+    RenderPlan, execute_plan, execute_ladder, stream_plan, file_digest, EXPORT_PRESETS, EXPORT_DEFAULT_PRESET, EXPORT_LADDER
+)
+from app.modules.module.module_audio_assembler import probe_duration
+from app.modules.module.module_ffmpeg_runner import FFmpegError, run_ffmpeg
+from app.modules.module.module_media_probe import copy_with_digest, probe_media, render_source_info
+from app.modules.s3_process import upload_file_to_s3, download_file_from_s3, delete_file_from_s3, replace_file_on_s3, get_s3_client, s3_object_exists, presigned_url_for
 import boto3
 import os
 import shutil
 import asyncio
 import time
 from pathlib import Path
-import gc
+from typing import Optional
 from botocore.exceptions import ClientError
 import urllib.parse
 import uuid
+import re
 
 def safe_remove_file(file_path, max_retries=5, delay=0.5):
     """Xoa file an toan voi co che thu lai nhieu lan"""
@@ -45,6 +55,37 @@ def safe_remove_file(file_path, max_retries=5, delay=0.5):
             time.sleep(delay)
     return False
 
+def export_cache_key(video_tts_id: str, preset: str, render_key: Optional[str] = None) -> str:
+    """
+    Tên file (cũng là key S3) của bản export theo (video_tts_id, render_key, preset).
+    render_key (gồm bản gốc và SRT đã dùng) để bản export cũ dựng từ nguồn khác không bị dùng lại.
+    """
+    if render_key:
+        return f"export_{video_tts_id}_{render_key[:16]}_{preset}.mp4"
+    return f"export_{video_tts_id}_{preset}.mp4"
+
+
+def parse_target_languages(target_languages: str) -> list[str]:
+    """Tách danh sách ngôn ngữ đích dạng "vi,en,ja", giữ thứ tự và bỏ trùng."""
+    languages = []
+    for language in target_languages.split(","):
+        language = language.strip()
+        if not language:
+            continue
+        if not re.fullmatch(r"[a-z]{2,3}(-[A-Za-z]{2,4})?", language):
+            raise HTTPException(
+                status_code=400,
+                detail=f"Invalid target language: {language}"
+            )
+        if language not in languages:
+            languages.append(language)
+    if not languages:
+        raise HTTPException(
+            status_code=400,
+            detail="At least one target language is required"
+        )
+    return languages
+
 
 settings = get_settings()
 router = APIRouter()
@@ -63,6 +104,8 @@ s3_client_in_video_endpoint = boto3.client( # Renamed to avoid conflict if s3_pr
 @router.post("/upload", response_model=None)
 async def upload_video(
     video: UploadFile = File(...),
+    target_languages: str = Form("vi"),
+    subtitle_mode: str = Form(SUBTITLE_DELIVERY),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
@@ -71,6 +114,9 @@ async def upload_video(
     
     Args:
         video: The video file to upload
+        target_languages: Comma separated target languages (first one is burned into the video)
+        subtitle_mode: "burn" to burn the first language into the video, "soft" to attach
+            every SRT as a selectable mov_text track without re-encoding
         db: Database session
         current_user: Current authenticated user
         
@@ -87,9 +133,12 @@ async def upload_video(
             detail="Invalid file type. Only video files are allowed."
         )
 
-    # Create temp directories if they don't exist
-    os.makedirs("tempvideo", exist_ok=True)
-    os.makedirs("tempsrt", exist_ok=True)
+    languages = parse_target_languages(target_languages)
+    if subtitle_mode not in SUBTITLE_DELIVERY_MODES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid subtitle mode: {subtitle_mode}"
+        )
 
     # Generate unique filenames
     video_filename = os.path.splitext(video.filename)[0]
@@ -103,19 +152,48 @@ async def upload_video(
         unique_videoname = f"{count}_{video.filename}"
         count += 1
 
-    # Define paths
-    video_tmp = os.path.join("tempvideo", video.filename)
-    srt_path = os.path.join("tempsrt", unique_srtname)
-    translate_srt_path = os.path.join("tempsrt", translate_srtname)
+    # Define paths (mỗi request một workspace riêng)
+    workspace = Workspace("upload")
+    # Bản gốc được giữ nguyên trên S3, các bản render sau đều dựng lại từ bản này
+    source_tmp = workspace.file(f"source_{unique_videoname}")
+    # Phụ đề mềm (mov_text) chỉ có trong MP4 nên bản đó luôn mang đuôi .mp4, kể cả upload .mkv/.webm/.avi
+    video_tmp = workspace.file(
+        f"{os.path.splitext(video.filename)[0]}.mp4" if subtitle_mode == "soft" else video.filename
+    )
+    srt_path = workspace.file(unique_srtname)
+    translate_srt_path = workspace.file(translate_srtname)
+    # Ngôn ngữ đầu tiên là track chính (srt_url_sub), các ngôn ngữ khác có file riêng
+    translated_paths = {languages[0]: translate_srt_path}
+    for language in languages[1:]:
+        translated_paths[language] = workspace.file(f"{video_filename}_translate_{language}.srt")
 
     try:
-        # Save uploaded video
-        with open(video_tmp, "wb") as buffer:
-            shutil.copyfileobj(video.file, buffer)
-        # Extract and translate subtitles
+        # Save uploaded video (SHA-1 tính trong cùng lần ghi, không đọc lại file)
+        content_hash = await asyncio.to_thread(copy_with_digest, video.file, source_tmp)
+        workspace.check_quota()
+        # Probe bản gốc một lần; kết quả lưu vào Video để các bước sau không phải mở lại file
+        try:
+            media = await asyncio.to_thread(probe_media, source_tmp, content_hash)
+        except (FFmpegError, ValueError) as e:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Unreadable video file: {str(e)}"
+            )
+        # OCR chạy trên bản xử lý đã chuẩn hóa (INGEST_NORMALIZE) nếu có; burn-in/mux vẫn dùng bản gốc
+        processing_path = source_tmp
+        if INGEST_NORMALIZE:
+            mezzanine_tmp = workspace.file(f"mezzanine_{os.path.splitext(unique_videoname)[0]}.mp4")
+            if await asyncio.to_thread(normalize_file, source_tmp, mezzanine_tmp, duration=media["duration"]):
+                try:
+                    workspace.check_quota()
+                    processing_path = mezzanine_tmp
+                except WorkspaceQuotaExceeded as e:
+                    # Bản xử lý là tùy chọn: hết quota thì bỏ nó, OCR trên bản gốc
+                    print(f"Bỏ bản chuẩn hóa {mezzanine_tmp}: {e.detail}")
+                    safe_remove_file(mezzanine_tmp)
+        # Extract and translate subtitles (translation overlaps with OCR)
         try:
-            extract_subtitles(video_tmp, unique_srtname)
-            translate_srt(srt_path, translate_srt_path)
+            await run_subtitle_pipeline(processing_path, srt_path, translated_paths)
         except Exception as e:
             # Consider if this should be a more specific error or allow process to continue if translation fails
             # For now, let's assume subtitle processing failure is critical for this endpoint's success
@@ -125,14 +203,26 @@ async def upload_video(
                 detail=f"Failed to process subtitles: {str(e)}"
             )
 
-        # Add subtitles to video
-        # The add_subtitles_to_video function now handles its own temporary file for FFmpeg output
-        # and will move the result to video_tmp if successful.
-        add_subtitles_result = add_subtitles_to_video(
-            video_tmp,             # Original video path (input for adding subs)
-            translate_srt_path,    # Subtitle file path
-            video_tmp              # Final output path (in-place modification of video_tmp)
-        )
+        if subtitle_mode == "soft":
+            # Phụ đề mềm: các track ngôn ngữ + phụ đề gốc, stream copy (không encode lại video);
+            # burn-in chỉ khi export
+            soft_tracks = [(path, language, language) for language, path in translated_paths.items()]
+            soft_tracks.append((srt_path, "und", "original"))
+            await asyncio.to_thread(mux_soft_subtitles, source_tmp, soft_tracks, video_tmp)
+            add_subtitles_result = True
+        else:
+            # Add subtitles to video
+            # The add_subtitles_to_video function now handles its own temporary file for FFmpeg output
+            # and will move the result to video_tmp if successful.
+            # Encode/upload chạy ngoài event loop để không chặn pipeline và timer của broker dịch
+            # của các job khác
+            add_subtitles_result = await asyncio.to_thread(
+                add_subtitles_to_video,
+                source_tmp,            # Original video path (input for adding subs)
+                translate_srt_path,    # Subtitle file path
+                video_tmp,             # Final output path
+                source_info={key: media[key] for key in ("width", "height", "fps", "duration")}
+            )
 
         if not add_subtitles_result:
             # add_subtitles_to_video now prints detailed errors including FFmpeg stderr
@@ -150,22 +240,29 @@ async def upload_video(
                 detail=f"Processed video file {os.path.basename(video_tmp)} not found or is empty."
             )
 
-        # Upload translated video to S3
-        video_url = upload_file_to_s3(video_tmp, settings.AWS_BUCKET_INPUT_VIDEO)
+        # Upload translated video and the untouched source to S3
+        video_url, source_url = await asyncio.gather(
+            asyncio.to_thread(upload_file_to_s3, video_tmp, settings.AWS_BUCKET_INPUT_VIDEO),
+            asyncio.to_thread(upload_file_to_s3, source_tmp, settings.AWS_BUCKET_INPUT_VIDEO),
+        )
         # No need to check for not video_url, as upload_file_to_s3 will raise exceptions
 
         # Save video to database
         db_video = video_service.create_video(
             db,
-            VideoUpdate(file_name=unique_videoname, file_url=video_url),
+            VideoUpdate(file_name=unique_videoname, file_url=video_url, source_url=source_url, **media),
             current_user.user_id
         )
 
         # Save SRT files to database
-        srt_original_url = upload_file_to_s3(srt_path, settings.AWS_BUCKET_INPUT_SRT)
-        srt_translated_url = upload_file_to_s3(translate_srt_path, settings.AWS_BUCKET_INPUT_SRT)
+        srt_original_url, *uploaded_tracks = await asyncio.gather(
+            asyncio.to_thread(upload_file_to_s3, srt_path, settings.AWS_BUCKET_INPUT_SRT),
+            *[asyncio.to_thread(upload_file_to_s3, path, settings.AWS_BUCKET_INPUT_SRT) for path in translated_paths.values()]
+        )
+        track_urls = dict(zip(translated_paths, uploaded_tracks))
+        srt_translated_url = track_urls[languages[0]]
 
-        video_service.create_srt(
+        db_srt = video_service.create_srt(
             db, 
             SRTCreate(
                 srt_name=unique_srtname, 
@@ -174,13 +271,26 @@ async def upload_video(
                 video_id=db_video.video_id
             )
         )
+        for language, track_url in track_urls.items():
+            video_service.upsert_subtitle_track(
+                db,
+                SubtitleTrackCreate(
+                    language=language,
+                    srt_url=track_url,
+                    srt_id=db_srt.srt_id,
+                    video_id=db_video.video_id
+                )
+            )
 
         return JSONResponse(
             status_code=201,
             content={
                 "message": "Video uploaded successfully",
                 "video_id": db_video.video_id,
-                "filename": unique_videoname
+                "filename": unique_videoname,
+                "languages": languages,
+                "subtitle_mode": subtitle_mode,
+                "duration": media["duration"]
             }
         )
     except PermissionError as s3_perm_error: # Catch specific S3 permission errors
@@ -203,18 +313,13 @@ async def upload_video(
             detail=f"An unexpected error occurred during video upload: {str(e)}"
         )
     finally:
-        # Cleanup temporary  all files
-        for file_path in [video_tmp, srt_path, translate_srt_path, ]:
-            try:
-                if os.path.exists(file_path):
-                    os.remove(file_path)
-            except Exception as e:
-                print(f"Warning: Failed to remove temporary file {file_path}: {str(e)}")
+        workspace.cleanup()
 
 # pass
 @router.post("/subtitles/{video_id}", response_model=SRTSchema)
 async def add_subtitles_to_video_endpoint(
     video_id: str,
+    preset: str = Form("default"),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
@@ -223,6 +328,7 @@ async def add_subtitles_to_video_endpoint(
     
     Args:
         video_id: ID of the video to add subtitles to
+        preset: Subtitle style preset (see module_ass.ASS_PRESETS)
         db: Database session
         current_user: Current authenticated user
         
@@ -232,6 +338,12 @@ async def add_subtitles_to_video_endpoint(
     Raises:
         HTTPException for various error conditions
     """
+    if preset not in ASS_PRESETS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid subtitle preset: {preset}"
+        )
+
     # Validate video and SRT existence
     video_db = db.query(Video).filter(Video.video_id == video_id).first()
     srt_db = db.query(SRT).filter(SRT.video_id == video_id).first()
@@ -254,14 +366,6 @@ async def add_subtitles_to_video_endpoint(
             detail="User not authorized to access this video"
         )
 
-    # Create temporary directories
-    temp_dirs = {
-        "srt": "tempsrt",
-        "video": "tempvideo"
-    }
-    for dir_path in temp_dirs.values():
-        os.makedirs(dir_path, exist_ok=True)
-
     # Extract filenames from URLs
     try:
         srt_filename = os.path.basename(urllib.parse.urlparse(srt_db.srt_url_sub).path)
@@ -273,9 +377,13 @@ async def add_subtitles_to_video_endpoint(
         )
 
     # Define file paths
+    # Burn-in từ bản gốc nếu có (video cũ chưa lưu bản gốc thì dùng file_url như trước)
+    source_url = video_db.source_url or video_db.file_url
+    workspace = Workspace("subtitles")
     file_paths = {
-        "srt": os.path.join(temp_dirs["srt"], srt_filename),
-        "video": os.path.join(temp_dirs["video"], video_filename)
+        "srt": workspace.file(srt_filename),
+        "source": workspace.file(os.path.basename(urllib.parse.urlparse(source_url).path), "source"),
+        "video": workspace.file(video_filename)
     }
 
     try:
@@ -287,21 +395,24 @@ async def add_subtitles_to_video_endpoint(
                 file_paths["srt"]
             )
             download_file_from_s3(
-                video_db.file_url,
+                source_url,
                 settings.AWS_BUCKET_INPUT_VIDEO,
-                file_paths["video"]
+                file_paths["source"]
             )
         except Exception as e:
             raise HTTPException(
                 status_code=500,
                 detail=f"Failed to download files from S3: {str(e)}"
             )
+        workspace.check_quota()
 
         # Add subtitles to video
         add_subtitles_to_video(
-            file_paths["video"],
+            file_paths["source"],
             file_paths["srt"],
-            file_paths["video"]
+            file_paths["video"],
+            preset,
+            source_info=render_source_info(video_db)
         )
         # xoa video cu tren s3
         delete_file_from_s3(video_db.file_url, settings.AWS_BUCKET_INPUT_VIDEO)
@@ -326,13 +437,7 @@ async def add_subtitles_to_video_endpoint(
             detail=f"Unexpected error: {str(e)}"
         )
     finally:
-        # Cleanup temporary files
-        for file_path in file_paths.values():
-            try:
-                if os.path.exists(file_path):
-                    os.remove(file_path)
-            except Exception as e:
-                print(f"Warning: Failed to remove temporary file {file_path}: {str(e)}")
+        workspace.cleanup()
 
 # pass
 @router.post("/creation/{video_id}/{voice}", response_model=None)
@@ -361,22 +466,23 @@ async def create_videotts(
             detail="User not authorized to access this video"
         )
 
-    # Tạo đường dẫn thư mục tạm bằng pathlib để xử lý tương thích Windows tốt hơn
+    # Dựng từ bản gốc nếu có, để video chỉ bị encode một lần (video cũ thì dùng file_url)
+    source_url = video_db.source_url or video_db.file_url
+
+    # Mỗi job một workspace riêng, các job chạy song song không ghi đè file của nhau
+    workspace = Workspace("videotts")
     temp_dirs = {
-        "srt": Path("tempsrt"),
-        "video": Path("tempvideo"),
-        "audio": Path("tempaudio")
+        "srt": Path(workspace.dir("srt")),
+        "video": Path(workspace.dir("video")),
+        "audio": Path(workspace.dir("audio"))
     }
-    
-    # Đảm bảo thư mục tạm tồn tại
-    for dir_path in temp_dirs.values():
-        dir_path.mkdir(exist_ok=True, parents=True)
 
     # Trích xuất tên file từ URL
     try:
         srt_filename = Path(urllib.parse.urlparse(srt_db.srt_url_sub).path).name
-        video_filename = Path(urllib.parse.urlparse(video_db.file_url).path).name
+        video_filename = Path(urllib.parse.urlparse(source_url).path).name
     except Exception as e:
+        workspace.cleanup()
         raise HTTPException(
             status_code=500,
             detail=f"Lỗi xử lý tên file: {str(e)}"
@@ -385,10 +491,7 @@ async def create_videotts(
     # Định nghĩa đường dẫn file
     file_paths = {
         "srt": temp_dirs["srt"] / srt_filename,
-        "video": temp_dirs["video"] / video_filename,
-        "output_audio": temp_dirs["audio"] / "output_audio.mp3",
-        "output_srt": temp_dirs["srt"] / "output_srt.srt",
-        "output_video": temp_dirs["video"] / "output_final_video.mp4"
+        "video": temp_dirs["video"] / video_filename
     }
     
     # Chuyển đường dẫn về string cho các hàm không hỗ trợ Path
@@ -401,23 +504,47 @@ async def create_videotts(
             settings.AWS_BUCKET_INPUT_SRT,
             str_paths["srt"]
         )
-        download_video = download_file_from_s3(
-            video_db.file_url,
-            settings.AWS_BUCKET_INPUT_VIDEO,
-            str_paths["video"]
+        if not download_srt:
+            raise HTTPException(
+                status_code=500,
+                detail="Không thể tải file từ S3"
+            )
+
+        # Một plan duy nhất: thanh đen + phụ đề + audio TTS, encode một lần từ bản gốc
+        voice_name = voice_for_choice(voice)
+        plan = RenderPlan(
+            str_paths["video"], None, subtitles=str_paths["srt"], subtitle_preset="tts",
+            subtitle_bar=True, audio_title=voice_name, source_info=render_source_info(video_db)
         )
-        
-        if not download_srt or not download_video:
+        srt_digest = file_digest(str_paths["srt"])
+        # render_key chỉ phụ thuộc stream video (bản gốc + SRT), không phụ thuộc giọng
+        render_key = plan.video_key(source=source_url, srt=srt_digest)
+
+        # Đã có bản TTS cùng stream video (giọng khác hoặc tạo lại): chỉ thay audio, không encode video
+        previous = video_service.get_video_tts_by_render_key(db, video_db.video_id, render_key)
+        if previous:
+            previous_path = str(temp_dirs["video"] / f"previous_{Path(urllib.parse.urlparse(previous.video_tts_url).path).name}")
+            if download_file_from_s3(previous.video_tts_url, settings.AWS_BUCKET_VIDEO_SUB, previous_path):
+                plan.video_track = previous_path
+                # Giọng của bản trước được giữ làm track audio phụ trong cùng file MP4
+                if previous.audio_url and previous.voice and previous.voice != voice_name:
+                    previous_audio = str(temp_dirs["audio"] / f"previous_{Path(urllib.parse.urlparse(previous.audio_url).path).name}")
+                    if download_file_from_s3(previous.audio_url, settings.AWS_BUCKET_VIDEO_SUB, previous_audio):
+                        plan.alternate_audio.append((previous_audio, previous.voice))
+
+        if not plan.video_track and not download_file_from_s3(source_url, settings.AWS_BUCKET_INPUT_VIDEO, str_paths["video"]):
             raise HTTPException(
                 status_code=500,
                 detail="Không thể tải file từ S3"
             )
+        workspace.check_quota()
         
-        # Tạo audio từ SRT
+        # Tạo audio từ SRT, dựng theo timeline với độ dài bằng video
         loop = asyncio.get_event_loop()
+        video_duration = video_db.duration or probe_duration(plan.video_track or str_paths["video"])
         tts_audio_path = await loop.run_in_executor(
             None, 
-            lambda: generate_audio_from_srt(str_paths["srt"], str(temp_dirs["audio"]), voice)
+            lambda: generate_audio_from_srt(str_paths["srt"], str(temp_dirs["audio"]), voice, video_duration)
         )
         
         if not tts_audio_path:
@@ -425,32 +552,26 @@ async def create_videotts(
                 status_code=500,
                 detail="Không thể tạo audio từ SRT"
             )
+
+        # Tên file là key trên S3 nên gắn key của bản render (gồm giọng) để không ghi đè nhau
+        output_key = plan.key(source=source_url, srt=srt_digest, voice=voice_name)
+        plan.output = str(temp_dirs["video"] / f"tts_{output_key[:16]}_{video_db.file_name}")
+        audio_path = str(temp_dirs["audio"] / f"tts_{output_key[:16]}.wav")
+        os.replace(tts_audio_path, audio_path)
+        plan.audio = audio_path
+
+        # Render chạy ngoài event loop
+        await loop.run_in_executor(None, execute_plan, plan)
         
-        # Xử lý video với audio và phụ đề
-        process_video_with_sync(
-            audio_file=tts_audio_path,
-            video_file=str_paths["video"],
-            srt_file=str_paths["srt"],
-            output_audio=str_paths["output_audio"],
-            output_srt=str_paths["output_srt"],
-            output_video=str_paths["output_video"]
-        )
-        
-        # Upload lên S3
-        new_video_url = upload_file_to_s3(str_paths["output_video"], settings.AWS_BUCKET_VIDEO_SUB)
-        new_srt_url = replace_file_on_s3(srt_db.srt_url_sub, settings.AWS_BUCKET_INPUT_SRT, str_paths["output_srt"])
-        
-        # Cập nhật database
-        srt_updated = video_service.update_srt(
-            db, 
-            srt_db.srt_id, 
-            SRTUpdate(
-                srt_name=srt_db.srt_name, 
-                srt_url_sub=new_srt_url,
-                video_id=video_db.video_id,
-                srt_url=srt_db.srt_url
-            )
-        )
+        # Upload lên S3 (phụ đề giữ nguyên thời gian nên không cần cập nhật SRT).
+        # Audio TTS cũng được lưu để export dựng lại từ bản gốc mà không cần TTS lại.
+        new_video_url = upload_file_to_s3(plan.output, settings.AWS_BUCKET_VIDEO_SUB)
+        audio_url = upload_file_to_s3(audio_path, settings.AWS_BUCKET_VIDEO_SUB)
+        # Bản SRT đã dùng cũng được lưu: SRT của video có thể bị sửa sau (upload_srt), export
+        # phải dựng lại đúng phụ đề khớp với audio này
+        srt_snapshot = str(temp_dirs["srt"] / f"tts_{render_key[:16]}.srt")
+        shutil.copyfile(str_paths["srt"], srt_snapshot)
+        srt_url = upload_file_to_s3(srt_snapshot, settings.AWS_BUCKET_VIDEO_SUB)
 
         # Tạo video TTS mới
         video_tts = video_service.create_video_tts(
@@ -459,7 +580,11 @@ async def create_videotts(
                 video_tts_name=video_db.file_name, 
                 video_tts_url=new_video_url, 
                 video_id=video_db.video_id, 
-                srt_id=srt_db.srt_id
+                srt_id=srt_db.srt_id,
+                audio_url=audio_url,
+                voice=voice_name,
+                render_key=render_key,
+                srt_url=srt_url
             )
         )
         
@@ -480,33 +605,29 @@ async def create_videotts(
             detail=f"Lỗi không xác định: {str(e)}"
         )
     finally:
-        # Đảm bảo file handle được đóng trước khi xóa
-        gc.collect()
-        time.sleep(0.5)  # Cho hệ thống thời gian để đóng file handle
-        
-        # Xóa file tạm với cơ chế thử lại nhiều lần
-        all_paths = [str_paths["srt"], str_paths["video"], 
-                    tts_audio_path if 'tts_audio_path' in locals() else None,
-                    str_paths["output_audio"], str_paths["output_srt"], 
-                    str_paths["output_video"]]
-        
-        for path in all_paths:
-            if path is not None:
-                try:
-                    safe_remove_file(path)
-                except Exception as e:
-                    print(f"Cảnh báo: Không thể xóa file tạm {path}: {str(e)}")   
+        workspace.cleanup()
 
 # testing
 @router.get("/videotts/export/{video_tts_id}", response_model=None)
 async def export_video_tts(
     video_tts_id: str,
+    preset: str = EXPORT_DEFAULT_PRESET,
+    stream: bool = False,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """
-    Export video TTS để người dùng tải xuống
+    Export video TTS để người dùng tải xuống theo preset khung hình (EXPORT_PRESETS, ví dụ
+    "720_16x9", "1080_9x16"). Lần đầu chỉ dựng preset được yêu cầu rồi trả về; sau response, các
+    preset còn lại của EXPORT_LADDER được dựng trong một lần decode và mọi bản được lưu lên S3
+    theo (video_tts_id, render_key, preset); các lần sau trả về bản trong cache. Video, audio TTS và
+    SRT đều là bản đã dùng khi tạo video TTS, nên sửa SRT sau đó không làm lệch phụ đề với audio.
+    `stream=true`: chỉ dựng preset được yêu cầu và gửi dần fragmented MP4 trong khi encode
+    (video đọc thẳng từ S3), bản hoàn chỉnh vẫn được lưu vào cache.
     """
+    if preset not in EXPORT_PRESETS:
+        raise HTTPException(status_code=400, detail=f"Preset export không hợp lệ: {preset}")
+
     # Kiểm tra video_tts tồn tại
     videotts_db = db.query(VIDEO_TTS).filter(VIDEO_TTS.video_tts_id == video_tts_id).first()
     if not videotts_db:
@@ -521,44 +642,129 @@ async def export_video_tts(
     if current_user.user_id != video_db.user_id:
         raise HTTPException(status_code=403, detail="Người dùng không có quyền truy cập video này")
     
-    # Tạo thư mục tạm
-    temp_dirs = {
-        "video": "tempvideo"
-    }
-    for dir_path in temp_dirs.values():
-        os.makedirs(dir_path, exist_ok=True)
-        
+    workspace = Workspace("export")
     try:
         # Lấy tên file
         video_tts_filename = os.path.basename(urllib.parse.urlparse(videotts_db.video_tts_url).path)
-        
-        # Đường dẫn tạm
-        video_tts_tmp = os.path.join(temp_dirs["video"], video_tts_filename)
-        
-        # Tải từ S3
-        download_success = download_file_from_s3(
-            videotts_db.video_tts_url, 
-            settings.AWS_BUCKET_VIDEO_SUB, 
-            video_tts_tmp
-        )
-        
-        if not download_success:
-            raise HTTPException(status_code=500, detail="Không thể tải video từ kho lưu trữ")
-        
-        # Xuất video
-        if export_final_video(video_tts_tmp):
+        download_filename = f"{os.path.splitext(video_tts_filename)[0]}_{preset}.mp4"
+        cache_key = export_cache_key(video_tts_id, preset, videotts_db.render_key)
+        exported_path = workspace.file(cache_key)
+
+        # Bản export đã có trong cache S3
+        if s3_object_exists(cache_key, settings.AWS_BUCKET_VIDEO_SUB) and \
+                download_file_from_s3(cache_key, settings.AWS_BUCKET_VIDEO_SUB, exported_path):
+            print(f"Export {video_tts_id} ({preset}) lấy từ cache")
             return FileResponse(
-                video_tts_tmp,
+                exported_path,
                 media_type="video/mp4",
-                filename=f"{video_tts_filename}",
-                background=BackgroundTask(lambda: safe_remove_file(video_tts_tmp))
+                filename=download_filename,
+                background=BackgroundTask(workspace.cleanup)
+            )
+
+        if video_db.source_url and videotts_db.audio_url and videotts_db.srt_url:
+            # Dựng từ bản gốc + audio TTS và SRT đã lưu lúc tạo (không dùng SRT hiện tại của video,
+            # có thể đã sửa sau): thanh đen, phụ đề và audio trong cùng filtergraph
+            source_tmp = workspace.file(os.path.basename(urllib.parse.urlparse(video_db.source_url).path), "source")
+            srt_tmp = workspace.file(os.path.basename(urllib.parse.urlparse(videotts_db.srt_url).path))
+            audio_tmp = workspace.file(os.path.basename(urllib.parse.urlparse(videotts_db.audio_url).path))
+            downloads = [
+                download_file_from_s3(videotts_db.srt_url, settings.AWS_BUCKET_VIDEO_SUB, srt_tmp),
+                download_file_from_s3(videotts_db.audio_url, settings.AWS_BUCKET_VIDEO_SUB, audio_tmp),
+            ]
+            if stream:
+                # ffmpeg đọc dần bản gốc từ S3, không chờ tải xong
+                source_tmp = presigned_url_for(video_db.source_url, settings.AWS_BUCKET_INPUT_VIDEO)
+            else:
+                downloads.append(download_file_from_s3(video_db.source_url, settings.AWS_BUCKET_INPUT_VIDEO, source_tmp))
+            if not all(downloads):
+                raise HTTPException(status_code=500, detail="Không thể tải video từ kho lưu trữ")
+            plan = RenderPlan(
+                source_tmp, None, subtitles=srt_tmp, subtitle_preset="tts", subtitle_bar=True, audio=audio_tmp,
+                source_info=render_source_info(video_db)
             )
         else:
-            raise HTTPException(status_code=500, detail="Không thể xuất video")
+            # Video TTS cũ chưa lưu bản gốc/audio/SRT: scale/pad lại chính video TTS
+            video_tts_tmp = workspace.file(video_tts_filename, "source")
+            if stream:
+                video_tts_tmp = presigned_url_for(videotts_db.video_tts_url, settings.AWS_BUCKET_VIDEO_SUB)
+            elif not download_file_from_s3(videotts_db.video_tts_url, settings.AWS_BUCKET_VIDEO_SUB, video_tts_tmp):
+                raise HTTPException(status_code=500, detail="Không thể tải video từ kho lưu trữ")
+            plan = RenderPlan(video_tts_tmp, None)
+        workspace.check_quota()
+
+        if stream:
+            # Một rendition, gửi từng chunk ngay khi ffmpeg ghi ra; stream được ghi song song
+            # vào exported_path và chỉ lưu cache khi ffmpeg chạy xong không lỗi
+            plan.output = exported_path
+            plan.frame_size = EXPORT_PRESETS[preset]
+            chunks = stream_plan(plan, tee_path=exported_path)
+            state = {"completed": False}
+
+            async def relay():
+                try:
+                    async for chunk in chunks:
+                        yield chunk
+                    state["completed"] = True
+                except Exception:
+                    # Stream lỗi giữa chừng thì background task không chạy
+                    workspace.cleanup()
+                    raise
+
+            async def finish_stream():
+                # Client ngắt kết nối: đóng generator để dừng ffmpeg trước khi xóa workspace
+                await chunks.aclose()
+                try:
+                    if state["completed"]:
+                        await asyncio.to_thread(upload_file_to_s3, exported_path, settings.AWS_BUCKET_VIDEO_SUB)
+                except Exception as e:
+                    print(f"Lỗi khi lưu cache export {video_tts_id}: {str(e)}")
+                finally:
+                    workspace.cleanup()
+
+            return StreamingResponse(
+                relay(),
+                media_type="video/mp4",
+                headers={"Content-Disposition": f'attachment; filename="{download_filename}"'},
+                background=BackgroundTask(finish_stream)
+            )
+
+        # Chỉ dựng preset được yêu cầu trước khi trả response, như một lần export thường
+        plan.output = exported_path
+        plan.frame_size = EXPORT_PRESETS[preset]
+        await asyncio.to_thread(execute_plan, plan)
+
+        def cache_renditions():
+            # Chạy sau khi gửi xong response: lưu preset vừa dựng, dựng các preset còn lại của
+            # EXPORT_LADDER chưa có trong cache (một lần decode) rồi xóa workspace
+            try:
+                upload_file_to_s3(exported_path, settings.AWS_BUCKET_VIDEO_SUB)
+                keys = {name: export_cache_key(video_tts_id, name, videotts_db.render_key) for name in EXPORT_LADDER}
+                renditions = [
+                    (workspace.file(keys[name]), EXPORT_PRESETS[name])
+                    for name in EXPORT_LADDER
+                    if name != preset and not s3_object_exists(keys[name], settings.AWS_BUCKET_VIDEO_SUB)
+                ]
+                if renditions:
+                    execute_ladder(plan, renditions)
+                    for output, _ in renditions:
+                        upload_file_to_s3(output, settings.AWS_BUCKET_VIDEO_SUB)
+            except Exception as e:
+                print(f"Lỗi khi lưu cache export {video_tts_id}: {str(e)}")
+            finally:
+                workspace.cleanup()
+
+        return FileResponse(
+            exported_path,
+            media_type="video/mp4",
+            filename=download_filename,
+            background=BackgroundTask(cache_renditions)
+        )
             
     except HTTPException:
+        workspace.cleanup()
         raise
     except Exception as e:
+        workspace.cleanup()
         raise HTTPException(status_code=500, detail=f"Lỗi không xác định: {str(e)}")   
 
 # Get sound 
@@ -569,16 +775,21 @@ async def export_video_tts(
 async def upload_srt(
     video_id: str,
     srt: UploadFile = File(...),
-    srt_sub: UploadFile = File(...),
+    srt_sub: Optional[UploadFile] = File(None),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """
     Upload a SRT file and save to database.
+
+    If `srt_sub` is omitted, the translated SRT (and every other language track) is
+    rebuilt incrementally: only cues that were added or changed in `srt` are re-translated,
+    unchanged cues keep their existing translations.
     
     Args:
         video_id: ID of the video to add subtitles to
         srt: The SRT file to upload
+        srt_sub: Optional translated SRT file uploaded by the user
         db: Database session
         current_user: Current authenticated user
         
@@ -594,7 +805,7 @@ async def upload_srt(
     #         status_code=400,
     #         detail="Invalid file type. Only SRT files are allowed."
     #     )
-    if not srt_sub.filename.lower().endswith('.srt'):
+    if srt_sub is not None and not srt_sub.filename.lower().endswith('.srt'):
         raise HTTPException(
             status_code=400,
             detail="Invalid file type. Only SRT files are allowed."
@@ -602,13 +813,12 @@ async def upload_srt(
     
     # Validate video and SRT existence
     video_db = db.query(Video).filter(Video.video_id == video_id).first()
-    srt_db = db.query(SRT).filter(SRT.video_id == video_db.video_id).first()
-
     if not video_db:
         raise HTTPException(
             status_code=404,
             detail="Video not found"
         ) 
+    srt_db = db.query(SRT).filter(SRT.video_id == video_db.video_id).first()
     if not srt_db:
         raise HTTPException(
             status_code=404,
@@ -622,35 +832,51 @@ async def upload_srt(
             detail="User not authorized to access this video"
         )
     
-    # Create temporary directories
-    temp_dirs = {
-        "srt": "tempsrt"    
-        }
-
-    for dir_path in temp_dirs.values():
-        os.makedirs(dir_path, exist_ok=True)
-
-    # Generate unique filenames
+    # Generate filenames (bản cũ tải về nằm trong thư mục "prev" của workspace)
     srt_subtitle = os.path.basename(urllib.parse.urlparse(srt_db.srt_url).path)
     srt_translate = os.path.basename(urllib.parse.urlparse(srt_db.srt_url_sub).path)
+    workspace = Workspace("srt_upload")
 
     # Define file paths
     file_paths = {
-        "srt": os.path.join(temp_dirs["srt"], srt_subtitle),
-        "srt_sub": os.path.join(temp_dirs["srt"], srt_translate)
+        "srt": workspace.file(srt_subtitle),
+        "srt_sub": workspace.file(srt_translate),
+        "prev_srt": workspace.file(srt_subtitle, "prev"),
+        "prev_srt_sub": workspace.file(srt_translate, "prev")
     }
 
+    # Track chính là track có cùng file với srt_url_sub, các track còn lại được dịch lại riêng
+    tracks = video_service.get_subtitle_tracks(db, video_id)
+    primary_track = next((track for track in tracks if track.srt_url == srt_db.srt_url_sub), None)
+    primary_language = primary_track.language if primary_track else "vi"
+    translation_stats = {}
+
     try:
         # Save uploaded files
         with open(file_paths["srt"], "wb") as buffer:
             shutil.copyfileobj(srt.file, buffer)
-        with open(file_paths["srt_sub"], "wb") as buffer:
-            shutil.copyfileobj(srt_sub.file, buffer)
+
+        # SRT gốc trước khi sửa, dùng để tìm các cue đã thay đổi
+        has_previous = download_file_from_s3(srt_db.srt_url, settings.AWS_BUCKET_INPUT_SRT, file_paths["prev_srt"])
+        previous_srt = file_paths["prev_srt"] if has_previous else None
+
+        if srt_sub is not None:
+            with open(file_paths["srt_sub"], "wb") as buffer:
+                shutil.copyfileobj(srt_sub.file, buffer)
+        else:
+            has_previous_sub = download_file_from_s3(srt_db.srt_url_sub, settings.AWS_BUCKET_INPUT_SRT, file_paths["prev_srt_sub"])
+            translation_stats[primary_language] = await retranslate_srt_incremental(
+                previous_srt,
+                file_paths["prev_srt_sub"] if has_previous_sub else None,
+                file_paths["srt"],
+                file_paths["srt_sub"],
+                primary_language
+            )
 
         # Replace old SRT files with new ones
         # replace_file_on_s3 will propagate PermissionError or ClientError from its underlying calls
-            new_srt_url = replace_file_on_s3(srt_db.srt_url, settings.AWS_BUCKET_INPUT_SRT, file_paths["srt"])
-            new_srt_sub_url = replace_file_on_s3(srt_db.srt_url_sub, settings.AWS_BUCKET_INPUT_SRT, file_paths["srt_sub"])
+        new_srt_url = replace_file_on_s3(srt_db.srt_url, settings.AWS_BUCKET_INPUT_SRT, file_paths["srt"])
+        new_srt_sub_url = replace_file_on_s3(srt_db.srt_url_sub, settings.AWS_BUCKET_INPUT_SRT, file_paths["srt_sub"])
         
         srt_updated = video_service.update_srt(db, srt_db.srt_id, SRTUpdate(
             srt_name=srt_db.srt_name, 
@@ -659,12 +885,43 @@ async def upload_srt(
             video_id=video_db.video_id
         ))
 
+        # Cập nhật các track ngôn ngữ khác theo cue đã thay đổi
+        for track in tracks:
+            if track is primary_track:
+                track_url = new_srt_sub_url
+            else:
+                track_filename = os.path.basename(urllib.parse.urlparse(track.srt_url).path)
+                prev_track_path = workspace.file(track_filename, "prev")
+                track_path = workspace.file(track_filename)
+                file_paths[f"prev_track_{track.language}"] = prev_track_path
+                file_paths[f"track_{track.language}"] = track_path
+
+                has_previous_track = download_file_from_s3(track.srt_url, settings.AWS_BUCKET_INPUT_SRT, prev_track_path)
+                translation_stats[track.language] = await retranslate_srt_incremental(
+                    previous_srt,
+                    prev_track_path if has_previous_track else None,
+                    file_paths["srt"],
+                    track_path,
+                    track.language
+                )
+                track_url = replace_file_on_s3(track.srt_url, settings.AWS_BUCKET_INPUT_SRT, track_path)
+            video_service.upsert_subtitle_track(
+                db,
+                SubtitleTrackCreate(
+                    language=track.language,
+                    srt_url=track_url,
+                    srt_id=srt_db.srt_id,
+                    video_id=video_db.video_id
+                )
+            )
+
         return JSONResponse(
             status_code=201,
             content={
                 "message": "SRT files uploaded successfully",
                 "srt_id": srt_updated.srt_id,
-                "filename": srt_updated.srt_name
+                "filename": srt_updated.srt_name,
+                "translation": translation_stats
             }
         )
     except PermissionError as s3_perm_error: # Catch specific S3 permission errors
@@ -694,13 +951,7 @@ async def upload_srt(
             detail=f"An unexpected error occurred during SRT upload: {str(e)}"
         )
     finally:
-        # Cleanup temporary files
-        for file_path in file_paths.values():
-            try:
-                if os.path.exists(file_path):
-                    os.remove(file_path)
-            except Exception as e:
-                print(f"Warning: Failed to remove temporary file {file_path}: {str(e)}")
+        workspace.cleanup()
 
 
 # pass
@@ -714,9 +965,9 @@ async def get_videos(
     """Lấy danh sách video của người dùng kèm preview"""
     videos = video_service.get_user_videos(db, current_user.user_id, skip, limit)
     
-    # Tạo thư mục tạm cho thumbnails
-    temp_dir = "temp_thumbnails"
-    os.makedirs(temp_dir, exist_ok=True)
+    # Workspace riêng cho thumbnails của request này
+    workspace = Workspace("thumbnails")
+    temp_dir = workspace.path
     
     response_videos = []
     for video in videos:
@@ -725,6 +976,9 @@ async def get_videos(
             "video_id": video.video_id,
             "file_name": video.file_name,
             "file_url": video.file_url,
+            "duration": video.duration,
+            "width": video.width,
+            "height": video.height,
             "created_at": video.created_at.isoformat() if video.created_at else None
         }
         
@@ -739,8 +993,7 @@ async def get_videos(
                 # Tải video từ S3
                 cleaned_video_url_path = urllib.parse.urlparse(video.file_url).path
                 video_tmp_filename = os.path.basename(cleaned_video_url_path)
-                video_tmp = os.path.join("tempvideo", video_tmp_filename)
-                os.makedirs("tempvideo", exist_ok=True)
+                video_tmp = workspace.file(video_tmp_filename, "video")
                 
                 download_success = download_file_from_s3(
                     video.file_url,
@@ -750,16 +1003,15 @@ async def get_videos(
                 
                 if download_success:
                     # Tạo thumbnail bằng FFmpeg
-                    import subprocess
                     command = [
-                        "ffmpeg", "-y", "-i", video_tmp,
+                        "ffmpeg", "-y", "-v", "error", "-i", video_tmp,
                         "-ss", "00:00:05",  # Lấy frame ở giây thứ 5
                         "-frames:v", "1",   # Chỉ lấy 1 frame
                         "-vf", "scale=320:-1",  # Resize về chiều rộng 320px
                         "-q:v", "2",        # Chất lượng thumbnail
                         thumbnail_path
                     ]
-                    subprocess.run(command, capture_output=True)
+                    run_ffmpeg(command, label="thumbnail", timeout=60)
                     
                     # Upload thumbnail lên S3 - SỬA DÒNG NÀY
                     # Đổi tên file trước khi upload để có đường dẫn đúng
@@ -791,6 +1043,7 @@ async def get_videos(
                 os.remove(thumbnail_path)
             except Exception as e:
                 print(f"Không thể xóa thumbnail {thumbnail_path}: {str(e)}")    
+    workspace.cleanup()
     return JSONResponse(
         status_code=200,
         content={"videos": response_videos}
@@ -824,13 +1077,6 @@ async def get_video_by_id(
     if current_user.user_id != video_db.user_id:
         raise HTTPException(status_code=403, detail="User not authorized to access this video")
     
-    # Create necessary temp directories
-    temp_dirs = {
-        "video": "tempvideo"
-    }
-    for dir_path in temp_dirs.values():
-        os.makedirs(dir_path, exist_ok=True)
-    
     # Extract filenames from URLs
     try:
         video_url_path = urllib.parse.urlparse(video_db.file_url).path
@@ -842,9 +1088,9 @@ async def get_video_by_id(
             detail=f"Failed to process file path from URL: {str(e)}"
         )
     
-    # Generate a unique temporary filename to avoid conflicts between concurrent requests
-    unique_request_id = str(uuid.uuid4())
-    video_tmp = os.path.join(temp_dirs["video"], f"{unique_request_id}_{video_filename}")
+    # Mỗi request một workspace riêng, các request song song không đụng file của nhau
+    workspace = Workspace("serve")
+    video_tmp = workspace.file(video_filename)
     
     # Check if file exists in S3 before attempting download
     try:
@@ -861,6 +1107,7 @@ async def get_video_by_id(
                 if client_etag and server_etag and client_etag == server_etag:
                     # Trả về 304 Not Modified nếu ETag khớp
                     print(f"ETag match for video {video_id}: {client_etag}. Returning 304.")
+                    workspace.cleanup()
                     return Response(
                         status_code=304,
                         headers={
@@ -930,37 +1177,20 @@ async def get_video_by_id(
                 "Access-Control-Allow-Origin": "*"  # Allow cross-origin access
             }
             
-            # Define a proper cleanup function that waits before deleting
-            async def delayed_cleanup(path):
-                try:
-                    # Wait for 10 seconds to ensure streaming has started
-                    await asyncio.sleep(10)
-                    if os.path.exists(path):
-                        print(f"Removing temp file: {path}")
-                        os.remove(path)
-                    else:
-                        print(f"Temp file already removed: {path}")
-                except Exception as e:
-                    print(f"Error removing temp file {path}: {e}")
-            
             # Return the file with background cleanup task
             return FileResponse(
                 path=video_tmp,
                 media_type="video/mp4",
                 filename=video_filename,
                 headers=headers,
-                background=BackgroundTask(delayed_cleanup, path=video_tmp)
+                background=BackgroundTask(workspace.cleanup)
             )
             
         except Exception as download_error:
             # Handle download errors
             print(f"Error downloading video {video_id} from S3: {str(download_error)}")
             # Clean up failed download
-            if os.path.exists(video_tmp):
-                try:
-                    os.remove(video_tmp)
-                except:
-                    pass
+            workspace.cleanup()
             raise HTTPException(
                 status_code=500, 
                 detail=f"Error downloading video: {str(download_error)}"
@@ -969,20 +1199,12 @@ async def get_video_by_id(
     except HTTPException:
         # Pass through HTTP exceptions we've already raised
         # Ensure temp file is cleaned up
-        if os.path.exists(video_tmp):
-            try:
-                os.remove(video_tmp)
-            except:
-                pass
+        workspace.cleanup()
         raise
     except Exception as e:
         # Catch any other unexpected errors
         # Ensure temp file is cleaned up
-        if os.path.exists(video_tmp):
-            try:
-                os.remove(video_tmp)
-            except:
-                pass
+        workspace.cleanup()
         print(f"Unexpected error in get_video_by_id for {video_id}: {str(e)}")
         raise HTTPException(
             status_code=500, 
@@ -1053,13 +1275,6 @@ async def get_video_tts_by_id(
     if current_user.user_id != video_db.user_id:
         raise HTTPException(status_code=403, detail="User not authorized to access")
     
-    # download video tts from s3
-    temp_dirs = {
-        "video": "tempvideo"
-    }
-    for dir_path in temp_dirs.values():
-        os.makedirs(dir_path, exist_ok=True)
-    
     # Extract filenames from URLs
     try:
         video_filename = os.path.basename(urllib.parse.urlparse(video_tts_db.video_tts_url).path)
@@ -1070,9 +1285,9 @@ async def get_video_tts_by_id(
             detail=f"Failed to process file path from URL: {str(e)}"
         )
     
-    # Generate a unique temporary filename to avoid conflicts between concurrent requests
-    unique_request_id = str(uuid.uuid4())
-    video_tmp = os.path.join(temp_dirs["video"], f"{unique_request_id}_{video_filename}")
+    # Mỗi request một workspace riêng, các request song song không đụng file của nhau
+    workspace = Workspace("serve")
+    video_tmp = workspace.file(video_filename)
     
     try:
         # Kiểm tra file tồn tại trên S3 trước khi tải xuống
@@ -1088,6 +1303,7 @@ async def get_video_tts_by_id(
                 if client_etag and server_etag and client_etag == server_etag:
                     # Trả về 304 Not Modified nếu ETag khớp
                     print(f"ETag match for video TTS {video_tts_id}: {client_etag}. Returning 304.")
+                    workspace.cleanup()
                     return Response(
                         status_code=304,
                         headers={
@@ -1156,24 +1372,6 @@ async def get_video_tts_by_id(
             "Access-Control-Allow-Origin": "*"  # Allow cross-origin access
         }
         
-        # SRT files are small, but still need some time for download to complete
-        async def delayed_cleanup(path):
-            try:
-                # Increase to 10 seconds to ensure client has sufficient time to download
-                await asyncio.sleep(10)
-                if os.path.exists(path):
-                    file_size = os.path.getsize(path)
-                    print(f"Removing temp video file: {path} (size: {file_size} bytes)")
-                    os.remove(path)
-                    print(f"Successfully removed temp video file: {path}")
-                else:
-                    print(f"Temp video file already removed or not found: {path}")
-            except Exception as e:
-                print(f"Error removing temp video file {path}: {e}")
-                # Log the exception details for better debugging
-                import traceback
-                print(traceback.format_exc())
-        
         # Log the file size and other details before sending
         print(f"Serving video file {video_tmp} ({os.path.getsize(video_tmp)} bytes) with headers: {headers}")
         
@@ -1182,23 +1380,15 @@ async def get_video_tts_by_id(
             media_type="video/mp4",
             filename=video_filename,
             headers=headers,
-            background=BackgroundTask(delayed_cleanup, path=video_tmp)
+            background=BackgroundTask(workspace.cleanup)
         )
     except HTTPException:
         # Clean up file if an exception occurs
-        if os.path.exists(video_tmp):
-            try:
-                os.remove(video_tmp)
-            except:
-                pass
+        workspace.cleanup()
         raise
     except Exception as e:
         # Clean up file if an exception occurs
-        if os.path.exists(video_tmp):
-            try:
-                os.remove(video_tmp)
-            except:
-                pass
+        workspace.cleanup()
         raise HTTPException(
             status_code=500,
             detail=f"Failed to serve video: {str(e)}"
@@ -1215,9 +1405,9 @@ async def get_videottses(
     """Lấy danh sách video của người dùng kèm preview"""
     videottses = video_service.get_video_tts(db, video_id, skip, limit)
     
-    # Tạo thư mục tạm cho thumbnails
-    temp_dir = "temp_thumbnails"
-    os.makedirs(temp_dir, exist_ok=True)
+    # Workspace riêng cho thumbnails của request này
+    workspace = Workspace("thumbnails")
+    temp_dir = workspace.path
     
     response_videos = []
     for videotts in videottses:
@@ -1240,8 +1430,7 @@ async def get_videottses(
                 # Tải video từ S3
                 cleaned_videotts_url_path = urllib.parse.urlparse(videotts.video_tts_url).path
                 video_tmp_filename = os.path.basename(cleaned_videotts_url_path)
-                video_tmp = os.path.join("tempvideo", video_tmp_filename) # Use cleaned filename for local path
-                os.makedirs("tempvideo", exist_ok=True)
+                video_tmp = workspace.file(video_tmp_filename, "video") # Use cleaned filename for local path
                 
                 download_success = download_file_from_s3(
                     videotts.video_tts_url, # Original URL for S3 download
@@ -1251,16 +1440,15 @@ async def get_videottses(
                 
                 if download_success:
                     # Tạo thumbnail bằng FFmpeg
-                    import subprocess
                     command = [
-                        "ffmpeg", "-y", "-i", video_tmp,
+                        "ffmpeg", "-y", "-v", "error", "-i", video_tmp,
                         "-ss", "00:00:05",  # Lấy frame ở giây thứ 5
                         "-frames:v", "1",   # Chỉ lấy 1 frame
                         "-vf", "scale=320:-1",  # Resize về chiều rộng 320px
                         "-q:v", "2",        # Chất lượng thumbnail
                         thumbnail_path
                     ]
-                    subprocess.run(command, capture_output=True)
+                    run_ffmpeg(command, label="thumbnail", timeout=60)
                     
                     # Upload thumbnail lên S3 - SỬA DÒNG NÀY
                     # Đổi tên file trước khi upload để có đường dẫn đúng
@@ -1292,6 +1480,7 @@ async def get_videottses(
                 os.remove(thumbnail_path)
         except Exception as e:
             print(f"Warning: Failed to remove thumbnail file {thumbnail_path}: {str(e)}")
+    workspace.cleanup()
     return JSONResponse(
         status_code=200,
         content={"videos": response_videos}
@@ -1308,19 +1497,31 @@ async def delete_video_by_id(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    # xoa video tren s3
     video_db = db.query(Video).filter(Video.video_id == video_id).first()
-    srt_db = db.query(SRT).filter(SRT.video_id == video_db.video_id).first()
-    videotts_db = db.query(VIDEO_TTS).filter(VIDEO_TTS.video_id == video_db.video_id).first()
     if not video_db:
         raise HTTPException(status_code=404, detail="Video not found")
     if current_user.user_id != video_db.user_id:
         raise HTTPException(status_code=403, detail="User not authorized to delete this video")
-    # xoa video tren s3
+    srt_db = db.query(SRT).filter(SRT.video_id == video_db.video_id).first()
+    # xoa video tren s3 (bản hiển thị và bản gốc giữ lại lúc upload)
     delete_file_from_s3(video_db.file_url, settings.AWS_BUCKET_INPUT_VIDEO)
+    if video_db.source_url and video_db.source_url != video_db.file_url:
+        delete_file_from_s3(video_db.source_url, settings.AWS_BUCKET_INPUT_VIDEO)
     delete_file_from_s3(srt_db.srt_url, settings.AWS_BUCKET_INPUT_SRT)
     delete_file_from_s3(srt_db.srt_url_sub, settings.AWS_BUCKET_INPUT_SRT)
-    delete_file_from_s3(videotts_db.video_tts_url, settings.AWS_BUCKET_VIDEO_SUB)
+    # Video TTS, audio lồng tiếng và các bản export đã cache của mọi video TTS thuộc video này
+    for video_tts in db.query(VIDEO_TTS).filter(VIDEO_TTS.video_id == video_id).all():
+        delete_file_from_s3(video_tts.video_tts_url, settings.AWS_BUCKET_VIDEO_SUB)
+        for url in (video_tts.audio_url, video_tts.srt_url):
+            if url:
+                delete_file_from_s3(url, settings.AWS_BUCKET_VIDEO_SUB)
+        for preset in EXPORT_PRESETS:
+            # Cả key cũ (trước khi key gồm render_key) lẫn key hiện tại
+            for key in {export_cache_key(video_tts.video_tts_id, preset), export_cache_key(video_tts.video_tts_id, preset, video_tts.render_key)}:
+                delete_file_from_s3(key, settings.AWS_BUCKET_VIDEO_SUB)
+    for track in video_service.get_subtitle_tracks(db, video_id):
+        if track.srt_url != srt_db.srt_url_sub:
+            delete_file_from_s3(track.srt_url, settings.AWS_BUCKET_INPUT_SRT)
     return video_service.delete_video(db, video_id)
 
 #  pass
@@ -1341,12 +1542,6 @@ async def get_srt_by_video_id(
     srt_db = db.query(SRT).filter(SRT.video_id == video_id).first()
     if not srt_db:
         raise HTTPException(status_code=404, detail="SRT not found")
-    # download srt from s3
-    temp_dirs = {
-        "srt": "tempsrt",
-    }
-    for dir_path in temp_dirs.values():
-        os.makedirs(dir_path, exist_ok=True)
     # Extract filenames from URLs
     try:
         srt_filename = os.path.basename(urllib.parse.urlparse(srt_db.srt_url).path)
@@ -1357,9 +1552,9 @@ async def get_srt_by_video_id(
             detail=f"Failed to process file path from URL: {str(e)}"
         )
     
-    # Generate a unique temporary filename
-    unique_request_id = str(uuid.uuid4())
-    srt_tmp = os.path.join(temp_dirs["srt"], f"{unique_request_id}_{srt_filename}")
+    # Mỗi request một workspace riêng, các request song song không đụng file của nhau
+    workspace = Workspace("serve")
+    srt_tmp = workspace.file(srt_filename)
     
     try:
         # Kiểm tra file tồn tại trên S3 trước khi tải xuống
@@ -1375,6 +1570,7 @@ async def get_srt_by_video_id(
                 if client_etag and server_etag and client_etag == server_etag:
                     # Trả về 304 Not Modified nếu ETag khớp
                     print(f"ETag match for SRT {video_id}: {client_etag}. Returning 304.")
+                    workspace.cleanup()
                     return Response(
                         status_code=304,
                         headers={
@@ -1442,24 +1638,6 @@ async def get_srt_by_video_id(
             "Content-Disposition": f'attachment; filename="{srt_filename}"'
         }
         
-        # SRT files are small, but still need some time for download to complete
-        async def delayed_cleanup(path):
-            try:
-                # Increase to 10 seconds to ensure client has sufficient time to download
-                await asyncio.sleep(10)
-                if os.path.exists(path):
-                    file_size = os.path.getsize(path)
-                    print(f"Removing temp SRT file: {path} (size: {file_size} bytes)")
-                    os.remove(path)
-                    print(f"Successfully removed temp SRT file: {path}")
-                else:
-                    print(f"Temp SRT file already removed or not found: {path}")
-            except Exception as e:
-                print(f"Error removing temp SRT file {path}: {e}")
-                # Log the exception details for better debugging
-                import traceback
-                print(traceback.format_exc())
-        
         # Log the file size and other details before sending
         print(f"Serving SRT file {srt_tmp} ({os.path.getsize(srt_tmp)} bytes) with headers: {headers}")
         
@@ -1468,23 +1646,15 @@ async def get_srt_by_video_id(
             media_type="application/x-subrip",
             filename=srt_filename,
             headers=headers,
-            background=BackgroundTask(delayed_cleanup, path=srt_tmp)
+            background=BackgroundTask(workspace.cleanup)
         )
     except HTTPException:
         # Clean up file if an exception occurs
-        if os.path.exists(srt_tmp):
-            try:
-                os.remove(srt_tmp)
-            except:
-                pass
+        workspace.cleanup()
         raise
     except Exception as e:
         # Clean up file if an exception occurs
-        if os.path.exists(srt_tmp):
-            try:
-                os.remove(srt_tmp)
-            except:
-                pass
+        workspace.cleanup()
         raise HTTPException(
             status_code=500,
             detail=f"Failed to serve SRT file: {str(e)}"
@@ -1509,12 +1679,6 @@ async def get_srt_trans_by_video_id(
     srt_db = db.query(SRT).filter(SRT.video_id == video_id).first()
     if not srt_db:
         raise HTTPException(status_code=404, detail="SRT not found")
-    # download srt from s3
-    temp_dirs = {
-        "srt": "tempsrt",
-    }
-    for dir_path in temp_dirs.values():
-        os.makedirs(dir_path, exist_ok=True)
     # Extract filenames from URLs
     try:
         srt_sub_filename = os.path.basename(urllib.parse.urlparse(srt_db.srt_url_sub).path)
@@ -1525,9 +1689,9 @@ async def get_srt_trans_by_video_id(
             detail=f"Failed to process file path from URL: {str(e)}"
         )
     
-    # Generate a unique temporary filename
-    unique_request_id = str(uuid.uuid4())
-    srt_sub_tmp = os.path.join(temp_dirs["srt"], f"{unique_request_id}_{srt_sub_filename}")
+    # Mỗi request một workspace riêng, các request song song không đụng file của nhau
+    workspace = Workspace("serve")
+    srt_sub_tmp = workspace.file(srt_sub_filename)
     
     try:
         # Kiểm tra file tồn tại trên S3 trước khi tải xuống
@@ -1543,6 +1707,7 @@ async def get_srt_trans_by_video_id(
                 if client_etag and server_etag and client_etag == server_etag:
                     # Trả về 304 Not Modified nếu ETag khớp
                     print(f"ETag match for translated SRT {video_id}: {client_etag}. Returning 304.")
+                    workspace.cleanup()
                     return Response(
                         status_code=304,
                         headers={
@@ -1610,24 +1775,6 @@ async def get_srt_trans_by_video_id(
             "Content-Disposition": f'attachment; filename="{srt_sub_filename}"'
         }
         
-        # SRT files are small, but still need some time for download to complete
-        async def delayed_cleanup(path):
-            try:
-                # Increase to 10 seconds to ensure client has sufficient time to download
-                await asyncio.sleep(10)
-                if os.path.exists(path):
-                    file_size = os.path.getsize(path)
-                    print(f"Removing temp SRT file: {path} (size: {file_size} bytes)")
-                    os.remove(path)
-                    print(f"Successfully removed temp SRT file: {path}")
-                else:
-                    print(f"Temp SRT file already removed or not found: {path}")
-            except Exception as e:
-                print(f"Error removing temp SRT file {path}: {e}")
-                # Log the exception details for better debugging
-                import traceback
-                print(traceback.format_exc())
-        
         # Log the file size and other details before sending
         print(f"Serving SRT file {srt_sub_tmp} ({os.path.getsize(srt_sub_tmp)} bytes) with headers: {headers}")
         
@@ -1636,28 +1783,196 @@ async def get_srt_trans_by_video_id(
             media_type="application/x-subrip",
             filename=srt_sub_filename,
             headers=headers,
-            background=BackgroundTask(delayed_cleanup, path=srt_sub_tmp)
+            background=BackgroundTask(workspace.cleanup)
         )
     except HTTPException:
         # Clean up file if an exception occurs
-        if os.path.exists(srt_sub_tmp):
-            try:
-                os.remove(srt_sub_tmp)
-            except:
-                pass
+        workspace.cleanup()
         raise
     except Exception as e:
         # Clean up file if an exception occurs
-        if os.path.exists(srt_sub_tmp):
-            try:
-                os.remove(srt_sub_tmp)
-            except:
-                pass
+        workspace.cleanup()
         raise HTTPException(
             status_code=500,
             detail=f"Failed to serve translated SRT file: {str(e)}"
         )
 
+# Subtitle tracks theo ngôn ngữ
+@router.get("/srt/{video_id}/tracks", response_model=None)
+async def get_subtitle_tracks(
+    video_id: str,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Lấy danh sách các track phụ đề đã dịch của video"""
+    video_db = db.query(Video).filter(Video.video_id == video_id).first()
+    if not video_db:
+        raise HTTPException(status_code=404, detail="Video not found")
+    if current_user.user_id != video_db.user_id:
+        raise HTTPException(status_code=403, detail="User not authorized to access")
+
+    tracks = video_service.get_subtitle_tracks(db, video_id)
+    return JSONResponse(
+        status_code=200,
+        content={
+            "tracks": [
+                {
+                    "track_id": track.track_id,
+                    "language": track.language,
+                    "created_at": track.created_at.isoformat() if track.created_at else None
+                }
+                for track in tracks
+            ]
+        }
+    )
+
+@router.post("/srt/{video_id}/tracks", response_model=None)
+async def add_subtitle_tracks(
+    video_id: str,
+    target_languages: str = Form(...),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Dịch phụ đề gốc sang thêm ngôn ngữ mới. Chỉ tốn thời gian dịch,
+    không OCR lại và không tải video.
+    """
+    languages = parse_target_languages(target_languages)
+
+    video_db = db.query(Video).filter(Video.video_id == video_id).first()
+    if not video_db:
+        raise HTTPException(status_code=404, detail="Video not found")
+    if current_user.user_id != video_db.user_id:
+        raise HTTPException(status_code=403, detail="User not authorized to access")
+    srt_db = db.query(SRT).filter(SRT.video_id == video_id).first()
+    if not srt_db:
+        raise HTTPException(status_code=404, detail="SRT not found")
+
+    # Track chính (cùng file với srt_url_sub) do upload/upload_srt quản lý: dịch lại ở đây sẽ
+    # trỏ track sang file mới trong khi srt_url_sub vẫn giữ file cũ
+    primary_languages = {
+        track.language for track in video_service.get_subtitle_tracks(db, video_id)
+        if track.srt_url == srt_db.srt_url_sub
+    }
+    skipped = [language for language in languages if language in primary_languages]
+    languages = [language for language in languages if language not in primary_languages]
+    if not languages:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Language {', '.join(skipped)} is the primary subtitle track; update it via /srt/upload"
+        )
+
+    workspace = Workspace("tracks")
+    base_name = os.path.splitext(srt_db.srt_name)[0]
+    # Tên file là key trên S3 nên giữ tiền tố uuid để không trùng với track cũ
+    unique_request_id = str(uuid.uuid4())
+    srt_tmp = workspace.file(f"{unique_request_id}_{srt_db.srt_name}")
+    translated_paths = {
+        language: workspace.file(f"{unique_request_id}_{base_name}_translate_{language}.srt")
+        for language in languages
+    }
+
+    try:
+        if not download_file_from_s3(srt_db.srt_url, settings.AWS_BUCKET_INPUT_SRT, srt_tmp):
+            raise HTTPException(status_code=500, detail="Failed to download SRT file from storage")
+
+        await translate_srt_to_languages(srt_tmp, translated_paths)
+
+        saved_tracks = []
+        for language, path in translated_paths.items():
+            existing = video_service.get_subtitle_track(db, video_id, language)
+            if existing:
+                track_url = replace_file_on_s3(existing.srt_url, settings.AWS_BUCKET_INPUT_SRT, path)
+            else:
+                track_url = upload_file_to_s3(path, settings.AWS_BUCKET_INPUT_SRT)
+            track = video_service.upsert_subtitle_track(
+                db,
+                SubtitleTrackCreate(
+                    language=language,
+                    srt_url=track_url,
+                    srt_id=srt_db.srt_id,
+                    video_id=video_id
+                )
+            )
+            saved_tracks.append({"track_id": track.track_id, "language": track.language})
+
+        return JSONResponse(
+            status_code=201,
+            content={
+                "message": "Subtitle tracks created successfully",
+                "tracks": saved_tracks,
+                "skipped": skipped
+            }
+        )
+    except PermissionError as s3_perm_error:
+        raise HTTPException(status_code=403, detail=str(s3_perm_error))
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"An unexpected error occurred while translating subtitles: {str(e)}"
+        )
+    finally:
+        workspace.cleanup()
+
+@router.get("/srt/{video_id}/tracks/{language}", response_model=None)
+async def get_subtitle_track_file(
+    video_id: str,
+    language: str,
+    format: str = "srt",
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Tải file phụ đề theo ngôn ngữ ("original" là phụ đề gốc chưa dịch).
+    `format=vtt` trả về WebVTT làm sidecar cho player (phụ đề mềm), luôn theo bản SRT mới nhất.
+    """
+    if format not in ("srt", "vtt"):
+        raise HTTPException(status_code=400, detail=f"Invalid subtitle format: {format}")
+    video_db = db.query(Video).filter(Video.video_id == video_id).first()
+    if not video_db:
+        raise HTTPException(status_code=404, detail="Video not found")
+    if current_user.user_id != video_db.user_id:
+        raise HTTPException(status_code=403, detail="User not authorized to access")
+    if language == "original":
+        srt_db = db.query(SRT).filter(SRT.video_id == video_id).first()
+        srt_url = srt_db.srt_url if srt_db else None
+    else:
+        track = video_service.get_subtitle_track(db, video_id, language)
+        srt_url = track.srt_url if track else None
+    if not srt_url:
+        raise HTTPException(status_code=404, detail=f"Subtitle track '{language}' not found")
+
+    workspace = Workspace("serve")
+    track_filename = os.path.basename(urllib.parse.urlparse(srt_url).path)
+    track_tmp = workspace.file(track_filename)
+
+    if not download_file_from_s3(srt_url, settings.AWS_BUCKET_INPUT_SRT, track_tmp):
+        workspace.cleanup()
+        raise HTTPException(status_code=500, detail="Failed to download subtitle track from storage")
+
+    if format == "vtt":
+        try:
+            vtt_filename = os.path.splitext(track_filename)[0] + ".vtt"
+            vtt_tmp = srt_to_vtt(track_tmp, workspace.file(vtt_filename))
+        except Exception as e:
+            workspace.cleanup()
+            raise HTTPException(status_code=500, detail=f"Failed to convert subtitle track: {str(e)}")
+        return FileResponse(
+            path=vtt_tmp,
+            media_type="text/vtt",
+            filename=vtt_filename,
+            background=BackgroundTask(workspace.cleanup)
+        )
+
+    return FileResponse(
+        path=track_tmp,
+        media_type="application/x-subrip",
+        filename=track_filename,
+        background=BackgroundTask(workspace.cleanup)
+    )
+
 # New endpoint to get a pre-signed URL for direct video access
 @router.get("/{video_id}/presigned")
 async def get_video_url(
@@ -1759,7 +2074,7 @@ async def get_video_url(
             content={
                 "url": presigned_url,
                 "file_name": video_db.file_name,
-                "duration": None  # The client will determine this when loading the video
+                "duration": video_db.duration  # Probe lúc upload; None với video cũ
             }
         )
             
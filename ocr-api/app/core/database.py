@@ -18,7 +18,7 @@ def get_db():
         db.close()
 
 from app.models.user import User
-from app.models.video import Video, SRT, VIDEO_TTS
+from app.models.video import Video, SRT, VIDEO_TTS, SubtitleTrack
 # Tạo bảng nếu chưa tồn tại - đặt ở cuối file sau khi import models
 Base.metadata.create_all(bind=engine, checkfirst=True)
 
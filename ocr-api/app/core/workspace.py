@@ -0,0 +1,171 @@
+import os
+import time
+import shutil
+import asyncio
+import tempfile
+import threading
+from fastapi import HTTPException
+
+# Thư mục gốc chứa workspace của các job. WORKSPACE_TMPFS=1 đặt workspace trên /dev/shm (RAM)
+# nếu có, giảm I/O đĩa cho các file trung gian ngắn hạn.
+WORKSPACE_ROOT = os.environ.get("WORKSPACE_ROOT", "workspaces")
+WORKSPACE_TMPFS = os.environ.get("WORKSPACE_TMPFS", "0") == "1"
+WORKSPACE_TMPFS_ROOT = "/dev/shm/ocr-api-workspaces"
+# Dung lượng tối đa mỗi workspace và dung lượng trống tối thiểu phải còn lại trên volume
+WORKSPACE_QUOTA_BYTES = int(os.environ.get("WORKSPACE_QUOTA_BYTES", str(10 * 1024 * 1024 * 1024)))
+WORKSPACE_MIN_FREE_BYTES = int(os.environ.get("WORKSPACE_MIN_FREE_BYTES", str(1024 * 1024 * 1024)))
+# Janitor xóa workspace mồ côi (process chết giữa chừng) cũ hơn WORKSPACE_MAX_AGE_S
+WORKSPACE_MAX_AGE_S = int(os.environ.get("WORKSPACE_MAX_AGE_S", str(6 * 3600)))
+WORKSPACE_JANITOR_INTERVAL_S = int(os.environ.get("WORKSPACE_JANITOR_INTERVAL_S", "600"))
+# Workspace đang dùng có file heartbeat được touch định kỳ; janitor của mọi worker/process nhìn
+# mtime của file này (không phải tập _active của riêng process) để biết workspace còn sống
+WORKSPACE_HEARTBEAT_FILE = ".heartbeat"
+WORKSPACE_HEARTBEAT_INTERVAL_S = int(os.environ.get("WORKSPACE_HEARTBEAT_INTERVAL_S", "60"))
+
+_active = set()
+_active_lock = threading.Lock()
+_heartbeat_thread = None
+
+
+def _touch_heartbeat(path):
+    try:
+        with open(os.path.join(path, WORKSPACE_HEARTBEAT_FILE), "a"):
+            pass
+        os.utime(os.path.join(path, WORKSPACE_HEARTBEAT_FILE))
+    except OSError:
+        pass
+
+
+def _heartbeat_loop():
+    while True:
+        time.sleep(WORKSPACE_HEARTBEAT_INTERVAL_S)
+        with _active_lock:
+            paths = list(_active)
+        for path in paths:
+            _touch_heartbeat(path)
+
+
+def _ensure_heartbeat():
+    """Thread nền (một cho mỗi process) touch heartbeat của các workspace đang dùng."""
+    global _heartbeat_thread
+    with _active_lock:
+        if _heartbeat_thread is None:
+            _heartbeat_thread = threading.Thread(target=_heartbeat_loop, name="workspace-heartbeat", daemon=True)
+            _heartbeat_thread.start()
+
+
+def workspace_root():
+    if WORKSPACE_TMPFS and os.path.isdir("/dev/shm"):
+        return WORKSPACE_TMPFS_ROOT
+    return WORKSPACE_ROOT
+
+
+class WorkspaceQuotaExceeded(HTTPException):
+    def __init__(self, detail):
+        super().__init__(status_code=507, detail=detail)
+
+
+class Workspace:
+    """
+    Thư mục riêng cho một request/job. Mọi file tạm của job nằm trong đây nên các job chạy song song
+    không ghi đè lên nhau; `cleanup()` xóa toàn bộ một lần. Tên file được giữ nguyên (basename) vì
+    upload_file_to_s3 dùng tên file làm key trên S3.
+    """
+
+    def __init__(self, job="job", root=None, quota_bytes=WORKSPACE_QUOTA_BYTES):
+        root = root or workspace_root()
+        os.makedirs(root, exist_ok=True)
+        self.quota_bytes = quota_bytes
+        self.path = tempfile.mkdtemp(prefix=f"{job}_", dir=root)
+        _touch_heartbeat(self.path)
+        with _active_lock:
+            _active.add(self.path)
+        _ensure_heartbeat()
+
+    def file(self, name, subdir=None):
+        """Đường dẫn file trong workspace (chỉ lấy basename để không thoát ra ngoài thư mục)."""
+        directory = self.dir(subdir) if subdir else self.path
+        return os.path.join(directory, os.path.basename(name))
+
+    def dir(self, name):
+        path = os.path.join(self.path, os.path.basename(name))
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    def usage(self):
+        total = 0
+        for root, _, files in os.walk(self.path):
+            for name in files:
+                try:
+                    total += os.path.getsize(os.path.join(root, name))
+                except OSError:
+                    continue
+        return total
+
+    def check_quota(self, expected_bytes=0):
+        """Raise WorkspaceQuotaExceeded (HTTP 507) nếu job vượt quota hoặc volume sắp đầy."""
+        usage = self.usage()
+        if usage + expected_bytes > self.quota_bytes:
+            raise WorkspaceQuotaExceeded(
+                f"Workspace quota exceeded: {usage + expected_bytes} > {self.quota_bytes} bytes"
+            )
+        free = shutil.disk_usage(self.path).free
+        if free - expected_bytes < WORKSPACE_MIN_FREE_BYTES:
+            raise WorkspaceQuotaExceeded(f"Not enough free space for job workspace ({free} bytes free)")
+
+    def cleanup(self):
+        shutil.rmtree(self.path, ignore_errors=True)
+        with _active_lock:
+            _active.discard(self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.cleanup()
+        return False
+
+
+def last_heartbeat(path):
+    """mtime heartbeat của workspace (thư mục cũ chưa có heartbeat thì lấy mtime thư mục)."""
+    try:
+        return os.path.getmtime(os.path.join(path, WORKSPACE_HEARTBEAT_FILE))
+    except OSError:
+        return os.path.getmtime(path)
+
+
+def sweep_orphaned_workspaces(max_age_s=WORKSPACE_MAX_AGE_S, root=None):
+    """
+    Xóa các workspace không còn job nào dùng: heartbeat (xem _heartbeat_loop) đã dừng quá
+    `max_age_s`, kể cả workspace của worker/process khác. Trả về số thư mục đã xóa.
+    """
+    root = root or workspace_root()
+    if not os.path.isdir(root):
+        return 0
+    now = time.time()
+    removed = 0
+    for name in os.listdir(root):
+        path = os.path.join(root, name)
+        with _active_lock:
+            if path in _active:
+                continue
+        try:
+            if not os.path.isdir(path) or now - last_heartbeat(path) < max_age_s:
+                continue
+        except OSError:
+            continue
+        shutil.rmtree(path, ignore_errors=True)
+        removed += 1
+    return removed
+
+
+async def run_workspace_janitor(interval_s=WORKSPACE_JANITOR_INTERVAL_S, max_age_s=WORKSPACE_MAX_AGE_S):
+    """Task nền chạy trong lifespan của app, định kỳ dọn workspace mồ côi."""
+    while True:
+        try:
+            removed = await asyncio.to_thread(sweep_orphaned_workspaces, max_age_s)
+            if removed:
+                print(f"Workspace janitor: đã xóa {removed} workspace mồ côi")
+        except Exception as e:
+            print(f"Workspace janitor error: {e}")
+        await asyncio.sleep(interval_s)
@@ -1,5 +1,6 @@
 import uvicorn
 from app import create_app
+from app.modules.module.module_ffmpeg_runner import get_ffmpeg_metrics
 from fastapi.middleware.cors import CORSMiddleware
 
 app = create_app()
@@ -28,5 +29,9 @@ app.add_middleware(
 async def health_check():
     return {"status": "healthy"}
 
+@app.get("/metrics/ffmpeg")
+async def ffmpeg_metrics():
+    return get_ffmpeg_metrics()
+
 if __name__ == "__main__":
     uvicorn.run("app.main:app", host="localhost", port=8000, reload=True)
\ No newline at end of file
@@ -1,4 +1,4 @@
 from app.models.user import User, BlackListToken
-from app.models.video import Video, SRT, VIDEO_TTS
+from app.models.video import Video, SRT, VIDEO_TTS, SubtitleTrack
 
-__all__ = ["User", "BlackListToken", "Video", "SRT", "VIDEO_TTS"]
\ No newline at end of file
+__all__ = ["User", "BlackListToken", "Video", "SRT", "VIDEO_TTS", "SubtitleTrack"]
\ No newline at end of file
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, DateTime, ForeignKey
+from sqlalchemy import Column, String, DateTime, ForeignKey, Integer, Float, BigInteger, UniqueConstraint
 from sqlalchemy.orm import relationship
 from app.core.database import Base
 from app.core.config import utc_plus_7
@@ -12,6 +12,19 @@ class Video(Base):
     user_id = Column(String(36), ForeignKey("user.user_id", ondelete="CASCADE"), nullable=False)
     file_name = Column(String(255), nullable=False)
     file_url = Column(String(500), nullable=False)
+    # Video gốc chưa encode lại; mọi bản render (phụ đề, TTS, export) dựng từ file này
+    source_url = Column(String(500), nullable=True)
+    # Thông tin media của bản gốc, ffprobe một lần lúc upload (module_media_probe); các bước sau
+    # và API đọc từ đây thay vì mở lại file. NULL với video upload trước khi có probe
+    duration = Column(Float, nullable=True)
+    fps = Column(String(20), nullable=True)  # r_frame_rate, vd "30000/1001"
+    width = Column(Integer, nullable=True)
+    height = Column(Integer, nullable=True)
+    video_codec = Column(String(32), nullable=True)
+    audio_codec = Column(String(32), nullable=True)
+    keyframe_interval = Column(Float, nullable=True)  # giây, trung bình giữa hai keyframe
+    file_size = Column(BigInteger, nullable=True)
+    content_hash = Column(String(64), nullable=True)  # SHA-1 nội dung
     created_at = Column(DateTime, default=utc_plus_7)
 
     # Quan hệ với User
@@ -38,6 +51,8 @@ class SRT(Base):
 
     # Quan hệ với VIDEO_TTS và VIDEO_SUB
     video_tts = relationship("VIDEO_TTS", back_populates="srt", cascade="all, delete-orphan", passive_deletes=True)
+    # Quan hệ với SUBTITLE_TRACK (mỗi ngôn ngữ dịch một dòng)
+    tracks = relationship("SubtitleTrack", back_populates="srt", cascade="all, delete-orphan", passive_deletes=True)
     # video_sub = relationship("VIDEO_SUB", back_populates="srt", cascade="all, delete-orphan", passive_deletes=True)
 
 #  Model VIDEO_TTS
@@ -49,8 +64,32 @@ class VIDEO_TTS(Base):
     video_id = Column(String(36), ForeignKey("videos.video_id", ondelete="CASCADE"), nullable=False)
     video_tts_name = Column(String(255), nullable=False)
     video_tts_url = Column(String(500), nullable=False)
+    # Audio TTS đã dựng theo timeline, để export dựng lại từ video gốc mà không cần TTS lại
+    audio_url = Column(String(500), nullable=True)
+    voice = Column(String(100), nullable=True)
+    # Key stream video của RenderPlan đã tạo ra video_tts_url (RenderPlan.video_key, không gồm
+    # giọng): bản TTS mới cùng key chỉ cần thay audio
+    render_key = Column(String(64), nullable=True)
+    # Bản SRT đã dùng khi tạo (SRT của video có thể được sửa sau đó), export dựng lại từ bản này
+    srt_url = Column(String(500), nullable=True)
     created_at = Column(DateTime, default=utc_plus_7)
 
     # Quan hệ với SRT và Video
     srt = relationship("SRT", back_populates="video_tts")
     video = relationship("Video", back_populates="video_tts")
+
+#  Model SUBTITLE_TRACK - phụ đề đã dịch theo từng ngôn ngữ
+class SubtitleTrack(Base):
+    __tablename__ = "subtitle_track"
+    # Mỗi video chỉ có một track cho mỗi ngôn ngữ (upsert_subtitle_track dựa vào ràng buộc này)
+    __table_args__ = (UniqueConstraint("video_id", "language", name="uq_subtitle_track_video_language"),)
+
+    track_id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    srt_id = Column(String(36), ForeignKey("srt.srt_id", ondelete="CASCADE"), nullable=False)
+    video_id = Column(String(36), ForeignKey("videos.video_id", ondelete="CASCADE"), nullable=False)
+    language = Column(String(10), nullable=False)
+    srt_url = Column(String(500), nullable=False)
+    created_at = Column(DateTime, default=utc_plus_7)
+
+    # Quan hệ với SRT
+    srt = relationship("SRT", back_populates="tracks")
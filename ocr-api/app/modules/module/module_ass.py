@@ -0,0 +1,145 @@
+import os
+import pysrt
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", ".."))
+# Thư mục font nạp sẵn cho libass (filter `subtitles=...:fontsdir=`), mặc định `fonts/` của project
+ASS_FONTS_DIR = os.environ.get("ASS_FONTS_DIR", os.path.join(PROJECT_ROOT, "fonts"))
+# Kích thước trong preset tính theo khung cao 720px; libass tự scale theo độ phân giải thật của video
+ASS_PLAY_RES_Y = 720
+
+# Màu ASS dạng &HAABBGGRR (AA = 00 là không trong suốt)
+WHITE = "&H00FFFFFF"
+YELLOW = "&H0000FFFF"
+BLACK = "&H00000000"
+SHADOW = "&H80000000"
+
+# Preset style cho các đường burn-in
+#   border_style: 1 = viền + bóng, 3 = hộp nền (màu hộp lấy từ outline_colour)
+#   alignment: numpad (2 = giữa dưới, 8 = giữa trên)
+#   wrap_style: 0 = tự xuống dòng chia đều, 2 = chỉ xuống dòng ở \N
+ASS_PRESETS = {
+    # Phụ đề dịch: chữ trắng viền đen, giữa dưới
+    "default": {
+        "font": "Noto Sans",
+        "font_size": 40,
+        "bold": False,
+        "primary_colour": WHITE,
+        "outline_colour": BLACK,
+        "back_colour": SHADOW,
+        "border_style": 1,
+        "outline": 2,
+        "shadow": 1,
+        "alignment": 2,
+        "margin_lr": 40,
+        "margin_v": 30,
+        "wrap_style": 0,
+    },
+    # Video TTS: chữ vàng trên hộp đen, nằm trong thanh đen phía dưới (xem module_ffmpeg_render)
+    "tts": {
+        "font": "Arial",
+        "font_size": 35,
+        "bold": False,
+        "primary_colour": YELLOW,
+        "outline_colour": BLACK,
+        "back_colour": BLACK,
+        "border_style": 3,
+        "outline": 2,
+        "shadow": 0,
+        "alignment": 2,
+        "margin_lr": 50,
+        "margin_v": 20,
+        "wrap_style": 0,
+    },
+    # Video dọc 9:16: chữ đậm, đặt cao hơn mép dưới để tránh thanh điều khiển của player
+    "vertical": {
+        "font": "Noto Sans",
+        "font_size": 30,
+        "bold": True,
+        "primary_colour": WHITE,
+        "outline_colour": BLACK,
+        "back_colour": SHADOW,
+        "border_style": 1,
+        "outline": 3,
+        "shadow": 0,
+        "alignment": 2,
+        "margin_lr": 20,
+        "margin_v": 120,
+        "wrap_style": 0,
+    },
+}
+
+
+def get_preset(name):
+    if name not in ASS_PRESETS:
+        raise ValueError(f"Unknown subtitle preset: {name}")
+    return ASS_PRESETS[name]
+
+
+def format_ass_time(seconds):
+    """Thời gian ASS dạng H:MM:SS.cc (centisecond)."""
+    centiseconds = max(0, int(round(seconds * 100)))
+    hours, centiseconds = divmod(centiseconds, 360000)
+    minutes, centiseconds = divmod(centiseconds, 6000)
+    secs, centiseconds = divmod(centiseconds, 100)
+    return f"{hours}:{minutes:02d}:{secs:02d}.{centiseconds:02d}"
+
+
+def escape_ass_text(text):
+    """Text phụ đề thành text ASS: xuống dòng thành \\N, ngoặc nhọn (mở override tag) đổi sang ngoặc tròn."""
+    text = text.replace("\r\n", "\n").replace("\r", "\n").strip()
+    text = text.replace("{", "(").replace("}", ")")
+    return "\\N".join(line.strip() for line in text.split("\n"))
+
+
+def cues_from_srt(srt_path):
+    """Đọc SRT thành list cue (start_seconds, end_seconds, text)."""
+    subs = pysrt.open(srt_path, encoding="utf-8")
+    return [(sub.start.ordinal / 1000, sub.end.ordinal / 1000, sub.text) for sub in subs]
+
+
+def build_ass(cues, preset="default", width=None, height=None):
+    """
+    Tạo nội dung script ASS từ list cue (start_seconds, end_seconds, text) với style theo preset.
+    `width`/`height` là kích thước video để giữ đúng tỉ lệ khung (mặc định 16:9).
+    """
+    style = get_preset(preset)
+    play_res_x = round(ASS_PLAY_RES_Y * width / height) if width and height else 1280
+
+    lines = [
+        "[Script Info]",
+        "ScriptType: v4.00+",
+        f"PlayResX: {play_res_x}",
+        f"PlayResY: {ASS_PLAY_RES_Y}",
+        f"WrapStyle: {style['wrap_style']}",
+        "ScaledBorderAndShadow: yes",
+        "",
+        "[V4+ Styles]",
+        "Format: Name, Fontname, Fontsize, PrimaryColour, SecondaryColour, OutlineColour, BackColour, "
+        "Bold, Italic, Underline, StrikeOut, ScaleX, ScaleY, Spacing, Angle, BorderStyle, Outline, Shadow, "
+        "Alignment, MarginL, MarginR, MarginV, Encoding",
+        f"Style: Default,{style['font']},{style['font_size']},{style['primary_colour']},{style['primary_colour']},"
+        f"{style['outline_colour']},{style['back_colour']},{-1 if style['bold'] else 0},0,0,0,100,100,0,0,"
+        f"{style['border_style']},{style['outline']},{style['shadow']},{style['alignment']},"
+        f"{style['margin_lr']},{style['margin_lr']},{style['margin_v']},1",
+        "",
+        "[Events]",
+        "Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text",
+    ]
+    for start, end, text in cues:
+        if end <= start or not text.strip():
+            continue
+        lines.append(
+            f"Dialogue: 0,{format_ass_time(start)},{format_ass_time(end)},Default,,0,0,0,,{escape_ass_text(text)}"
+        )
+    return "\n".join(lines) + "\n"
+
+
+def write_ass(cues, output_path, preset="default", width=None, height=None):
+    with open(output_path, "w", encoding="utf-8") as ass_file:
+        ass_file.write(build_ass(cues, preset, width, height))
+    return output_path
+
+
+def srt_to_ass(srt_path, output_path, preset="default", width=None, height=None):
+    """Chuyển file SRT sang ASS đã style, dùng cho filter `subtitles` (libass)."""
+    return write_ass(cues_from_srt(srt_path), output_path, preset, width, height)
@@ -0,0 +1,85 @@
+import os
+import wave
+import numpy as np
+from app.modules.module.module_cue_fitting import fit_cues, summarize_fit_report
+from app.modules.module.module_ffmpeg_runner import FFmpegError, run_ffmpeg_pipe
+
+# Audio TTS (edge-tts) là mono 24kHz, giữ nguyên để không phải resample
+ASSEMBLER_SAMPLE_RATE = int(os.environ.get("ASSEMBLER_SAMPLE_RATE", "24000"))
+
+
+def probe_duration(path):
+    """Độ dài media (giây) theo ffprobe, None nếu không đọc được."""
+    try:
+        output = run_ffmpeg_pipe(
+            ["ffprobe", "-i", path, "-show_entries", "format=duration", "-v", "quiet", "-of", "csv=p=0"],
+            label="ffprobe duration"
+        )
+        return float(output.decode("utf-8", errors="ignore").strip())
+    except (FFmpegError, ValueError):
+        return None
+
+
+def decode_to_pcm(path, sample_rate=ASSEMBLER_SAMPLE_RATE):
+    """Giải mã file audio thành mảng int16 mono qua pipe ffmpeg (không ghi file tạm)."""
+    output = run_ffmpeg_pipe(
+        ["ffmpeg", "-v", "error", "-i", path, "-f", "s16le", "-ac", "1", "-ar", str(sample_rate), "pipe:1"],
+        label="decode pcm"
+    )
+    return np.frombuffer(output, dtype=np.int16)
+
+
+def decode_bytes_to_pcm(data, sample_rate=ASSEMBLER_SAMPLE_RATE):
+    """Giống decode_to_pcm nhưng đọc audio đã nén (mp3...) từ bộ nhớ qua stdin."""
+    output = run_ffmpeg_pipe(
+        ["ffmpeg", "-v", "error", "-i", "pipe:0", "-f", "s16le", "-ac", "1", "-ar", str(sample_rate), "pipe:1"],
+        input_bytes=data, label="decode pcm"
+    )
+    return np.frombuffer(output, dtype=np.int16)
+
+
+def write_wav(samples, output_path, sample_rate=ASSEMBLER_SAMPLE_RATE):
+    with wave.open(output_path, "wb") as wav_file:
+        wav_file.setnchannels(1)
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(sample_rate)
+        wav_file.writeframes(samples.astype(np.int16).tobytes())
+
+
+def assemble_timeline(clips, output_path, duration_s=None, sample_rate=ASSEMBLER_SAMPLE_RATE):
+    """
+    Đặt audio từng cue đúng vị trí bắt đầu của nó trên một timeline PCM rồi ghi ra một file WAV.
+
+    `clips` là list (start_ms, samples) với samples là mảng PCM int16 mono. Slot của mỗi cue kéo dài tới
+    cue tiếp theo (cue cuối tới `duration_s` nếu có); cue tràn slot được co lại trong giới hạn
+    của module_cue_fitting, phần còn tràn được báo cáo là sync error.
+    Kết quả chưa nén, nên audio chỉ bị encode một lần khi ghép vào video.
+
+    Trả về (output_path, fit_report).
+    """
+    clips = sorted(clips, key=lambda clip: clip[0])
+    starts = [int(start_ms * sample_rate / 1000) for start_ms, _ in clips]
+    total_samples = int(duration_s * sample_rate) if duration_s else None
+
+    slots = [starts[index + 1] - starts[index] for index in range(len(starts) - 1)]
+    if starts:
+        slots.append(max(total_samples - starts[-1], 0) if total_samples is not None else None)
+
+    samples_list = [samples for _, samples in clips]
+    samples_list, fit_report = fit_cues(samples_list, slots, sample_rate)
+    placed = list(zip(starts, samples_list))
+
+    if total_samples is None:
+        total_samples = max((start + len(samples) for start, samples in placed), default=0)
+
+    # Cộng dồn trên int32 rồi cắt về int16 để các cue chồng nhau không bị tràn số
+    timeline = np.zeros(total_samples, dtype=np.int32)
+    for start, samples in placed:
+        end = min(start + len(samples), total_samples)
+        if end > start:
+            timeline[start:end] += samples[:end - start]
+    timeline = np.clip(timeline, -32768, 32767)
+
+    write_wav(timeline, output_path, sample_rate)
+    print(f"Đã ghép {len(placed)} cue lên timeline: {output_path} {summarize_fit_report(fit_report)}")
+    return output_path, fit_report
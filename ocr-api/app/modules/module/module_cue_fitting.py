@@ -0,0 +1,121 @@
+import os
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from app.modules.module.module_ffmpeg_runner import run_ffmpeg_pipe
+
+# Hệ số tăng tốc tối đa cho một cue; vượt quá mức này giọng đọc nghe không còn tự nhiên
+TTS_MAX_STRETCH = float(os.environ.get("TTS_MAX_STRETCH", "1.3"))
+TTS_FIT_WORKERS = int(os.environ.get("TTS_FIT_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool():
+    """
+    Thread pool dùng chung. Việc co giãn chạy trong process ffmpeg con nên thread là đủ song song;
+    không fork process server (đang có thread giữ lock của uvicorn/PaddleOCR).
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=TTS_FIT_WORKERS, thread_name_prefix="tts-fit")
+        return _pool
+
+
+def atempo_chain(factor):
+    """Chuỗi filter atempo cho hệ số bất kỳ (mỗi atempo chỉ nhận 0.5 - 2.0)."""
+    filters = []
+    while factor > 2.0:
+        filters.append("atempo=2.0")
+        factor /= 2
+    while factor < 0.5:
+        filters.append("atempo=0.5")
+        factor *= 2
+    filters.append(f"atempo={factor:.4f}")
+    return ",".join(filters)
+
+
+def time_stretch_pcm(samples, factor, sample_rate):
+    """Tăng tốc / giảm tốc PCM int16 mono bằng atempo qua pipe, giữ nguyên cao độ giọng nói."""
+    pcm_format = ["-f", "s16le", "-ac", "1", "-ar", str(sample_rate)]
+    output = run_ffmpeg_pipe(
+        ["ffmpeg", "-v", "error", *pcm_format, "-i", "pipe:0",
+         "-filter:a", atempo_chain(factor), *pcm_format, "pipe:1"],
+        input_bytes=samples.tobytes(), label="atempo"
+    )
+    return np.frombuffer(output, dtype=np.int16)
+
+
+def _stretch_worker(samples, factor, sample_rate):
+    """Chạy trong worker: co giãn một cue, trả về (samples, thời gian co giãn tính bằng giây)."""
+    started = time.perf_counter()
+    stretched = time_stretch_pcm(samples, factor, sample_rate)
+    return stretched, time.perf_counter() - started
+
+
+def stretch_factor(natural_samples, slot_samples, max_stretch=TTS_MAX_STRETCH):
+    """
+    Hệ số tăng tốc cho cue: 1.0 nếu vừa slot hoặc không giới hạn (None), không vượt quá
+    `max_stretch`. Slot rỗng (hai cue cùng thời điểm bắt đầu) nhận hệ số tối đa.
+    """
+    if slot_samples is None or natural_samples <= slot_samples:
+        return 1.0
+    if slot_samples <= 0:
+        return max_stretch
+    return min(natural_samples / slot_samples, max_stretch)
+
+
+def fit_cues(clips, slots, sample_rate, max_stretch=TTS_MAX_STRETCH):
+    """
+    Khớp độ dài từng cue với slot của nó dựa trên độ dài thật của audio đã tổng hợp.
+
+    `clips` là list mảng PCM, `slots` là list số sample tối đa của từng cue (None = không giới hạn).
+    Chỉ cue bị tràn mới được co giãn, song song trong thread pool (mỗi cue một process ffmpeg).
+    Trả về (fitted, report); report có một dict cho mỗi cue gồm độ dài gốc, slot, hệ số, độ dài
+    sau khi khớp, sync error (phần còn tràn, ms), `fit` (cue nằm gọn trong slot) và thời gian
+    co giãn (ms).
+    """
+    to_ms = 1000 / sample_rate
+    fitted = list(clips)
+    report = []
+    futures = {}
+
+    for index, (samples, slot) in enumerate(zip(clips, slots)):
+        factor = stretch_factor(len(samples), slot, max_stretch)
+        report.append({
+            "index": index,
+            "natural_ms": round(len(samples) * to_ms),
+            "slot_ms": round(max(slot, 0) * to_ms) if slot is not None else None,
+            "factor": round(factor, 3),
+            "stretch_ms": 0.0,
+        })
+        if factor > 1.0:
+            futures[index] = _get_pool().submit(_stretch_worker, samples, factor, sample_rate)
+
+    for index, future in futures.items():
+        fitted[index], elapsed = future.result()
+        report[index]["stretch_ms"] = round(elapsed * 1000, 1)
+
+    for entry, samples, slot in zip(report, fitted, slots):
+        overflow = max(0, len(samples) - max(slot, 0)) if slot is not None else 0
+        entry["fitted_ms"] = round(len(samples) * to_ms)
+        entry["sync_error_ms"] = round(overflow * to_ms)
+        entry["fit"] = overflow == 0
+
+    return fitted, report
+
+
+def summarize_fit_report(report):
+    """Tóm tắt report để log: số cue bị co, số cue vẫn tràn, tổng thời gian co giãn, sync error trung bình / lớn nhất."""
+    errors = [entry["sync_error_ms"] for entry in report]
+    return {
+        "cues": len(report),
+        "stretched": sum(1 for entry in report if entry["factor"] > 1.0),
+        "unfit": sum(1 for entry in report if not entry["fit"]),
+        "stretch_ms": round(sum(entry["stretch_ms"] for entry in report), 1),
+        "mean_sync_error_ms": round(sum(errors) / len(errors), 1) if errors else 0.0,
+        "max_sync_error_ms": max(errors, default=0),
+    }
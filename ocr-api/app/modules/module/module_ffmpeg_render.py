@@ -0,0 +1,396 @@
+import os
+import json
+import time
+import asyncio
+import hashlib
+import tempfile
+from app.modules.module.module_ass import ASS_FONTS_DIR, srt_to_ass
+from app.modules.module.module_segment_encode import encode_in_segments, should_segment
+from app.modules.module.module_ffmpeg_runner import FFMPEG_STDERR_TAIL_BYTES, FFmpegError, run_ffmpeg, run_ffmpeg_pipe
+
+# Tham số encode cho mọi bản render
+RENDER_PRESET = os.environ.get("RENDER_PRESET", "veryfast")
+RENDER_CRF = int(os.environ.get("RENDER_CRF", "23"))
+RENDER_AUDIO_BITRATE = os.environ.get("RENDER_AUDIO_BITRATE", "128k")
+
+# Thanh đen phía dưới video, phụ đề (preset "tts") nằm trên thanh này
+BAR_HEIGHT = 100
+
+# Stream export: fragmented MP4 (moov rỗng ở đầu, mỗi fragment bắt đầu tại keyframe) ghi được
+# ra pipe nên client nhận byte đầu tiên trong khi vẫn đang encode
+STREAM_CHUNK_SIZE = 256 * 1024
+STREAM_MOVFLAGS = "frag_keyframe+empty_moov+default_base_moof"
+
+
+def probe_video_stream(path):
+    """Thông tin stream video đầu tiên theo ffprobe: width, height, fps (chuỗi r_frame_rate) và duration."""
+    output = run_ffmpeg_pipe(
+        ["ffprobe", "-v", "error", "-select_streams", "v:0",
+         "-show_entries", "stream=width,height,r_frame_rate:format=duration", "-of", "json", path],
+        label="ffprobe"
+    )
+    info = json.loads(output)
+    stream = (info.get("streams") or [{}])[0]
+    duration = info.get("format", {}).get("duration")
+    return {
+        "width": stream.get("width"),
+        "height": stream.get("height"),
+        "fps": stream.get("r_frame_rate"),
+        "duration": float(duration) if duration else None,
+    }
+
+
+def file_digest(path):
+    """SHA-1 nội dung file, dùng làm định danh input khi tính key của RenderPlan."""
+    digest = hashlib.sha1()
+    with open(path, "rb") as input_file:
+        for chunk in iter(lambda: input_file.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def escape_filter_value(value):
+    """
+    Escape giá trị option đặt trong filtergraph của ffmpeg, theo hai lớp: lớp option của filter
+    (\\ ' :) rồi lớp filtergraph (\\ ' [ ] , ;).
+    """
+    for char in ("\\", "'", ":"):
+        value = value.replace(char, "\\" + char)
+    for char in ("\\", "'", "[", "]", ",", ";"):
+        value = value.replace(char, "\\" + char)
+    return value
+
+
+def subtitles_filter(ass_file):
+    """Filter `subtitles` của libass cho file ASS, nạp font từ ASS_FONTS_DIR."""
+    return (
+        f"subtitles=filename={escape_filter_value(ass_file)}"
+        f":fontsdir={escape_filter_value(ASS_FONTS_DIR)}"
+    )
+
+
+# Preset export "<độ phân giải>_<tỉ lệ>" -> khung (width, height)
+EXPORT_PRESETS = {
+    "480_16x9": (854, 480),
+    "720_16x9": (1280, 720),
+    "1080_16x9": (1920, 1080),
+    "480_9x16": (480, 854),
+    "720_9x16": (720, 1280),
+    "1080_9x16": (1080, 1920),
+}
+EXPORT_DEFAULT_PRESET = "1080_9x16"
+# Các preset được dựng cùng nhau trong một lần decode khi bản export chưa có trong cache
+EXPORT_LADDER = [
+    name for name in (name.strip() for name in os.environ.get("EXPORT_LADDER", ",".join(EXPORT_PRESETS)).split(","))
+    if name in EXPORT_PRESETS
+]
+
+
+class RenderPlan:
+    """
+    Mô tả một bản render dựng từ video gốc (chưa encode lại lần nào): burn-in phụ đề, thanh đen,
+    thay audio TTS và scale/pad khung hình. Mọi thao tác được gộp vào một filtergraph và encode
+    đúng một lần cho mỗi output, thay vì encode nối tiếp qua từng bước.
+    """
+
+    def __init__(self, source, output, subtitles=None, subtitle_preset="default", subtitle_bar=False,
+                 audio=None, frame_size=None, video_track=None, audio_title=None,
+                 alternate_audio=None, source_info=None):
+        self.source = source
+        # Thông tin nguồn dạng probe_video_stream đã lưu lúc ingest (module_media_probe);
+        # None thì ffprobe lại plan.source
+        self.source_info = source_info
+        self.output = output
+        # SRT burn-in (chuyển sang ASS theo preset) và thanh đen dưới phụ đề (video TTS)
+        self.subtitles = subtitles
+        self.subtitle_preset = subtitle_preset
+        self.subtitle_bar = subtitle_bar
+        # Audio thay thế (track TTS đã dựng theo timeline); None = giữ audio gốc
+        self.audio = audio
+        # (width, height) khung output: scale giữ tỉ lệ rồi pad viền đen
+        self.frame_size = frame_size
+        # File đã render có stream video đúng bằng kết quả các thao tác video của plan: chỉ audio
+        # thay đổi nên stream video được copy (-c:v copy), không decode/encode lại
+        self.video_track = video_track
+        # Tên (metadata title) của track audio chính và các track audio phụ [(path, title)],
+        # ví dụ nhiều giọng TTS trong cùng một MP4. Track phụ chỉ dùng khi có video_track
+        self.audio_title = audio_title
+        self.alternate_audio = alternate_audio or []
+
+    def operations(self):
+        """Các thao tác của plan, dùng để log và tính key."""
+        operations = {}
+        if self.subtitle_bar:
+            operations["bar"] = BAR_HEIGHT
+        if self.subtitles:
+            operations["subtitles"] = self.subtitle_preset
+        if self.audio:
+            operations["audio"] = "replace"
+        if self.frame_size:
+            operations["frame"] = "x".join(str(value) for value in self.frame_size)
+        return operations
+
+    def key(self, **identity):
+        """
+        Key ổn định của bản render: thao tác + định danh của input (URL trên S3, voice...).
+        Đường dẫn local nằm trong workspace ngẫu nhiên nên caller truyền định danh qua `identity`.
+        """
+        payload = json.dumps({"operations": self.operations(), **identity}, sort_keys=True)
+        return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+    def video_key(self, **identity):
+        """
+        Key của riêng stream video (bỏ audio khỏi thao tác): các plan cùng video_key cho stream
+        video giống hệt nhau, chỉ khác audio, nên có thể dùng làm video_track cho nhau.
+        """
+        operations = self.operations()
+        operations.pop("audio", None)
+        payload = json.dumps({"operations": operations, **identity}, sort_keys=True)
+        return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+    def label(self):
+        """Nhãn metrics của lần encode: preset x264 + thao tác (module_ffmpeg_runner)."""
+        operations = ",".join(f"{name}={value}" for name, value in self.operations().items())
+        return f"{RENDER_PRESET} {operations or 'reencode'}"
+
+
+def video_encoder_args():
+    return ["-c:v", "libx264", "-preset", RENDER_PRESET, "-crf", str(RENDER_CRF), "-pix_fmt", "yuv420p"]
+
+
+def overlay_filters(plan, ass_file=None):
+    """Filter vẽ lên khung gốc (thanh đen, phụ đề), trước khi scale."""
+    filters = []
+    if plan.subtitle_bar:
+        filters.append(f"drawbox=x=0:y=ih-{BAR_HEIGHT}:w=iw:h={BAR_HEIGHT}:color=black:t=fill")
+    if ass_file:
+        filters.append(subtitles_filter(ass_file))
+    return filters
+
+
+def frame_filters(frame_size):
+    """Scale giữ tỉ lệ (cạnh chẵn cho yuv420p) rồi pad viền đen về đúng khung `frame_size`."""
+    width, height = frame_size
+    return [
+        f"scale={width}:{height}:force_original_aspect_ratio=decrease:force_divisible_by=2",
+        f"pad={width}:{height}:(ow-iw)/2:(oh-ih)/2:black",
+    ]
+
+
+def build_filtergraph(plan, ass_file=None, offset=0):
+    """
+    Ghép các filter video của plan thành một chuỗi, ra nhãn [v]. `offset` (giây) là thời điểm
+    bắt đầu của segment khi encode theo đoạn: timestamp được dời về thời gian gốc để phụ đề
+    khớp, rồi đưa lại về 0 ở cuối chuỗi.
+    """
+    filters = [f"setpts=PTS+{offset:.6f}/TB"] if offset else []
+    filters += overlay_filters(plan, ass_file)
+    if plan.frame_size:
+        filters += frame_filters(plan.frame_size)
+    if offset:
+        filters.append("setpts=PTS-STARTPTS")
+    return f"[0:v]{','.join(filters) or 'null'}[v]"
+
+
+def audio_encoder_args(plan):
+    # Track TTS được encode sang AAC; không thay audio thì copy audio gốc
+    if plan.audio:
+        return ["-c:a", "aac", "-b:a", RENDER_AUDIO_BITRATE]
+    return ["-c:a", "copy"]
+
+
+def build_render_command(plan, info, ass_file=None, output_args=None):
+    command = ["ffmpeg", "-y", "-v", "error", "-i", plan.source]
+    if plan.audio:
+        command += ["-i", plan.audio]
+    command += ["-filter_complex", build_filtergraph(plan, ass_file), "-map", "[v]", *video_encoder_args()]
+    if plan.audio:
+        # Track TTS dài bằng video, cắt theo độ dài video để output không dài hơn nguồn
+        command += ["-map", "1:a", *audio_encoder_args(plan), "-t", f"{info['duration']:.3f}"]
+        if plan.audio_title:
+            command += ["-metadata:s:a:0", f"title={plan.audio_title}"]
+    else:
+        command += ["-map", "0:a?", *audio_encoder_args(plan)]
+    command += output_args or ["-movflags", "+faststart", plan.output]
+    return command
+
+
+def build_remux_command(plan, duration):
+    """Copy stream video của plan.video_track, thay audio bằng plan.audio (mặc định) và các track phụ."""
+    tracks = [(plan.audio, plan.audio_title), *plan.alternate_audio]
+    command = ["ffmpeg", "-y", "-v", "error", "-i", plan.video_track]
+    for path, _ in tracks:
+        command += ["-i", path]
+    command += ["-map", "0:v"]
+    for index in range(len(tracks)):
+        command += ["-map", f"{index + 1}:a"]
+    command += ["-c:v", "copy", "-c:a", "aac", "-b:a", RENDER_AUDIO_BITRATE]
+    for index, (_, title) in enumerate(tracks):
+        command += [f"-disposition:a:{index}", "default" if index == 0 else "0"]
+        if title:
+            command += [f"-metadata:s:a:{index}", f"title={title}"]
+    command += ["-t", f"{duration:.3f}", "-movflags", "+faststart", plan.output]
+    return command
+
+
+def remux_audio(plan):
+    """Đường nhanh khi chỉ audio thay đổi: không encode video, thời gian chủ yếu là I/O."""
+    info = probe_video_stream(plan.video_track)
+    if not info["duration"] or info["duration"] <= 0:
+        raise RuntimeError(f"Video có độ dài không hợp lệ: {plan.video_track}")
+
+    started = time.perf_counter()
+    run_ffmpeg(build_remux_command(plan, info["duration"]), label="remux audio", duration=info["duration"])
+    print(
+        f"Remux audio xong {plan.output} ({1 + len(plan.alternate_audio)} track, video copy): "
+        f"{time.perf_counter() - started:.1f}s cho {info['duration']:.1f}s video"
+    )
+    return plan.output
+
+
+def prepare_source(plan, output):
+    """Probe video nguồn và chuyển phụ đề của plan sang ASS cạnh `output`. Trả về (info, ass_file)."""
+    info = plan.source_info or probe_video_stream(plan.source)
+    if not info["duration"] or info["duration"] <= 0 or not info["height"]:
+        raise RuntimeError(f"Video có độ dài hoặc kích thước không hợp lệ: {plan.source}")
+
+    ass_file = None
+    if plan.subtitles:
+        ass_file = srt_to_ass(
+            plan.subtitles, os.path.splitext(output)[0] + ".ass",
+            plan.subtitle_preset, info["width"], info["height"]
+        )
+    return info, ass_file
+
+
+def build_ladder_command(plan, info, renditions, ass_file=None):
+    """
+    Một lần decode cho nhiều output: chuỗi filter chung (thanh đen, phụ đề) chạy một lần rồi
+    `split` ra từng nhánh scale/pad theo khung của rendition. `renditions`: list (output, (width, height)).
+    """
+    count = len(renditions)
+    shared = ",".join(overlay_filters(plan, ass_file)) or "null"
+    graph = [f"[0:v]{shared},split={count}{''.join(f'[s{index}]' for index in range(count))}"]
+    for index, (_, frame_size) in enumerate(renditions):
+        graph.append(f"[s{index}]{','.join(frame_filters(frame_size))}[v{index}]")
+
+    command = ["ffmpeg", "-y", "-v", "error", "-i", plan.source]
+    if plan.audio:
+        command += ["-i", plan.audio]
+    command += ["-filter_complex", ";".join(graph)]
+    for index, (output, _) in enumerate(renditions):
+        command += ["-map", f"[v{index}]", *video_encoder_args()]
+        if plan.audio:
+            command += ["-map", "1:a", *audio_encoder_args(plan), "-t", f"{info['duration']:.3f}"]
+        else:
+            command += ["-map", "0:a?", *audio_encoder_args(plan)]
+        command += ["-movflags", "+faststart", output]
+    return command
+
+
+def execute_ladder(plan, renditions):
+    """
+    Dựng nhiều rendition (khung hình khác nhau) của cùng plan trong một lần ffmpeg, decode và
+    burn-in phụ đề một lần (plan.frame_size và plan.output bị bỏ qua).
+    Trả về list đường dẫn output, raise RuntimeError nếu ffmpeg lỗi.
+    """
+    info, ass_file = prepare_source(plan, renditions[0][0])
+    started = time.perf_counter()
+    run_ffmpeg(
+        build_ladder_command(plan, info, renditions, ass_file),
+        label=f"{RENDER_PRESET} ladder x{len(renditions)}", duration=info["duration"]
+    )
+    elapsed = time.perf_counter() - started
+
+    print(
+        f"Render {len(renditions)} rendition {[size for _, size in renditions]} {plan.operations()}: "
+        f"{elapsed:.1f}s cho {info['duration']:.1f}s video (một lần decode)"
+    )
+    return [output for output, _ in renditions]
+
+
+def execute_plan(plan):
+    """
+    Chạy plan trong một lần ffmpeg, giữ nguyên fps của video nguồn. Video dài được encode theo
+    các đoạn cắt tại keyframe song song (module_segment_encode), cùng filtergraph.
+    Phụ đề được chuyển sang ASS (module_ass) ghi cạnh output. Plan có `video_track` (chỉ audio
+    thay đổi) thì chỉ remux audio. Trả về plan.output, raise RuntimeError nếu ffmpeg lỗi.
+    """
+    if plan.video_track and plan.audio:
+        return remux_audio(plan)
+
+    info, ass_file = prepare_source(plan, plan.output)
+    started = time.perf_counter()
+    segmented = None
+    if should_segment(info["duration"]):
+        segmented = encode_in_segments(
+            plan.source, plan.output, lambda offset: build_filtergraph(plan, ass_file, offset),
+            video_encoder_args(), info["duration"], audio_file=plan.audio, audio_args=audio_encoder_args(plan)
+        )
+    if not segmented:
+        run_ffmpeg(build_render_command(plan, info, ass_file), label=plan.label(), duration=info["duration"])
+    elapsed = time.perf_counter() - started
+
+    print(
+        f"Render xong {plan.output} {plan.operations()}: {elapsed:.1f}s cho {info['duration']:.1f}s video "
+        f"({info['duration'] / elapsed:.2f}x realtime, fps nguồn {info['fps']})"
+    )
+    return plan.output
+
+
+async def stream_plan(plan, tee_path=None):
+    """
+    Chạy plan (một output, không chia segment) và yield từng chunk fragmented MP4 ngay khi ffmpeg
+    ghi ra stdout. `plan.source` có thể là URL (ffmpeg đọc dần, không cần tải trước); ASS ghi
+    cạnh plan.output. `tee_path`: đồng thời ghi toàn bộ stream ra file (để lưu cache).
+    Raise RuntimeError sau chunk cuối nếu ffmpeg lỗi; generator bị đóng sớm thì ffmpeg bị dừng.
+    """
+    info, ass_file = await asyncio.to_thread(prepare_source, plan, plan.output)
+    command = build_render_command(
+        plan, info, ass_file, output_args=["-f", "mp4", "-movflags", STREAM_MOVFLAGS, "pipe:1"]
+    )
+    started = time.perf_counter()
+    # stdout là dữ liệu nên không dùng -progress; stderr ghi ra file tạm: pipe stderr đầy
+    # trong khi đang đọc stdout sẽ làm ffmpeg treo
+    with tempfile.TemporaryFile() as stderr_file:
+        process = await asyncio.create_subprocess_exec(
+            *command, stdout=asyncio.subprocess.PIPE, stderr=stderr_file
+        )
+        tee_file = open(tee_path, "wb") if tee_path else None
+        try:
+            first_chunk_at = None
+            while True:
+                chunk = await process.stdout.read(STREAM_CHUNK_SIZE)
+                if not chunk:
+                    break
+                if first_chunk_at is None:
+                    first_chunk_at = time.perf_counter() - started
+                if tee_file:
+                    tee_file.write(chunk)
+                yield chunk
+
+            returncode = await process.wait()
+            if returncode != 0:
+                stderr_file.seek(max(0, stderr_file.seek(0, os.SEEK_END) - FFMPEG_STDERR_TAIL_BYTES))
+                raise FFmpegError("stream", returncode, stderr_file.read().decode("utf-8", errors="ignore"))
+            print(
+                f"Stream xong {plan.operations()}: byte đầu sau {first_chunk_at or 0:.1f}s, "
+                f"tổng {time.perf_counter() - started:.1f}s cho {info['duration']:.1f}s video"
+            )
+        finally:
+            if tee_file:
+                tee_file.close()
+            if process.returncode is None:
+                process.kill()
+                await process.wait()
+
+
+def render_dubbed_video(video_file, audio_file, srt_file, output_video, preset="tts", frame_size=None):
+    """
+    Dựng video TTS trong một lần chạy ffmpeg: thanh đen + phụ đề (libass) trên video gốc,
+    thay audio bằng track TTS đã khớp timeline, tùy chọn scale/pad về `frame_size`.
+    """
+    return execute_plan(RenderPlan(
+        video_file, output_video, subtitles=srt_file, subtitle_preset=preset, subtitle_bar=True,
+        audio=audio_file, frame_size=frame_size
+    ))
@@ -0,0 +1,195 @@
+import os
+import time
+import socket
+import itertools
+import threading
+import subprocess
+
+# Thời gian tối đa cho một lần chạy ffmpeg (giây, 0 = không giới hạn) và số byte cuối của
+# stderr được giữ lại để báo lỗi (không ghi log stderr khi thành công)
+FFMPEG_TIMEOUT_S = float(os.environ.get("FFMPEG_TIMEOUT_S", "3600"))
+FFMPEG_STDERR_TAIL_BYTES = int(os.environ.get("FFMPEG_STDERR_TAIL_BYTES", "4000"))
+# Chu kỳ in tiến độ của job đang chạy
+FFMPEG_PROGRESS_LOG_INTERVAL_S = float(os.environ.get("FFMPEG_PROGRESS_LOG_INTERVAL_S", "10"))
+
+NODE_NAME = socket.gethostname()
+
+_lock = threading.Lock()
+# job đang chạy: job_id -> tiến độ mới nhất; metrics tổng hợp theo label (preset/loại job)
+_active_jobs = {}
+_metrics = {}
+_job_ids = itertools.count(1)
+
+
+class FFmpegError(RuntimeError):
+    """ffmpeg thoát với mã lỗi hoặc quá thời gian; message chứa phần cuối stderr."""
+
+    def __init__(self, label, returncode, stderr_tail, timed_out=False):
+        self.label = label
+        self.returncode = returncode
+        self.stderr_tail = stderr_tail
+        self.timed_out = timed_out
+        reason = "quá thời gian" if timed_out else f"mã lỗi {returncode}"
+        super().__init__(f"ffmpeg {label} lỗi ({reason}): {stderr_tail}")
+
+
+def _tail(data):
+    return data[-FFMPEG_STDERR_TAIL_BYTES:].decode("utf-8", errors="ignore")
+
+
+def _parse_clock(value):
+    """"HH:MM:SS.micro" -> giây."""
+    hours, minutes, seconds = value.split(":")
+    return int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+
+
+def parse_progress(fields):
+    """
+    Đổi một block `-progress` (key=value) sang số: out_time (giây), fps, speed (x realtime),
+    bitrate_kbps. Giá trị "N/A" (chưa có frame nào) thành None.
+    """
+    def number(value, suffix=""):
+        value = (value or "").strip()
+        if not value or value == "N/A":
+            return None
+        try:
+            return float(value[:-len(suffix)] if suffix and value.endswith(suffix) else value)
+        except ValueError:
+            return None
+
+    out_time = None
+    if number(fields.get("out_time_us")) is not None:
+        out_time = number(fields.get("out_time_us")) / 1_000_000
+    elif fields.get("out_time") not in (None, "", "N/A"):
+        try:
+            out_time = _parse_clock(fields["out_time"])
+        except ValueError:
+            out_time = None
+    return {
+        "out_time": max(out_time, 0.0) if out_time is not None else None,
+        "fps": number(fields.get("fps")),
+        "speed": number(fields.get("speed"), "x"),
+        "bitrate_kbps": number(fields.get("bitrate"), "kbits/s"),
+    }
+
+
+def _record(label, progress, elapsed, ok):
+    with _lock:
+        entry = _metrics.setdefault(label, {
+            "runs": 0, "failures": 0, "wall_s": 0.0, "media_s": 0.0, "last_fps": None, "last_speed": None
+        })
+        entry["runs"] += 1
+        entry["wall_s"] += elapsed
+        if not ok:
+            entry["failures"] += 1
+            return
+        entry["media_s"] += progress.get("out_time") or 0.0
+        entry["last_fps"] = progress.get("fps")
+        entry["last_speed"] = progress.get("speed")
+
+
+def get_ffmpeg_metrics():
+    """Job đang chạy (tiến độ) và thông lượng encode theo label trên node này."""
+    with _lock:
+        totals = {}
+        for label, entry in _metrics.items():
+            totals[label] = dict(entry, realtime_factor=round(entry["media_s"] / entry["wall_s"], 3) if entry["wall_s"] else None)
+        return {"node": NODE_NAME, "active": [dict(job) for job in _active_jobs.values()], "totals": totals}
+
+
+def run_ffmpeg(command, label="ffmpeg", duration=None, timeout=FFMPEG_TIMEOUT_S, on_progress=None):
+    """
+    Chạy một lệnh ffmpeg (command[0] là "ffmpeg") với `-progress pipe:1 -nostats`: tiến độ
+    (out_time, fps, speed, bitrate) được đọc dần trong lúc chạy, cập nhật vào job đang chạy,
+    gọi `on_progress(snapshot)` và cộng vào metrics của `label` khi xong. `duration` (giây
+    output) dùng để tính phần trăm. Quá `timeout` giây thì ffmpeg bị dừng.
+    Lệnh không được ghi dữ liệu ra stdout (dùng run_ffmpeg_pipe). Raise FFmpegError nếu lỗi,
+    kèm phần cuối stderr (tối đa FFMPEG_STDERR_TAIL_BYTES). Trả về snapshot tiến độ cuối.
+    """
+    command = [command[0], "-hide_banner", "-nostats", "-progress", "pipe:1", *command[1:]]
+    job_id = next(_job_ids)
+    snapshot = {
+        "job_id": job_id, "label": label, "node": NODE_NAME, "duration": duration, "percent": None,
+        "out_time": None, "fps": None, "speed": None, "bitrate_kbps": None, "started_at": time.time(),
+    }
+    with _lock:
+        _active_jobs[job_id] = snapshot
+
+    started = time.perf_counter()
+    process = subprocess.Popen(command, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    # stderr được đọc ở thread riêng (pipe đầy sẽ làm ffmpeg treo), chỉ giữ phần cuối
+    stderr_tail = bytearray()
+
+    def drain_stderr():
+        for chunk in iter(lambda: process.stderr.read(4096), b""):
+            stderr_tail.extend(chunk)
+            del stderr_tail[:-FFMPEG_STDERR_TAIL_BYTES]
+
+    stderr_thread = threading.Thread(target=drain_stderr, daemon=True)
+    stderr_thread.start()
+    timed_out = threading.Event()
+
+    def kill_on_timeout():
+        timed_out.set()
+        process.kill()
+
+    timer = threading.Timer(timeout, kill_on_timeout) if timeout else None
+    if timer:
+        timer.daemon = True
+        timer.start()
+
+    returncode = None
+    try:
+        fields = {}
+        last_log = started
+        for line in process.stdout:
+            key, _, value = line.decode("utf-8", errors="ignore").strip().partition("=")
+            if key != "progress":
+                fields[key] = value
+                continue
+            progress = parse_progress(fields)
+            fields = {}
+            with _lock:
+                snapshot.update({name: value for name, value in progress.items() if value is not None})
+                if duration and snapshot["out_time"] is not None:
+                    snapshot["percent"] = round(min(snapshot["out_time"] / duration, 1.0) * 100, 1)
+                current = dict(snapshot)
+            if on_progress:
+                on_progress(current)
+            if time.perf_counter() - last_log >= FFMPEG_PROGRESS_LOG_INTERVAL_S:
+                last_log = time.perf_counter()
+                percent = f" ({current['percent']}%)" if current["percent"] is not None else ""
+                print(
+                    f"ffmpeg {label}: {current['out_time'] or 0:.1f}s{percent}, fps {current['fps']}, "
+                    f"speed {current['speed']}x, bitrate {current['bitrate_kbps']}kbps"
+                )
+        returncode = process.wait()
+        stderr_thread.join()
+    finally:
+        if timer:
+            timer.cancel()
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+        with _lock:
+            _active_jobs.pop(job_id, None)
+
+    failed = returncode != 0 or timed_out.is_set()
+    _record(label, snapshot, time.perf_counter() - started, not failed)
+    if failed:
+        raise FFmpegError(label, returncode, _tail(bytes(stderr_tail)), timed_out.is_set())
+    return snapshot
+
+
+def run_ffmpeg_pipe(command, input_bytes=None, label="ffmpeg", timeout=FFMPEG_TIMEOUT_S):
+    """
+    Chạy ffmpeg/ffprobe dùng stdin/stdout cho dữ liệu (PCM qua pipe...), nên không đọc tiến độ;
+    vẫn có timeout và chỉ giữ phần cuối stderr khi lỗi. Trả về stdout (bytes).
+    """
+    try:
+        result = subprocess.run(command, input=input_bytes, capture_output=True, timeout=timeout or None)
+    except subprocess.TimeoutExpired as e:
+        raise FFmpegError(label, None, _tail(e.stderr or b""), timed_out=True) from e
+    if result.returncode != 0:
+        raise FFmpegError(label, result.returncode, _tail(result.stderr))
+    return result.stdout
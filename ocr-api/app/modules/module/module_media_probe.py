@@ -0,0 +1,92 @@
+import os
+import json
+import hashlib
+from app.modules.module.module_ffmpeg_render import file_digest
+from app.modules.module.module_ffmpeg_runner import run_ffmpeg_pipe
+
+# Các cột thông tin media của Video (app.models.video) được ghi lúc upload
+MEDIA_FIELDS = (
+    "duration", "fps", "width", "height", "video_codec", "audio_codec",
+    "keyframe_interval", "file_size", "content_hash",
+)
+# Khoảng cách keyframe được đo trên đoạn đầu video (giây) thay vì đọc packet cả file
+MEDIA_KEYFRAME_PROBE_S = float(os.environ.get("MEDIA_KEYFRAME_PROBE_S", "60"))
+
+
+def copy_with_digest(source_file, path):
+    """Ghi file upload ra `path` và tính SHA-1 trong cùng lần đọc. Trả về hex digest."""
+    digest = hashlib.sha1()
+    with open(path, "wb") as output_file:
+        for chunk in iter(lambda: source_file.read(1024 * 1024), b""):
+            digest.update(chunk)
+            output_file.write(chunk)
+    return digest.hexdigest()
+
+
+def probe_keyframe_interval(path, duration, probe_seconds=MEDIA_KEYFRAME_PROBE_S):
+    """
+    Khoảng cách trung bình (giây) giữa hai keyframe của stream video, đo trên `probe_seconds`
+    giây đầu (chỉ cờ packet của stream video, không decode). None nếu không đọc được.
+    """
+    output = run_ffmpeg_pipe(
+        ["ffprobe", "-v", "error", "-select_streams", "v:0", "-read_intervals", f"%+{probe_seconds:g}",
+         "-show_entries", "packet=pts_time,flags", "-of", "csv=p=0", path],
+        label="ffprobe keyframes"
+    )
+    times = []
+    for line in output.decode("utf-8", errors="ignore").splitlines():
+        pts_time, _, flags = line.partition(",")
+        if "K" in flags and pts_time not in ("", "N/A"):
+            times.append(float(pts_time))
+    if len(times) > 1:
+        return round((max(times) - min(times)) / (len(times) - 1), 3)
+    # Một keyframe trong đoạn đầu: GOP dài ít nhất bằng đoạn đã đọc
+    if times and duration:
+        return round(min(duration, probe_seconds), 3)
+    return None
+
+
+def probe_media(path, content_hash=None):
+    """
+    Probe lúc ingest (chỉ đọc header container và cờ packet của đoạn đầu, không decode): độ dài,
+    fps (chuỗi r_frame_rate như probe_video_stream), kích thước, codec video/audio, khoảng cách
+    keyframe, dung lượng và SHA-1 nội dung (`content_hash` nếu đã tính lúc ghi file, xem
+    copy_with_digest). Trả về dict theo MEDIA_FIELDS.
+    Raise FFmpegError nếu ffprobe lỗi, ValueError nếu file không có stream video.
+    """
+    output = run_ffmpeg_pipe(
+        ["ffprobe", "-v", "error",
+         "-show_entries", "format=duration,size:stream=index,codec_type,codec_name,width,height,r_frame_rate",
+         "-of", "json", path],
+        label="ffprobe ingest"
+    )
+    info = json.loads(output)
+    streams = info.get("streams") or []
+    video = next((stream for stream in streams if stream.get("codec_type") == "video"), None)
+    if not video:
+        raise ValueError(f"Không tìm thấy stream video: {path}")
+    audio = next((stream for stream in streams if stream.get("codec_type") == "audio"), {})
+
+    container = info.get("format", {})
+    duration = float(container["duration"]) if container.get("duration") else None
+    return {
+        "duration": duration,
+        "fps": video.get("r_frame_rate"),
+        "width": video.get("width"),
+        "height": video.get("height"),
+        "video_codec": video.get("codec_name"),
+        "audio_codec": audio.get("codec_name"),
+        "keyframe_interval": probe_keyframe_interval(path, duration),
+        "file_size": int(container["size"]) if container.get("size") else os.path.getsize(path),
+        "content_hash": content_hash or file_digest(path),
+    }
+
+
+def render_source_info(video):
+    """
+    Thông tin nguồn cho RenderPlan (dạng probe_video_stream) từ các cột đã lưu của Video,
+    để render không phải ffprobe lại bản gốc. None nếu video upload trước khi có probe lúc ingest.
+    """
+    if not video.source_url or not video.duration or not video.width or not video.height or not video.fps:
+        return None
+    return {"width": video.width, "height": video.height, "fps": video.fps, "duration": video.duration}
@@ -1,94 +1,14 @@
-import pysrt
-import subprocess
-from moviepy.video.io.VideoFileClip import VideoFileClip, AudioFileClip
-from moviepy.video.VideoClip import TextClip, ColorClip
-from moviepy.video.compositing.CompositeVideoClip import CompositeVideoClip
-import os
-
-# Set ImageMagick binary path
-os.environ['IMAGEMAGICK_BINARY'] = r"C:\\Program Files\\ImageMagick-7.1.1-Q16\\magick.exe"
-
-def srt_time_to_seconds(time_obj):
-    return time_obj.hour * 3600 + time_obj.minute * 60 + time_obj.second + time_obj.microsecond / 1e6
-
-def process_video_with_sync(audio_file, video_file, srt_file, output_audio, output_srt, output_video):
-    video = VideoFileClip(video_file)
-    try:
-        video_duration = video.duration
-        
-        result = subprocess.run(
-            ["ffprobe", "-i", audio_file, "-show_entries", "format=duration", "-v", "quiet", "-of", "csv=p=0"],
-            capture_output=True, text=True
-        )
-        audio_duration = float(result.stdout.strip())
-        
-        if video_duration <= 0 or audio_duration <= 0:
-            print("Lỗi: Video hoặc Audio có độ dài không hợp lệ!")
-            return
-        
-        speed_factor = audio_duration / video_duration  
-        print(f" Video: {video_duration:.2f}s, Audio: {audio_duration:.2f}s, Hệ số: {speed_factor:.3f}")
-        
-        atempo_filter = []
-        while speed_factor > 2.0:
-            atempo_filter.append("atempo=2.0")
-            speed_factor /= 2
-        while speed_factor < 0.5:
-            atempo_filter.append("atempo=0.5")
-            speed_factor *= 2
-        atempo_filter.append(f"atempo={speed_factor:.3f}")
-        atempo_filter = ",".join(atempo_filter)
-        
-        subprocess.run(["ffmpeg", "-i", audio_file, "-filter:a", atempo_filter, "-vn", output_audio, "-y"])
-        print(f"Đã điều chỉnh âm thanh: {output_audio}")
-        
-        subs = pysrt.open(srt_file, encoding="utf-8")
-        original_end = srt_time_to_seconds(subs[-1].end.to_time())
-        correction_factor = video_duration / original_end
-        
-        for sub in subs:
-            new_start = srt_time_to_seconds(sub.start.to_time()) * correction_factor
-            new_end = srt_time_to_seconds(sub.end.to_time()) * correction_factor
-            sub.start = pysrt.SubRipTime(seconds=int(new_start), milliseconds=int((new_start % 1) * 1000))
-            sub.end = pysrt.SubRipTime(seconds=int(new_end), milliseconds=int((new_end % 1) * 1000))
-
-        
-        subs.save(output_srt, encoding="utf-8")
-        print(f"Đã điều chỉnh phụ đề: {output_srt}")
-        
-        audio = AudioFileClip(output_audio)
-        w, h = video.size
-        video = video.set_audio(audio)
-        
-        black_bar = ColorClip(size=(w, 100), color=(0, 0, 0), duration=video.duration)
-        black_bar = black_bar.set_position(("center", h - 100))
-        
-        sub_clips = []
-        for sub in subs:
-            start_time = srt_time_to_seconds(sub.start.to_time())
-            duration = srt_time_to_seconds(sub.end.to_time()) - start_time
-            txt_clip = TextClip(
-                sub.text, fontsize=35, color='yellow', font="Liberation-Sans",
-                size=(w - 100, None), method='caption', bg_color="black"
-            ).set_start(start_time).set_duration(duration).set_position(('center', h - 120))
-            sub_clips.append(txt_clip)
-        
-        final_clip = CompositeVideoClip([video, black_bar] + sub_clips)
-        final_clip.write_videofile(output_video, fps=24, codec="libx264", audio_codec="aac")
-        print(f"Video hoàn tất: {output_video}")
-        
-        # Cleanup
-        final_clip.close()
-        black_bar.close()
-        for clip in sub_clips:
-            clip.close()
-        video.close()
-        audio.close()
-        
-    except Exception as e:
-        print(f"Lỗi xử lý video: {e}")
-        # Ensure cleanup even if error occurs
-        try:
-            video.close()
-        except:
-            pass
\ No newline at end of file
+from app.modules.module.module_ffmpeg_render import render_dubbed_video
+
+
+def process_video_with_sync(audio_file, video_file, srt_file, output_video):
+    """
+    Ghép audio TTS và phụ đề vào video.
+    Audio đã được dựng theo timeline của phụ đề (xem module_audio_assembler) nên không cần
+    co giãn toàn bộ track hay dời thời gian phụ đề nữa. Toàn bộ việc dựng hình (thanh đen,
+    phụ đề, mux audio) chạy trong một lần ffmpeg, xem module_ffmpeg_render.
+    Raise FFmpegError (RuntimeError) nếu render lỗi để caller không upload output dở.
+    """
+    render_dubbed_video(video_file, audio_file, srt_file, output_video)
+    print(f"Video hoàn tất: {output_video}")
+    return output_video
@@ -1,39 +1,22 @@
 import os
-import re
-import pysrt
-from datetime import timedelta
-import ffmpeg
 import tempfile
 import shutil
 import traceback
 
-from moviepy.video.io.VideoFileClip import VideoFileClip
-from moviepy.video.compositing.CompositeVideoClip import CompositeVideoClip
-from moviepy.video.VideoClip import TextClip
+from app.modules.module.module_ffmpeg_render import RenderPlan, execute_plan
 
 
-# Set đường dẫn ImageMagick - Removed hardcoded Windows path, Dockerfile ENV will be used.
-# os.environ['IMAGEMAGICK_BINARY'] = r"C:\\Program Files\\ImageMagick-7.1.1-Q16\\magick.exe"
-font_path = "/usr/share/fonts/truetype/noto/NotoSans-Regular.ttf" # Changed to Noto Sans for better Unicode support
-
-
-def srt_time_to_seconds(time_obj):
-    return time_obj.hours * 3600 + time_obj.minutes * 60 + time_obj.seconds + time_obj.milliseconds / 1000.0
-
-
-def add_subtitles_to_video(video_path, subtitle_path, output_path):
+def add_subtitles_to_video(video_path, subtitle_path, output_path, preset="default", source_info=None):
+    """
+    Burn-in phụ đề vào video bằng libass; SRT được chuyển sang ASS theo `preset` (module_ass).
+    `source_info`: thông tin video đã probe lúc ingest (RenderPlan.source_info).
+    """
     # Ensure output directory exists
     output_dir = os.path.dirname(output_path)
     if not output_dir: # Handle case where output_path is just a filename in CWD
         output_dir = "."
     os.makedirs(output_dir, exist_ok=True)
 
-    # Ensure ffmpeg_logs directory exists inside the container (mapped by volume)
-    ffmpeg_log_dir = "/app/ffmpeg_logs"
-    os.makedirs(ffmpeg_log_dir, exist_ok=True)
-    ffmpeg_error_log_path = os.path.join(ffmpeg_log_dir, f"ffmpeg_error_{os.path.basename(video_path)}.log")
-
-
     # Create a unique temporary file in the target output directory for FFmpeg to write to.
     # delete=False is important: FFmpeg needs to open it by name. We are responsible for cleanup.
     # Using a suffix related to the original video name can help in debugging if files are left over.
@@ -56,44 +39,12 @@ def add_subtitles_to_video(video_path, subtitle_path, output_path):
             with open(subtitle_path, 'w', encoding='utf-8') as f:
                 f.write("1\\\\n00:00:00,000 --> 00:00:05,000\\\\nNo subtitles available\\\\n\\\\n")
 
-        video_input_stream = ffmpeg.input(video_path)
-        audio_stream = video_input_stream.audio
-        video_stream = video_input_stream.video
-
-        video_with_subs_stream = ffmpeg.filter(video_stream, 'subtitles', subtitle_path, force_style='FontName=Noto Sans')
-
-        output_stream_definition = ffmpeg.output(
-            video_with_subs_stream, audio_stream,
-            ffmpeg_processing_path,  # FFmpeg writes to this unique temporary file
-            acodec='copy',
-            vcodec='libx264',
-            preset='fast',      # Faster preset for better performance
-            threads=0,          # Use all available cores
-            crf=23,             # Constant Rate Factor (quality, 23 is a good default)
-            pix_fmt='yuv420p',
-            movflags='+faststart',
-            loglevel='verbose'  # Increased log verbosity
-        )
-
-        print(f"Running FFmpeg command: {' '.join(ffmpeg.compile(output_stream_definition, overwrite_output=True))}")
-
-        # Run FFmpeg and capture stdout/stderr
-        stdout_data, stderr_data = ffmpeg.run(
-            output_stream_definition, 
-            overwrite_output=True, 
-            capture_stdout=True, # Capture stdout
-            capture_stderr=True  # Capture stderr
-        )
-
-        # Log stderr even on success for performance analysis
-        if stderr_data:
-            # Save detailed ffmpeg log to a file for later inspection
-            # This log will be in the mounted volume ./ffmpeg_logs/
-            success_log_path = os.path.join(ffmpeg_log_dir, f"ffmpeg_success_{os.path.basename(video_path)}.log")
-            with open(success_log_path, "wb") as f_log:
-                f_log.write(stderr_data)
-            print(f"FFmpeg process completed. Stderr logged to {success_log_path} (first 500 chars): {stderr_data[:500].decode('utf8', errors='ignore')}")
-
+        # Burn-in qua RenderPlan: style nằm trong file ASS (cạnh output, trong workspace của job),
+        # video dài được encode theo segment song song
+        execute_plan(RenderPlan(
+            video_path, ffmpeg_processing_path, subtitles=subtitle_path, subtitle_preset=preset,
+            source_info=source_info
+        ))
 
         # If FFmpeg was successful, move the processed file to the final output_path.
         # shutil.move will overwrite output_path if it's an existing file.
@@ -101,18 +52,9 @@ def add_subtitles_to_video(video_path, subtitle_path, output_path):
         print(f"Successfully processed video and saved to {output_path}")
         return True
 
-    except ffmpeg.Error as e:
+    except RuntimeError as e:
+        # FFmpegError: message đã chứa phần cuối stderr (giới hạn FFMPEG_STDERR_TAIL_BYTES)
         print(f"FFmpeg Error during subtitle processing: {e}")
-        # FFmpeg errors often have more detail in stderr
-        if e.stderr:
-            detailed_error_message = e.stderr.decode('utf8', errors='ignore')
-            print(f"FFmpeg stderr: {detailed_error_message}")
-            # Save detailed ffmpeg log to a file for later inspection
-            with open(ffmpeg_error_log_path, "wb") as f_err:
-                f_err.write(e.stderr)
-            print(f"Detailed FFmpeg error log saved to: {ffmpeg_error_log_path}")
-        else:
-            print("FFmpeg error did not provide stderr.")
         traceback.print_exc()
         return False
     except Exception as e:
@@ -120,10 +62,11 @@ def add_subtitles_to_video(video_path, subtitle_path, output_path):
         traceback.print_exc()
         return False
     finally:
-        # Clean up the temporary file if it still exists
-        if os.path.exists(ffmpeg_processing_path):
-            try:
-                os.remove(ffmpeg_processing_path)
-                print(f"Cleaned up temporary file: {ffmpeg_processing_path}")
-            except OSError as e_remove:
-                print(f"Error cleaning up temporary file {ffmpeg_processing_path}: {e_remove}")
\ No newline at end of file
+        # Clean up the temporary files if they still exist
+        for temp_path in (ffmpeg_processing_path, os.path.splitext(ffmpeg_processing_path)[0] + ".ass"):
+            if os.path.exists(temp_path):
+                try:
+                    os.remove(temp_path)
+                    print(f"Cleaned up temporary file: {temp_path}")
+                except OSError as e_remove:
+                    print(f"Error cleaning up temporary file {temp_path}: {e_remove}")
\ No newline at end of file
@@ -0,0 +1,118 @@
+import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+from app.modules.module.module_ffmpeg_runner import run_ffmpeg, run_ffmpeg_pipe
+
+# Số segment encode song song (1 = tắt) và độ dài video tối thiểu để chia segment;
+# clip ngắn encode một process đã đủ nhanh, chia nhỏ chỉ thêm chi phí khởi động ffmpeg
+SEGMENT_ENCODE_WORKERS = int(os.environ.get("SEGMENT_ENCODE_WORKERS", str(min(4, os.cpu_count() or 1))))
+SEGMENT_ENCODE_MIN_DURATION_S = float(os.environ.get("SEGMENT_ENCODE_MIN_DURATION_S", "120"))
+# Segment ngắn hơn mức này thì gộp vào segment kề bên
+SEGMENT_MIN_LENGTH_S = 10
+
+
+def should_segment(duration, workers=SEGMENT_ENCODE_WORKERS):
+    return workers > 1 and bool(duration) and duration >= SEGMENT_ENCODE_MIN_DURATION_S
+
+
+def probe_keyframes(path):
+    """Thời điểm (giây) các keyframe của stream video, đọc từ cờ packet nên không cần decode."""
+    output = run_ffmpeg_pipe(
+        ["ffprobe", "-v", "error", "-select_streams", "v:0",
+         "-show_entries", "packet=pts_time,flags", "-of", "csv=p=0", path],
+        label="ffprobe keyframes"
+    )
+    keyframes = []
+    for line in output.decode("utf-8", errors="ignore").splitlines():
+        pts_time, _, flags = line.partition(",")
+        if "K" in flags and pts_time not in ("", "N/A"):
+            keyframes.append(float(pts_time))
+    return sorted(set(keyframes))
+
+
+def split_at_keyframes(keyframes, duration, segments):
+    """
+    Chia [0, duration) thành tối đa `segments` đoạn (start, end), mỗi điểm cắt là keyframe gần
+    nhất với điểm chia đều. Video GOP dài có thể cho ít đoạn hơn yêu cầu.
+    """
+    cuts = []
+    for index in range(1, segments):
+        target = duration * index / segments
+        candidates = [time for time in keyframes if time > (cuts[-1] if cuts else 0)]
+        if not candidates:
+            break
+        cut = min(candidates, key=lambda time: abs(time - target))
+        if cut - (cuts[-1] if cuts else 0) >= SEGMENT_MIN_LENGTH_S and duration - cut >= SEGMENT_MIN_LENGTH_S:
+            cuts.append(cut)
+    bounds = [0.0, *cuts, duration]
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def encode_segment(source, start, end, filtergraph, video_args, output, threads=0):
+    """
+    Encode một đoạn [start, end) của `source`, chỉ stream video. Job tự chứa đủ tham số (không
+    dùng state của process) nên có thể chạy ở process hoặc node khác.
+    `filtergraph` nhận [0:v], ra [v], với timestamp đã được dời về thời gian gốc của video.
+    """
+    command = [
+        "ffmpeg", "-y", "-v", "error",
+        "-ss", f"{start:.6f}", "-t", f"{end - start:.6f}", "-i", source,
+        "-filter_complex", filtergraph, "-map", "[v]", "-an",
+        *video_args, "-threads", str(threads), output
+    ]
+    run_ffmpeg(command, label=f"segment {start:.0f}-{end:.0f}s", duration=end - start)
+    return output
+
+
+def concat_segments(segment_paths, output, audio_source, audio_args, duration, audio_required=False):
+    """
+    Nối các segment video (cùng tham số encode) bằng concat demuxer, stream copy, rồi mux audio
+    của `audio_source` một lần cho cả file. File list được ghi cạnh segment đầu tiên.
+    """
+    concat_list = os.path.join(os.path.dirname(segment_paths[0]), "segments.txt")
+    with open(concat_list, "w", encoding="utf-8") as list_file:
+        for path in segment_paths:
+            escaped = os.path.abspath(path).replace("'", "'\\''")
+            list_file.write(f"file '{escaped}'\n")
+
+    command = ["ffmpeg", "-y", "-v", "error", "-f", "concat", "-safe", "0", "-i", concat_list]
+    command += ["-i", audio_source, "-map", "0:v", "-map", "1:a" if audio_required else "1:a?"]
+    command += ["-c:v", "copy", *audio_args, "-t", f"{duration:.3f}", "-movflags", "+faststart", output]
+    run_ffmpeg(command, label="concat segment", duration=duration)
+    return output
+
+
+def encode_in_segments(source, output, build_filtergraph, video_args, duration, keyframes=None,
+                       audio_file=None, audio_args=("-c:a", "copy"), workers=SEGMENT_ENCODE_WORKERS):
+    """
+    Encode `source` theo các đoạn cắt tại keyframe, song song trên `workers` process ffmpeg,
+    rồi nối lại bằng concat demuxer (stream copy, không encode lại).
+
+    `build_filtergraph(offset)` trả về filtergraph cho đoạn bắt đầu tại `offset` giây, để filter
+    phụ thuộc thời gian (phụ đề) vẫn khớp thời điểm gốc. Audio không chia đoạn mà được mux một
+    lần ở bước nối: audio của `source` (copy) hoặc `audio_file` với `audio_args`.
+    Trả về None nếu video không chia được (ít keyframe) để caller encode một lần như bình thường.
+    """
+    ranges = split_at_keyframes(keyframes or probe_keyframes(source), duration, workers)
+    if len(ranges) < 2:
+        return None
+
+    segment_dir = os.path.splitext(output)[0] + "_segments"
+    os.makedirs(segment_dir, exist_ok=True)
+    threads = max(1, (os.cpu_count() or 1) // len(ranges))
+    try:
+        with ThreadPoolExecutor(max_workers=len(ranges)) as pool:
+            futures = [
+                pool.submit(
+                    encode_segment, source, start, end, build_filtergraph(start), video_args,
+                    os.path.join(segment_dir, f"segment_{index:04d}.mp4"), threads
+                )
+                for index, (start, end) in enumerate(ranges)
+            ]
+            segment_paths = [future.result() for future in futures]
+        concat_segments(segment_paths, output, audio_file or source, audio_args, duration, bool(audio_file))
+    finally:
+        shutil.rmtree(segment_dir, ignore_errors=True)
+
+    print(f"Encode {len(ranges)} segment song song: {output}")
+    return output
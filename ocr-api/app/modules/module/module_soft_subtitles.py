@@ -0,0 +1,86 @@
+import os
+from app.modules.module.module_ass import cues_from_srt
+from app.modules.module.module_ffmpeg_runner import run_ffmpeg
+
+# Cách đưa phụ đề vào video khi upload: "burn" (burn-in, encode lại video) hoặc "soft"
+# (track mov_text chọn được trong player, stream copy; burn-in chỉ khi export)
+SUBTITLE_DELIVERY_MODES = ("burn", "soft")
+SUBTITLE_DELIVERY = os.environ.get("SUBTITLE_DELIVERY", "burn")
+
+# Mã ngôn ngữ API (ISO 639-1) -> ISO 639-2 mà MP4 yêu cầu cho metadata language của track
+ISO639_2 = {
+    "vi": "vie",
+    "en": "eng",
+    "zh": "chi",
+    "ja": "jpn",
+    "ko": "kor",
+    "th": "tha",
+    "fr": "fre",
+    "es": "spa",
+    "de": "ger",
+}
+
+
+def mp4_language(language):
+    """Mã ngôn ngữ 3 ký tự cho track MP4; ngôn ngữ không biết thì "und"."""
+    language = language.split("-")[0].lower()
+    if len(language) == 3:
+        return language
+    return ISO639_2.get(language, "und")
+
+
+def format_vtt_time(seconds):
+    """Giây -> HH:MM:SS.mmm theo WebVTT."""
+    milliseconds = int(round(seconds * 1000))
+    hours, milliseconds = divmod(milliseconds, 3600000)
+    minutes, milliseconds = divmod(milliseconds, 60000)
+    secs, milliseconds = divmod(milliseconds, 1000)
+    return f"{hours:02d}:{minutes:02d}:{secs:02d}.{milliseconds:03d}"
+
+
+def escape_vtt_text(text):
+    # "&" và "-->" không được xuất hiện trần trong cue; tag <i>/<b>/<u> của SRT WebVTT cũng hiểu
+    return text.strip().replace("&", "&amp;").replace("-->", "--&gt;")
+
+
+def srt_to_vtt(srt_path, output_path):
+    """Chuyển SRT sang WebVTT (sidecar cho player phía frontend). Trả về output_path."""
+    lines = ["WEBVTT", ""]
+    for index, (start, end, text) in enumerate(cues_from_srt(srt_path), 1):
+        lines += [str(index), f"{format_vtt_time(start)} --> {format_vtt_time(end)}", escape_vtt_text(text), ""]
+    with open(output_path, "w", encoding="utf-8") as vtt_file:
+        vtt_file.write("\n".join(lines))
+    return output_path
+
+
+def soft_subtitles_command(video_path, tracks, output_path):
+    """
+    Lệnh ffmpeg của mux_soft_subtitles. Output luôn là MP4 (`-f mp4`) bất kể đuôi của
+    `output_path`, vì mov_text chỉ có trong MP4/MOV (upload .mkv/.webm/.avi vẫn mux được).
+    """
+    command = ["ffmpeg", "-y", "-v", "error", "-i", video_path]
+    for srt_path, _, _ in tracks:
+        command += ["-sub_charenc", "UTF-8", "-i", srt_path]
+    command += ["-map", "0:v", "-map", "0:a?"]
+    for index in range(len(tracks)):
+        command += ["-map", f"{index + 1}:s"]
+    command += ["-c:v", "copy", "-c:a", "copy", "-c:s", "mov_text"]
+    for index, (_, language, title) in enumerate(tracks):
+        command += [
+            f"-metadata:s:s:{index}", f"language={mp4_language(language)}",
+            f"-metadata:s:s:{index}", f"title={title}",
+            f"-disposition:s:{index}", "default" if index == 0 else "0",
+        ]
+    command += ["-movflags", "+faststart", "-f", "mp4", output_path]
+    return command
+
+
+def mux_soft_subtitles(video_path, tracks, output_path):
+    """
+    Gắn các SRT vào video thành track phụ đề mov_text, video và audio stream copy (không encode lại).
+    `tracks`: list (srt_path, language, title); track đầu tiên là track mặc định.
+    Raise FFmpegError (RuntimeError) nếu ffmpeg lỗi.
+    """
+    run_ffmpeg(soft_subtitles_command(video_path, tracks, output_path), label="soft subtitles")
+    print(f"Đã gắn {len(tracks)} track phụ đề mềm vào {output_path}")
+    return output_path
@@ -0,0 +1,46 @@
+import difflib
+import re
+
+
+def normalize_cue_text(text):
+    """Chuẩn hóa text để so sánh: bỏ khoảng trắng thừa và xuống dòng."""
+    return re.sub(r"\s+", " ", text or "").strip()
+
+
+def diff_cues(old_texts, new_texts):
+    """
+    So sánh hai danh sách text phụ đề ở mức cue.
+
+    Trả về list cùng độ dài với `new_texts`: phần tử thứ i là index của cue cũ có cùng nội dung,
+    hoặc None nếu cue mới được thêm / bị sửa và cần dịch lại. Chỉ nội dung được so sánh,
+    thay đổi thời gian không làm cue phải dịch lại.
+    """
+    old_norm = [normalize_cue_text(text) for text in old_texts]
+    new_norm = [normalize_cue_text(text) for text in new_texts]
+    mapping = [None] * len(new_texts)
+
+    matcher = difflib.SequenceMatcher(None, old_norm, new_norm, autojunk=False)
+    for tag, old_start, old_end, new_start, new_end in matcher.get_opcodes():
+        if tag == "equal":
+            for offset in range(new_end - new_start):
+                mapping[new_start + offset] = old_start + offset
+    return mapping
+
+
+def merge_translations(old_texts, old_translations, new_texts):
+    """
+    Giữ lại bản dịch của các cue không đổi.
+
+    Trả về (merged, changed_indices): `merged` có bản dịch cũ ở vị trí cue không đổi và None
+    ở vị trí cần dịch; `changed_indices` là các index trong `new_texts` cần gửi đi dịch.
+    """
+    mapping = diff_cues(old_texts, new_texts)
+    merged = []
+    changed_indices = []
+    for new_index, old_index in enumerate(mapping):
+        if old_index is not None and old_index < len(old_translations):
+            merged.append(old_translations[old_index])
+        else:
+            merged.append(None)
+            changed_indices.append(new_index)
+    return merged, changed_indices
@@ -0,0 +1,154 @@
+import asyncio
+import pysrt
+from app.modules.video_process import detect_ocr_language, iter_subtitle_cues, write_srt
+from app.modules.module.module_translation_broker import get_translation_broker
+from app.modules.module.module_srt_diff import merge_translations
+
+# Sentinel báo hiệu OCR đã xong
+_END_OF_CUES = object()
+
+
+async def translate_texts_fanout(texts, target_languages, source_lang="auto"):
+    """
+    Dịch cùng một danh sách dòng sang nhiều ngôn ngữ đích song song.
+    Trả về dict {language: [translated texts]}.
+    """
+    broker = get_translation_broker()
+    results = await asyncio.gather(*[
+        broker.translate(texts, source_lang, language) for language in target_languages
+    ])
+    return dict(zip(target_languages, results))
+
+
+async def run_subtitle_pipeline(video_path, srt_path, translated_paths, batch_size=20, flush_interval=2.0):
+    """
+    Chạy OCR và dịch phụ đề theo kiểu pipeline.
+
+    OCR chạy trong thread riêng và đẩy từng cue đã chốt vào asyncio.Queue, bước dịch
+    gom cue thành batch (tối đa `batch_size` dòng, hoặc sau `flush_interval` giây) và gửi
+    qua translation broker trong lúc OCR vẫn đang chạy. Tổng thời gian ~ max(OCR, dịch)
+    thay vì OCR + dịch.
+
+    `translated_paths` là dict {language: output_path}; mỗi batch được dịch song song sang
+    tất cả ngôn ngữ đích từ cùng một kết quả OCR.
+
+    Trả về tuple (srt_path, translated_paths).
+    """
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue()
+    target_languages = list(translated_paths)
+
+    ocr_lang = await loop.run_in_executor(None, detect_ocr_language, video_path)
+    print(f"[Pipeline] Đã nhận diện ngôn ngữ: {ocr_lang}")
+
+    def ocr_producer():
+        try:
+            for cue in iter_subtitle_cues(video_path, ocr_lang):
+                loop.call_soon_threadsafe(queue.put_nowait, cue)
+        except Exception as e:
+            loop.call_soon_threadsafe(queue.put_nowait, e)
+        finally:
+            loop.call_soon_threadsafe(queue.put_nowait, _END_OF_CUES)
+
+    ocr_task = loop.run_in_executor(None, ocr_producer)
+
+    cues = []
+    translated_texts = {language: [] for language in target_languages}
+    ocr_error = None
+    done = False
+
+    while not done:
+        # Chờ cue đầu tiên của batch, sau đó gom thêm các cue đang có sẵn
+        batch = []
+        item = await queue.get()
+        while True:
+            if item is _END_OF_CUES:
+                done = True
+                break
+            if isinstance(item, Exception):
+                ocr_error = item
+            else:
+                batch.append(item)
+            if len(batch) >= batch_size:
+                break
+            try:
+                item = await asyncio.wait_for(queue.get(), timeout=flush_interval)
+            except asyncio.TimeoutError:
+                break
+
+        if not batch:
+            continue
+
+        cues.extend(batch)
+        texts = [text for _, _, text in batch]
+        for language, translated in (await translate_texts_fanout(texts, target_languages)).items():
+            translated_texts[language].extend(translated)
+
+    await ocr_task
+    if ocr_error is not None:
+        raise ocr_error
+
+    if not cues:
+        with open(srt_path, 'w', encoding='utf-8') as srt_file:
+            srt_file.write("1\n00:00:00,000 --> 00:00:05,000\nNo subtitles detected\n\n")
+        for output_path in translated_paths.values():
+            with open(output_path, 'w', encoding='utf-8') as srt_file:
+                srt_file.write("1\n00:00:00,000 --> 00:00:05,000\nNo subtitles to translate\n\n")
+        return srt_path, translated_paths
+
+    write_srt(cues, srt_path)
+    for language, output_path in translated_paths.items():
+        write_srt(
+            [(start, end, text) for (start, end, _), text in zip(cues, translated_texts[language])],
+            output_path
+        )
+    print(f"[Pipeline] Đã trích xuất {len(cues)} cue và dịch sang {', '.join(target_languages)}")
+    return srt_path, translated_paths
+
+
+async def translate_srt_to_languages(input_srt, translated_paths):
+    """
+    Dịch một file SRT gốc đã có sang nhiều ngôn ngữ (không cần OCR lại).
+    `translated_paths` là dict {language: output_path}.
+    """
+    subs = pysrt.open(input_srt, encoding='utf-8')
+    texts = [sub.text for sub in subs]
+    translations = await translate_texts_fanout(texts, list(translated_paths))
+    for language, output_path in translated_paths.items():
+        with open(output_path, 'w', encoding='utf-8') as srt_file:
+            for sub, text in zip(subs, translations[language]):
+                srt_file.write(f"{sub.index}\n")
+                srt_file.write(f"{sub.start} --> {sub.end}\n")
+                srt_file.write(f"{text}\n\n")
+    return translated_paths
+
+
+async def retranslate_srt_incremental(previous_srt, previous_translated_srt, new_srt, output_srt, target_lang="vi"):
+    """
+    Dịch lại phụ đề sau khi người dùng sửa file gốc: chỉ các cue thêm mới hoặc bị sửa được
+    gửi đi dịch, cue không đổi giữ bản dịch cũ. Thời gian lấy theo file gốc mới.
+
+    Trả về dict thống kê {"reused": ..., "translated": ...}.
+    """
+    new_subs = pysrt.open(new_srt, encoding='utf-8')
+    old_texts = [sub.text for sub in pysrt.open(previous_srt, encoding='utf-8')] if previous_srt else []
+    old_translations = [sub.text for sub in pysrt.open(previous_translated_srt, encoding='utf-8')] if previous_translated_srt else []
+    new_texts = [sub.text for sub in new_subs]
+
+    merged, changed_indices = merge_translations(old_texts, old_translations, new_texts)
+    if changed_indices:
+        translated = await get_translation_broker().translate(
+            [new_texts[i] for i in changed_indices], "auto", target_lang
+        )
+        for index, text in zip(changed_indices, translated):
+            merged[index] = text
+
+    with open(output_srt, 'w', encoding='utf-8') as srt_file:
+        for sub, text in zip(new_subs, merged):
+            srt_file.write(f"{sub.index}\n")
+            srt_file.write(f"{sub.start} --> {sub.end}\n")
+            srt_file.write(f"{text}\n\n")
+
+    stats = {"reused": len(new_texts) - len(changed_indices), "translated": len(changed_indices)}
+    print(f"[Incremental] {target_lang}: giữ {stats['reused']} cue, dịch lại {stats['translated']} cue")
+    return stats
@@ -1,11 +1,19 @@
 import pysrt
 import os
-import ffmpeg
 import re
-import edge_tts
 import asyncio
-import tempfile
-import shutil
+from app.modules.module.module_tts_cache import get_tts_cache, make_cache_key
+from app.modules.module.module_tts_backend import get_tts_backend
+from app.modules.module.module_audio_assembler import assemble_timeline
+
+# Số cue được tổng hợp đồng thời và số lần thử lại mỗi cue
+TTS_CONCURRENCY = int(os.environ.get("TTS_CONCURRENCY", "8"))
+TTS_MAX_ATTEMPTS = int(os.environ.get("TTS_MAX_ATTEMPTS", "3"))
+TTS_RETRY_BASE_DELAY = float(os.environ.get("TTS_RETRY_BASE_DELAY", "0.5"))
+# Số cue gửi chung trong một request TTS (1 = tổng hợp từng cue như cũ)
+TTS_BATCH_SIZE = int(os.environ.get("TTS_BATCH_SIZE", "20"))
+# Bước làm tròn rate (%) khi gộp batch: cue cùng giọng và cùng rate đã làm tròn mới đi chung request
+TTS_BATCH_RATE_STEP = int(os.environ.get("TTS_BATCH_RATE_STEP", "25"))
 
 def srt_time_to_milliseconds(srt_time):
     return (srt_time.hours * 3600 + srt_time.minutes * 60 + srt_time.seconds) * 1000 + srt_time.milliseconds
@@ -20,78 +28,176 @@ def detect_language(text):
         return 'zh'
     return 'vi'
 
+def voice_for_choice(voice):
+    """Giọng edge-tts theo lựa chọn của API ("1" giọng nữ, "2" giọng nam)."""
+    return "vi-VN-NamMinhNeural" if voice == "2" else "vi-VN-HoaiMyNeural"
+
+def resolve_voice(text, voice):
+    if detect_language(text) == 'zh':
+        return "zh-CN-XiaoxiaoNeural"
+    return voice
+
 def calculate_rate(text, duration_ms):
     base_duration = len(text) * 100
     rate = (base_duration / duration_ms) * 100
     rate = max(50, min(rate, 200))
     return f"+{int(rate)}%"
 
-async def text_to_speech(text, output_path, duration_ms, voice):
+def batch_rate(text, duration_ms, step=TTS_BATCH_RATE_STEP):
+    """Rate của một cue khi tổng hợp theo batch: calculate_rate làm tròn theo `step`."""
+    rate = int(calculate_rate(text, duration_ms)[1:-1])
+    step = max(step, 1)
+    return f"+{int(round(rate / step) * step)}%"
+
+async def text_to_speech(text, duration_ms, voice):
+    """Tổng hợp một cue, trả về mảng PCM int16 (giữ trong bộ nhớ) hoặc None nếu lỗi."""
     try:
         text = normalize_text(text)
         rate = calculate_rate(text, duration_ms)
+        voice = resolve_voice(text, voice)
+
+        # Kiểm tra cache trước khi gọi engine TTS.
+        # Phiên bản engine nằm trong cache key: đổi engine thì cache cũ tự hết hiệu lực
+        backend = get_tts_backend()
+        cache = get_tts_cache()
+        cache_key = make_cache_key(text, voice, rate, backend.version)
+        cached = await asyncio.to_thread(cache.get_samples, cache_key)
+        if cached is not None:
+            return cached
         
-        if detect_language(text) == 'zh':
-            voice = "zh-CN-XiaoxiaoNeural"
-        
-        temp_audio = output_path + "_temp.mp3"
-        communicate = edge_tts.Communicate(text, voice, rate=rate)
-        await communicate.save(temp_audio)
-        await asyncio.sleep(1)
-
-        if not os.path.exists(temp_audio):
-            raise Exception("Không nhận được file audio. Kiểm tra tham số API.")
-        
-        os.rename(temp_audio, output_path)
-        return True
+        samples = await backend.synthesize(text, voice, rate)
+        await asyncio.to_thread(cache.put_samples, cache_key, samples)
+        return samples
     except Exception as e:
         print(f"Lỗi khi tạo audio: {str(e)}")
-        return False
-
-def merge_audio_files(audio_files, output_file):
-    with open("file_list.txt", "w", encoding="utf-8") as f:
-        for file in audio_files:
-            f.write(f"file '{file}'\n")
-    
-    ffmpeg.input("file_list.txt", format="concat", safe=0)\
-        .output(output_file, c="copy")\
-        .run(overwrite_output=True)
-    os.remove("file_list.txt")
+        return None
 
+async def text_to_speech_with_retry(text, duration_ms, voice, max_attempts=TTS_MAX_ATTEMPTS):
+    """Gọi text_to_speech, thử lại với backoff lũy thừa nếu thất bại."""
+    for attempt in range(max_attempts):
+        samples = await text_to_speech(text, duration_ms, voice)
+        if samples is not None:
+            return samples
+        if attempt < max_attempts - 1:
+            await asyncio.sleep(TTS_RETRY_BASE_DELAY * (2 ** attempt))
+    return None
+
+async def text_to_speech_batch(texts, voice, rate):
+    """
+    Tổng hợp nhiều cue cùng giọng và cùng rate (xem batch_rate) trong một request (một round
+    trip), trả về list mảng PCM. Cue đã có trong cache không được gửi lại. Trả về None nếu backend
+    không hỗ trợ batch hoặc gặp lỗi, để caller chuyển sang tổng hợp từng cue.
+    """
+    try:
+        texts = [normalize_text(text) for text in texts]
+        backend = get_tts_backend()
+        cache = get_tts_cache()
+        # Key chỉ gồm text, giọng và rate của chính cue (không phụ thuộc các cue khác trong batch),
+        # nên sửa một cue chỉ tổng hợp lại cue đó. Clip cắt từ batch (theo WordBoundary) khác clip
+        # tổng hợp riêng từng cue nên dùng namespace engine riêng
+        keys = [make_cache_key(text, voice, rate, f"{backend.version}/batch") for text in texts]
+
+        results = [None] * len(texts)
+        for index, key in enumerate(keys):
+            results[index] = await asyncio.to_thread(cache.get_samples, key)
+        pending = [index for index, samples in enumerate(results) if samples is None]
+        if not pending:
+            return results
+
+        clips = await backend.synthesize_batch([texts[index] for index in pending], voice, rate)
+        for index, samples in zip(pending, clips):
+            results[index] = samples
+            await asyncio.to_thread(cache.put_samples, keys[index], samples)
+        return results
+    except NotImplementedError:
+        return None
+    except Exception as e:
+        print(f"Lỗi khi tạo audio theo batch, chuyển sang từng cue: {str(e)}")
+        return None
 
-def generate_audio_from_srt(srt_file, save_dir, voice):
+def group_cues_for_batch(cues, voice, batch_size=TTS_BATCH_SIZE):
+    """
+    Gom các cue cùng giọng đọc và cùng batch_rate (theo thứ tự cue) thành nhóm tối đa
+    `batch_size` cue. Trả về list (nhóm cue, giọng, rate); rate là None với cue tổng hợp riêng
+    (cue rỗng không có WordBoundary để cắt, hoặc `batch_size` <= 1). Cue có rate luôn đi đường
+    batch kể cả khi nhóm chỉ còn một cue, để cache key của nó không đổi theo các cue khác.
     """
-    Tạo file audio từ file SRT bằng Edge TTS.
+    groups = []
+    open_groups = {}  # (giọng, rate) -> nhóm đang gom
+    for cue in cues:
+        _, _, duration, text = cue
+        cue_voice = resolve_voice(text, voice)
+        if batch_size <= 1 or not text.strip() or duration <= 0:
+            groups.append(([cue], cue_voice, None))
+            continue
+        rate = batch_rate(normalize_text(text), duration)
+        group = open_groups.get((cue_voice, rate))
+        if group is None or len(group[0]) >= batch_size:
+            group = ([cue], cue_voice, rate)
+            open_groups[(cue_voice, rate)] = group
+            groups.append(group)
+        else:
+            group[0].append(cue)
+    return groups
+
+def generate_audio_from_srt(srt_file, save_dir, voice, duration_s=None):
+    """
+    Tạo file audio từ file SRT bằng engine TTS đã cấu hình (mặc định Edge TTS).
+    Audio từng cue chỉ nằm trong bộ nhớ (PCM) và được đặt đúng thời điểm bắt đầu của cue trên
+    timeline; file duy nhất được ghi là WAV kết quả (chưa nén).
+    `duration_s` (thường là độ dài video) giới hạn slot của cue cuối và độ dài file.
     Trả về đường dẫn file đã tạo (trong `save_dir`), hoặc `None` nếu thất bại.
     """
-    voice = "vi-VN-NamMinhNeural" if voice == "2" else "vi-VN-HoaiMyNeural"  # 🔹 Chọn giọng nói
+    voice = voice_for_choice(voice)  # 🔹 Chọn giọng nói
 
     if not os.path.exists(srt_file):
         print("File phụ đề không tồn tại!")
         return None
 
     subs = pysrt.open(srt_file, encoding="utf-8")
-    temp_dir = tempfile.mkdtemp()
-    temp_files = []
 
-    output_audio_file = os.path.join(save_dir, f"{os.path.basename(srt_file).split('.')[0]}.mp3")
+    output_audio_file = os.path.join(save_dir, f"{os.path.basename(srt_file).split('.')[0]}.wav")
     
     async def process_all():
-        for sub in subs:
+        # Tổng hợp song song, giới hạn bởi semaphore; kết quả giữ đúng thứ tự cue
+        semaphore = asyncio.Semaphore(TTS_CONCURRENCY)
+        cues = []
+        for index, sub in enumerate(subs):
             start_ms = srt_time_to_milliseconds(sub.start)
-            end_ms = srt_time_to_milliseconds(sub.end)
-            duration = end_ms - start_ms
-            temp_filename = os.path.join(temp_dir, f"temp_{start_ms}.mp3")
-            success = await text_to_speech(sub.text, temp_filename, duration, voice)
-
-            if success:
-                temp_files.append(temp_filename)
-            else:
-                print(f"Lỗi khi tạo audio cho đoạn: {sub.text}")
-        
-        if temp_files:
-            print(f"Đang ghép {len(temp_files)} file audio lại thành {output_audio_file}...")
-            merge_audio_files(temp_files, output_audio_file)
+            cues.append((index, start_ms, srt_time_to_milliseconds(sub.end) - start_ms, sub.text))
+        results = [None] * len(cues)
+
+        async def synthesize(index, start_ms, duration, text):
+            async with semaphore:
+                samples = await text_to_speech_with_retry(text, duration, voice)
+            if samples is None:
+                print(f"Lỗi khi tạo audio cho đoạn: {text}")
+                return
+            results[index] = (start_ms, samples)
+
+        async def synthesize_group(group, group_voice, rate):
+            if rate is None:
+                await synthesize(*group[0])
+                return
+            async with semaphore:
+                clips = await text_to_speech_batch([text for _, _, _, text in group], group_voice, rate)
+            if clips is None:
+                await asyncio.gather(*[synthesize(*cue) for cue in group])
+                return
+            for (index, start_ms, _, _), samples in zip(group, clips):
+                results[index] = (start_ms, samples)
+
+        groups = group_cues_for_batch(cues, voice, max(TTS_BATCH_SIZE, 1))
+        print(f"Tổng hợp {len(cues)} cue trong {len(groups)} request TTS")
+        await asyncio.gather(*[synthesize_group(*group) for group in groups])
+        clips = [result for result in results if result]
+
+        if clips:
+            print(f"Đang ghép {len(clips)} cue theo timeline thành {output_audio_file}...")
+            _, fit_report = await asyncio.to_thread(assemble_timeline, clips, output_audio_file, duration_s)
+            for entry in fit_report:
+                if entry["sync_error_ms"] > 0:
+                    print(f"Cue {entry['index']} lệch {entry['sync_error_ms']}ms sau khi co giãn x{entry['factor']}")
 
             # Kiểm tra file cuối cùng có tồn tại không
             if os.path.exists(output_audio_file):
@@ -99,13 +205,6 @@ def generate_audio_from_srt(srt_file, save_dir, voice):
             else:
                 print("File audio cuối cùng không tồn tại!")
                 return None
-            
-            # Xóa file tạm
-            for temp_file in temp_files:
-                if os.path.exists(temp_file):
-                    os.remove(temp_file)
-
-            shutil.rmtree(temp_dir)
             return output_audio_file
         return None
 
@@ -0,0 +1,184 @@
+import os
+import re
+import pysrt
+from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type
+from app.modules.module.module_translation_backend import get_translation_backend, RateLimitError
+
+
+@retry(
+    stop=stop_after_attempt(5),
+    wait=wait_exponential(multiplier=1, min=1, max=30),
+    retry=retry_if_exception_type(RateLimitError),  # Chỉ thử lại khi bị giới hạn quota (429)
+    reraise=True
+)
+def generate_text(prompt, target_lang="vi"):
+    """Gửi prompt qua backend dịch hiện tại, tự thử lại với backoff khi gặp 429."""
+    return get_translation_backend().generate(prompt, target_lang)
+
+def parse_numbered_lines(lines):
+    result = {}
+    for line in lines:
+        match = re.match(r"(\d+)\.\s*(.*)", line)
+        if match:
+            idx, txt = int(match.group(1)), match.group(2)
+            result[idx] = txt
+    return result
+
+# Tên ngôn ngữ đích dùng trong prompt
+TARGET_LANGUAGE_NAMES = {
+    "vi": "tiếng Việt",
+    "en": "tiếng Anh",
+    "zh": "tiếng Trung",
+    "ja": "tiếng Nhật",
+    "ko": "tiếng Hàn",
+    "th": "tiếng Thái",
+    "fr": "tiếng Pháp",
+    "es": "tiếng Tây Ban Nha",
+    "de": "tiếng Đức",
+}
+
+def translate_batch(sublist, source_lang="auto", target_lang="vi"):
+    """
+    Dịch một batch phụ đề sang `target_lang` bằng một prompt.
+    Với tiếng Việt, fallback qua tiếng Anh nếu kết quả không hợp lệ.
+    Dòng model không trả về (thiếu hoặc sai định dạng) được giữ nguyên nội dung gốc.
+    """
+    translated = translate_batch_parsed(sublist, source_lang, target_lang)
+    return [text if text is not None else sublist[j] for j, text in enumerate(translated)]
+
+def translate_batch_parsed(sublist, source_lang="auto", target_lang="vi"):
+    """
+    Như translate_batch nhưng dòng model không trả về là None thay vì nội dung gốc, để caller
+    phân biệt dòng đã dịch thật với dòng fallback (ví dụ không lưu fallback vào bộ nhớ dịch).
+    """
+    formatted_text = "\n".join(f"{j+1}. {text}" for j, text in enumerate(sublist))
+
+    if target_lang != "vi":
+        target_name = TARGET_LANGUAGE_NAMES.get(target_lang, target_lang)
+        prompt = f"""
+Bạn là chuyên gia dịch thuật. Hãy dịch từng câu sau từ {source_lang} sang {target_name} tự nhiên, giữ nguyên số thứ tự.
+Nếu không dịch được, hãy giữ nguyên nội dung gốc. Chỉ trả về phần dịch, không bao gồm câu gốc, không giải thích.
+
+{formatted_text}
+"""
+        response_text = generate_text(prompt, target_lang)
+        translated_dict = parse_numbered_lines(response_text.strip().split("\n"))
+        return [translated_dict.get(j+1) for j in range(len(sublist))]
+
+    prompt_vi = f"""
+Bạn là chuyên gia dịch thuật. Hãy dịch từng câu sau từ {source_lang} sang tiếng Việt tự nhiên, giữ nguyên số thứ tự.
+Nếu không dịch được, hãy giữ nguyên nội dung gốc. Chỉ trả về phần dịch, không bao gồm câu gốc, không giải thích.
+
+{formatted_text}
+"""
+    response_vi = generate_text(prompt_vi, "vi")
+    vi_lines = response_vi.strip().split("\n")
+    vi_dict = parse_numbered_lines(vi_lines)
+    translated_texts = [vi_dict.get(j+1) for j in range(len(sublist))]
+
+    # Nếu dịch được tiếng Việt hợp lệ thì trả về luôn
+    if is_valid_vietnamese([text if text is not None else sublist[j] for j, text in enumerate(translated_texts)]):
+        return translated_texts
+
+    # Nếu không, fallback: dịch sang tiếng Anh
+    prompt_en = f"""
+Bạn là chuyên gia dịch thuật. Hãy dịch từng câu sau từ {source_lang} sang tiếng Anh tự nhiên, giữ nguyên số thứ tự.
+Nếu không dịch được, hãy giữ nguyên nội dung gốc. Chỉ trả về phần dịch, không bao gồm câu gốc, không giải thích.
+
+{formatted_text}
+"""
+    response_en = generate_text(prompt_en, "en")
+    en_lines = response_en.strip().split("\n")
+    en_dict = parse_numbered_lines(en_lines)
+    english_texts = [en_dict.get(j+1, sublist[j]) for j in range(len(sublist))]
+
+    # Dịch từ tiếng Anh sang tiếng Việt
+    formatted_english = "\n".join(f"{j+1}. {text}" for j, text in enumerate(english_texts))
+    prompt_en2vi = f"""
+Bạn là chuyên gia dịch thuật. Hãy dịch từng câu sau từ tiếng Anh sang tiếng Việt tự nhiên, giữ nguyên số thứ tự.
+Nếu không dịch được, hãy giữ nguyên nội dung gốc. Chỉ trả về phần dịch, không bao gồm câu gốc, không giải thích.
+
+{formatted_english}
+"""
+    response_en2vi = generate_text(prompt_en2vi, "vi")
+    vi2_lines = response_en2vi.strip().split("\n")
+    vi2_dict = parse_numbered_lines(vi2_lines)
+    return [vi2_dict.get(j+1) for j in range(len(english_texts))]
+
+def batch_translate_text(text_list, source_lang="auto", batch_size=20, target_lang="vi"):
+    """
+    Dịch danh sách phụ đề sang `target_lang` (mặc định tiếng Việt), xử lý theo batch để tránh vượt giới hạn prompt.
+    """
+    if not text_list:
+        return text_list
+
+    translated_result = []
+
+    for i in range(0, len(text_list), batch_size):
+        sublist = text_list[i:i+batch_size]
+        try:
+            translated_result.extend(translate_batch(sublist, source_lang, target_lang))
+        except Exception as e:
+            print(f"Lỗi dịch batch từ dòng {i}: {e}")
+            translated_result.extend(sublist)  # fallback giữ nguyên
+
+    return translated_result
+
+
+def translate_srt(input_srt, output_srt):
+    """Dịch file SRT bằng cách gửi toàn bộ nội dung lên API một lần"""
+    try:
+        # output_srt do caller chọn (thường nằm trong workspace của job), ghi thẳng vào đó
+        if os.path.dirname(output_srt):
+            os.makedirs(os.path.dirname(output_srt), exist_ok=True)
+        
+        # Check if input file exists
+        if not os.path.exists(input_srt):
+            # Create a default subtitle file
+            with open(output_srt, 'w', encoding='utf-8') as srt_file:
+                srt_file.write("1\n00:00:00,000 --> 00:00:05,000\nNo subtitles available\n\n")
+            return output_srt
+        
+        # Read and translate subtitles
+        subs = pysrt.open(input_srt, encoding='utf-8')
+        texts_to_translate = [sub.text for sub in subs]
+        
+        if not texts_to_translate:
+            # Create a default subtitle file if no text to translate
+            with open(output_srt, 'w', encoding='utf-8') as srt_file:
+                srt_file.write("1\n00:00:00,000 --> 00:00:05,000\nNo subtitles to translate\n\n")
+            return output_srt
+            
+        translated_texts = batch_translate_text(texts_to_translate)
+
+        # Write translated subtitles to output file
+        with open(output_srt, 'w', encoding='utf-8') as srt_file:
+            for i, sub in enumerate(subs):
+                srt_file.write(f"{sub.index}\n")
+                srt_file.write(f"{sub.start} --> {sub.end}\n")
+                srt_file.write(f"{translated_texts[i]}\n\n")
+
+        return output_srt
+            
+    except Exception as e:
+        print(f"Error in translate_srt: {e}")
+        # Create a default subtitle file in case of error
+        try:
+            with open(output_srt, 'w', encoding='utf-8') as srt_file:
+                srt_file.write("1\n00:00:00,000 --> 00:00:05,000\nTranslation error occurred\n\n")
+            return output_srt
+        except:
+            raise
+
+
+def is_valid_vietnamese(texts):
+    # Kiểm tra có ký tự tiếng Việt
+    vietnamese_chars = "ăâđêôơưáàảãạấầẩẫậắằẳẵặéèẻẽẹếềểễệíìỉĩịóòỏõọốồổỗộớờởỡợúùủũụứừửữựýỳỷỹỵ"
+    
+    # Ít nhất 40% số dòng phải chứa ký tự tiếng Việt để coi là hợp lệ
+    valid_lines = 0
+    for text in texts:
+        if any(char.lower() in vietnamese_chars for char in text):
+            valid_lines += 1
+    
+    return valid_lines / len(texts) >= 0.4 if texts else False
@@ -0,0 +1,84 @@
+import os
+import requests
+
+# Chọn backend dịch: "gemini" (mặc định) hoặc "stub" (server giả lập chạy local)
+TRANSLATION_BACKEND = os.environ.get("TRANSLATION_BACKEND", "gemini")
+TRANSLATION_STUB_URL = os.environ.get("TRANSLATION_STUB_URL", "http://127.0.0.1:8765")
+
+
+class RateLimitError(Exception):
+    """Backend trả về lỗi quota/429, nên thử lại sau."""
+
+
+class TranslationBackend:
+    """Interface tối thiểu cho LLM dịch: nhận prompt, trả về text."""
+
+    name = "base"
+
+    def generate(self, prompt, target_lang="vi"):
+        raise NotImplementedError
+
+
+class GeminiBackend(TranslationBackend):
+    name = "gemini"
+
+    def __init__(self):
+        # Import muộn để các script offline không cần cấu hình Gemini
+        import google.generativeai as genai
+        from app.core.config import get_settings
+
+        settings = get_settings()
+        genai.configure(api_key=settings.API_KEY)
+        self._model = genai.GenerativeModel(settings.API_MODEL)
+
+    def generate(self, prompt, target_lang="vi"):
+        from google.api_core.exceptions import ResourceExhausted, TooManyRequests
+
+        try:
+            return self._model.generate_content(prompt).text
+        except (ResourceExhausted, TooManyRequests) as e:
+            raise RateLimitError(str(e)) from e
+
+
+class StubBackend(TranslationBackend):
+    """Gọi server giả lập (scripts/llm_stub_server.py) qua HTTP."""
+
+    name = "stub"
+
+    def __init__(self, base_url=TRANSLATION_STUB_URL, timeout=30):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self._session = requests.Session()
+
+    def generate(self, prompt, target_lang="vi"):
+        response = self._session.post(
+            f"{self.base_url}/generate",
+            json={"prompt": prompt, "target_lang": target_lang},
+            timeout=self.timeout
+        )
+        if response.status_code == 429:
+            raise RateLimitError(response.text)
+        response.raise_for_status()
+        return response.json()["text"]
+
+
+_backend = None
+
+
+def get_translation_backend():
+    """Backend dùng chung cho toàn process, chọn theo biến môi trường TRANSLATION_BACKEND."""
+    global _backend
+    if _backend is None:
+        if TRANSLATION_BACKEND == "stub":
+            _backend = StubBackend()
+        elif TRANSLATION_BACKEND == "gemini":
+            _backend = GeminiBackend()
+        else:
+            raise ValueError(f"Unknown translation backend: {TRANSLATION_BACKEND}")
+    return _backend
+
+
+def set_translation_backend(backend):
+    """Thay backend (dùng cho benchmark/kiểm thử)."""
+    global _backend
+    _backend = backend
@@ -0,0 +1,144 @@
+import asyncio
+import os
+import weakref
+from collections import OrderedDict
+from app.modules.module.module_translate import translate_batch_parsed
+
+# Cấu hình broker (có thể override bằng biến môi trường)
+BROKER_MAX_WAIT_MS = int(os.environ.get("TRANSLATION_BROKER_WAIT_MS", "200"))
+BROKER_MAX_LINES = int(os.environ.get("TRANSLATION_BROKER_MAX_LINES", "40"))
+BROKER_MAX_CALLS = int(os.environ.get("TRANSLATION_BROKER_MAX_CALLS", "4"))
+MEMORY_MAX_ENTRIES = int(os.environ.get("TRANSLATION_MEMORY_MAX_ENTRIES", "50000"))
+
+
+class TranslationMemory:
+    """
+    Bộ nhớ dịch dùng chung (LRU) theo (source_lang, target_lang, text).
+    Câu lặp lại trong cùng video, giữa các ngôn ngữ đích hay giữa các job chỉ phải dịch một lần.
+    """
+
+    def __init__(self, max_entries=MEMORY_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+
+    def get(self, source_lang, target_lang, text):
+        key = (source_lang, target_lang, text)
+        if key not in self._entries:
+            return None
+        self._entries.move_to_end(key)
+        return self._entries[key]
+
+    def put(self, source_lang, target_lang, text, translation):
+        key = (source_lang, target_lang, text)
+        self._entries[key] = translation
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+
+class TranslationBroker:
+    """
+    Gom các dòng cần dịch từ nhiều job đang chạy thành prompt chung.
+
+    Mỗi job gọi `translate()` với batch của mình; broker giữ các dòng theo cặp ngôn ngữ
+    trong tối đa `max_wait` giây (hoặc đến khi đủ `max_lines` dòng), gửi một lần lên model
+    rồi trả kết quả về đúng job. Số lần gọi API giảm khi nhiều người upload cùng lúc.
+    """
+
+    def __init__(self, max_wait=BROKER_MAX_WAIT_MS / 1000, max_lines=BROKER_MAX_LINES, max_calls=BROKER_MAX_CALLS, memory=None):
+        self.max_wait = max_wait
+        self.max_lines = max_lines
+        self.max_calls = max_calls
+        self.memory = memory if memory is not None else TranslationMemory()
+        # Semaphore, future và timer đều gắn với event loop: broker là singleton của module nên
+        # mỗi loop (uvicorn, asyncio.run trong script/thread) có state riêng, tạo khi dùng lần đầu
+        self._loops = weakref.WeakKeyDictionary()
+        self.stats = {"requests": 0, "lines": 0, "calls": 0, "memory_hits": 0}
+
+    def _state(self, loop):
+        state = self._loops.get(loop)
+        if state is None:
+            state = {
+                "call_slots": asyncio.Semaphore(self.max_calls),
+                "pending": {},   # (source_lang, target_lang) -> [(text, future)]
+                "timers": {},    # (source_lang, target_lang) -> TimerHandle
+                "tasks": set(),  # dispatch đang chạy; loop chỉ giữ weak reference tới task
+            }
+            self._loops[loop] = state
+        return state
+
+    async def translate(self, texts, source_lang="auto", target_lang="vi"):
+        """Dịch danh sách dòng, trả về list cùng thứ tự."""
+        if not texts:
+            return []
+        loop = asyncio.get_running_loop()
+        state = self._state(loop)
+        key = (source_lang, target_lang)
+        pending = state["pending"].setdefault(key, [])
+        futures = []
+        for text in texts:
+            future = loop.create_future()
+            cached = self.memory.get(source_lang, target_lang, text)
+            if cached is not None:
+                future.set_result(cached)
+                self.stats["memory_hits"] += 1
+            else:
+                pending.append((text, future))
+            futures.append(future)
+        self.stats["requests"] += 1
+        self.stats["lines"] += len(texts)
+
+        if not pending:
+            state["pending"].pop(key, None)
+        elif len(pending) >= self.max_lines:
+            self._flush(state, key)
+        elif key not in state["timers"]:
+            state["timers"][key] = loop.call_later(self.max_wait, self._flush, state, key)
+
+        return list(await asyncio.gather(*futures))
+
+    def _flush(self, state, key):
+        timer = state["timers"].pop(key, None)
+        if timer is not None:
+            timer.cancel()
+        items = state["pending"].pop(key, [])
+        while items:
+            chunk, items = items[:self.max_lines], items[self.max_lines:]
+            # Giữ reference tới task đến khi xong, tránh bị GC giữa chừng (future của job không bao giờ có kết quả)
+            task = asyncio.ensure_future(self._dispatch(state, key, chunk))
+            state["tasks"].add(task)
+            task.add_done_callback(state["tasks"].discard)
+
+    async def _dispatch(self, state, key, chunk):
+        source_lang, target_lang = key
+        # Các job khác nhau có thể gửi cùng một câu, chỉ dịch mỗi câu một lần
+        unique_texts = list(dict.fromkeys(text for text, _ in chunk))
+        loop = asyncio.get_running_loop()
+        async with state["call_slots"]:
+            self.stats["calls"] += 1
+            try:
+                translated = await loop.run_in_executor(None, translate_batch_parsed, unique_texts, source_lang, target_lang)
+                # Chỉ lưu dòng model thực sự trả về; dòng thiếu/sai định dạng (None) giữ nguyên gốc
+                # cho lần này và được dịch lại ở lần sau thay vì nằm trong bộ nhớ suốt vòng đời process
+                for text, translation in zip(unique_texts, translated):
+                    if translation is not None:
+                        self.memory.put(source_lang, target_lang, text, translation)
+            except Exception as e:
+                print(f"[Broker] Lỗi dịch {len(unique_texts)} dòng ({source_lang}->{target_lang}): {e}")
+                translated = unique_texts  # fallback giữ nguyên
+        mapping = dict(zip(unique_texts, translated))
+        for text, future in chunk:
+            if not future.done():
+                translation = mapping.get(text)
+                future.set_result(translation if translation is not None else text)
+
+
+_broker = None
+
+
+def get_translation_broker():
+    """Broker dùng chung cho toàn process."""
+    global _broker
+    if _broker is None:
+        _broker = TranslationBroker()
+    return _broker
@@ -0,0 +1,233 @@
+import os
+import re
+import math
+import bisect
+import random
+import shutil
+import asyncio
+import hashlib
+import numpy as np
+from app.modules.module.module_audio_assembler import ASSEMBLER_SAMPLE_RATE, decode_bytes_to_pcm
+
+# Chọn backend TTS: "edge" (mặc định, cần mạng) hoặc "local" (offline, cho kiểm thử/benchmark)
+TTS_BACKEND = os.environ.get("TTS_BACKEND", "edge")
+TTS_LOCAL_LATENCY_MS = float(os.environ.get("TTS_LOCAL_LATENCY_MS", "0"))
+TTS_LOCAL_JITTER_MS = float(os.environ.get("TTS_LOCAL_JITTER_MS", "0"))
+# "auto": dùng espeak-ng nếu có trong PATH, ngược lại sinh tone; "espeak" / "tone" để ép chọn
+TTS_LOCAL_ENGINE = os.environ.get("TTS_LOCAL_ENGINE", "auto")
+
+LOCAL_SAMPLE_RATE = ASSEMBLER_SAMPLE_RATE
+# Thời lượng đọc ước lượng mỗi ký tự ở tốc độ gốc (giống calculate_rate)
+LOCAL_MS_PER_CHAR = 100
+# Khoảng lặng giữ lại hai đầu mỗi cue khi cắt audio batch theo WordBoundary
+BOUNDARY_PAD_MS = 50
+# WordBoundary của edge-tts tính offset theo đơn vị 100ns
+TICKS_PER_SECOND = 10_000_000
+
+
+def rate_to_speed(rate):
+    """Chuyển rate kiểu edge-tts ("+50%", "-10%") thành hệ số tốc độ."""
+    match = re.fullmatch(r"([+-]\d+)%", rate or "+0%")
+    if not match:
+        return 1.0
+    return max(0.1, 1 + int(match.group(1)) / 100)
+
+
+def join_cue_texts(texts):
+    """
+    Nối text nhiều cue thành một request. Mỗi cue kết thúc bằng dấu câu để engine ngắt nghỉ giữa
+    các cue. Trả về (joined, starts) với `starts` là vị trí ký tự bắt đầu của từng cue.
+    """
+    parts = []
+    starts = []
+    position = 0
+    for text in texts:
+        text = " ".join(text.split())
+        if text and text[-1] not in ".!?。！？…":
+            text += "."
+        starts.append(position)
+        parts.append(text)
+        position += len(text) + 1
+    return "\n".join(parts), starts
+
+
+def split_by_word_boundaries(samples, joined, starts, words, sample_rate=ASSEMBLER_SAMPLE_RATE):
+    """
+    Cắt audio của một request nhiều cue thành từng clip theo sự kiện WordBoundary.
+
+    `words` là list (offset, duration, text) theo đơn vị 100ns. Mỗi từ được dò lại trong `joined`
+    để biết thuộc cue nào; clip của cue chạy từ từ đầu tới từ cuối của nó (cộng thêm khoảng đệm
+    nhỏ, không vượt qua điểm giữa khoảng lặng với cue kề bên). Raise ValueError nếu có cue không
+    khớp được từ nào, để caller chuyển sang tổng hợp từng cue.
+    """
+    lowered = joined.lower()
+    spans = [None] * len(starts)
+    cursor = 0
+    for offset, duration, word in words:
+        position = lowered.find(word.lower(), cursor)
+        if not word or position < 0:
+            continue
+        cursor = position + len(word)
+        cue = bisect.bisect_right(starts, position) - 1
+        start = int(offset * sample_rate / TICKS_PER_SECOND)
+        end = int((offset + duration) * sample_rate / TICKS_PER_SECOND)
+        spans[cue] = (spans[cue][0], end) if spans[cue] else (start, end)
+
+    missing = [index for index, span in enumerate(spans) if span is None]
+    if missing:
+        raise ValueError(f"Không tìm thấy WordBoundary cho cue {missing}")
+
+    pad = int(BOUNDARY_PAD_MS * sample_rate / 1000)
+    clips = []
+    for index, (start, end) in enumerate(spans):
+        lower = (spans[index - 1][1] + start) // 2 if index > 0 else 0
+        upper = (end + spans[index + 1][0]) // 2 if index + 1 < len(spans) else len(samples)
+        clips.append(samples[max(lower, start - pad):min(upper, end + pad)])
+    return clips
+
+
+class TTSBackend:
+    """
+    Interface cho engine TTS. Audio trả về luôn là mảng PCM int16 mono ở ASSEMBLER_SAMPLE_RATE,
+    giữ trong bộ nhớ, không ghi file tạm.
+    """
+
+    name = "base"
+
+    @property
+    def version(self):
+        """Phiên bản engine, nằm trong cache key của TTS cache."""
+        return self.name
+
+    async def synthesize(self, text, voice, rate):
+        raise NotImplementedError
+
+    async def synthesize_batch(self, texts, voice, rate):
+        """
+        Tổng hợp nhiều cue trong một request, trả về list mảng PCM, mỗi cue một mảng.
+        Backend không hỗ trợ thì raise NotImplementedError để caller tổng hợp từng cue.
+        """
+        raise NotImplementedError
+
+
+class EdgeTTSBackend(TTSBackend):
+    name = "edge"
+
+    def __init__(self):
+        import edge_tts
+
+        self._edge_tts = edge_tts
+
+    @property
+    def version(self):
+        return f"edge-tts-{getattr(self._edge_tts, '__version__', 'unknown')}"
+
+    async def _stream(self, text, voice, rate, boundary=None):
+        """Nhận audio mp3 từ edge-tts vào bộ nhớ và giải mã thành PCM; trả về (samples, words)."""
+        options = {"boundary": boundary} if boundary else {}
+        communicate = self._edge_tts.Communicate(text, voice, rate=rate, **options)
+        audio = bytearray()
+        words = []
+        async for chunk in communicate.stream():
+            if chunk["type"] == "audio":
+                audio.extend(chunk["data"])
+            elif chunk["type"] == boundary:
+                words.append((chunk["offset"], chunk["duration"], chunk["text"]))
+
+        if not audio:
+            raise Exception("Không nhận được audio. Kiểm tra tham số API.")
+        samples = await asyncio.to_thread(decode_bytes_to_pcm, bytes(audio))
+        return samples, words
+
+    async def synthesize(self, text, voice, rate):
+        samples, _ = await self._stream(text, voice, rate)
+        return samples
+
+    async def synthesize_batch(self, texts, voice, rate):
+        # edge-tts không nhận SSML tùy biến (không có bookmark), nên dùng WordBoundary để cắt
+        joined, starts = join_cue_texts(texts)
+        samples, words = await self._stream(joined, voice, rate, boundary="WordBoundary")
+        return split_by_word_boundaries(samples, joined, starts, words)
+
+
+class LocalTTSBackend(TTSBackend):
+    """
+    Engine offline: espeak-ng nếu có, nếu không thì sinh tone xác định theo nội dung text với độ dài
+    tỉ lệ số ký tự / tốc độ. Độ trễ giả lập (`latency_ms` ± `jitter_ms`) để đo throughput pipeline
+    mà không cần dịch vụ bên ngoài.
+    """
+
+    name = "local"
+
+    def __init__(self, latency_ms=TTS_LOCAL_LATENCY_MS, jitter_ms=TTS_LOCAL_JITTER_MS, engine=TTS_LOCAL_ENGINE, seed=None):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self._random = random.Random(seed)
+        self._espeak = shutil.which("espeak-ng") if engine in ("auto", "espeak") else None
+        if engine == "espeak" and not self._espeak:
+            raise RuntimeError("espeak-ng không có trong PATH")
+
+    @property
+    def version(self):
+        return "local-espeak-ng" if self._espeak else "local-tone"
+
+    async def _simulate_latency(self):
+        delay = self.latency_ms + self._random.uniform(-self.jitter_ms, self.jitter_ms)
+        if delay > 0:
+            await asyncio.sleep(delay / 1000)
+
+    async def synthesize(self, text, voice, rate):
+        await self._simulate_latency()
+        speed = rate_to_speed(rate)
+        if self._espeak:
+            return await self._synthesize_espeak(text, voice, speed)
+        return self._tone_samples(text, speed)
+
+    async def synthesize_batch(self, texts, voice, rate):
+        if self._espeak:
+            raise NotImplementedError
+        # Một lần trễ cho cả batch, giống một round trip
+        await self._simulate_latency()
+        speed = rate_to_speed(rate)
+        return [self._tone_samples(text, speed) for text in texts]
+
+    async def _synthesize_espeak(self, text, voice, speed):
+        # "vi-VN-HoaiMyNeural" -> "vi", "zh-CN-XiaoxiaoNeural" -> "cmn"
+        language = (voice or "vi").split("-")[0]
+        language = "cmn" if language == "zh" else language
+        process = await asyncio.create_subprocess_exec(
+            self._espeak, "-v", language, "-s", str(int(175 * speed)), "--stdout", text,
+            stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
+        )
+        stdout, stderr = await process.communicate()
+        if process.returncode != 0:
+            raise Exception(f"espeak-ng lỗi: {stderr.decode(errors='ignore').strip()}")
+        return await asyncio.to_thread(decode_bytes_to_pcm, stdout)
+
+    def _tone_samples(self, text, speed):
+        duration_s = max(len(text), 1) * LOCAL_MS_PER_CHAR / 1000 / speed
+        frequency = 200 + int(hashlib.md5(text.encode("utf-8")).hexdigest()[:4], 16) % 400
+        t = np.arange(int(duration_s * LOCAL_SAMPLE_RATE)) / LOCAL_SAMPLE_RATE
+        return (0.3 * 32767 * np.sin(2 * math.pi * frequency * t)).astype(np.int16)
+
+
+_backend = None
+
+
+def get_tts_backend():
+    """Backend dùng chung cho toàn process, chọn theo biến môi trường TTS_BACKEND."""
+    global _backend
+    if _backend is None:
+        if TTS_BACKEND == "local":
+            _backend = LocalTTSBackend()
+        elif TTS_BACKEND == "edge":
+            _backend = EdgeTTSBackend()
+        else:
+            raise ValueError(f"Unknown TTS backend: {TTS_BACKEND}")
+    return _backend
+
+
+def set_tts_backend(backend):
+    """Thay backend (dùng cho benchmark/kiểm thử)."""
+    global _backend
+    _backend = backend
@@ -0,0 +1,203 @@
+import hashlib
+import json
+import os
+import threading
+import logging
+import numpy as np
+from app.modules.module.module_audio_assembler import ASSEMBLER_SAMPLE_RATE, decode_bytes_to_pcm
+from app.modules.module.module_ffmpeg_runner import run_ffmpeg_pipe
+
+logger = logging.getLogger(__name__)
+
+# Cấu hình cache (có thể override bằng biến môi trường)
+TTS_CACHE_DIR = os.environ.get("TTS_CACHE_DIR", "tts_cache")
+TTS_CACHE_MAX_BYTES = int(os.environ.get("TTS_CACHE_MAX_BYTES", str(2 * 1024 * 1024 * 1024)))
+TTS_CACHE_S3_BUCKET = os.environ.get("TTS_CACHE_S3_BUCKET", "")
+TTS_CACHE_S3_PREFIX = "tts-cache"
+# Clip được lưu dạng Ogg Opus (giọng nói 32 kbps nhỏ hơn PCM int16 24 kHz khoảng 12 lần)
+TTS_CACHE_BITRATE = os.environ.get("TTS_CACHE_BITRATE", "32k")
+
+
+def make_cache_key(text, voice, rate, engine_version):
+    """Key nội dung: hash(text đã chuẩn hóa, voice, rate, phiên bản engine)."""
+    normalized = " ".join(text.split())
+    payload = json.dumps([normalized, voice, rate, engine_version], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def encode_clip(samples, sample_rate=ASSEMBLER_SAMPLE_RATE):
+    """PCM int16 mono -> bytes Ogg Opus để lưu cache."""
+    return run_ffmpeg_pipe(
+        ["ffmpeg", "-v", "error", "-f", "s16le", "-ac", "1", "-ar", str(sample_rate), "-i", "pipe:0",
+         "-c:a", "libopus", "-b:a", TTS_CACHE_BITRATE, "-application", "voip", "-f", "ogg", "pipe:1"],
+        input_bytes=samples.astype(np.int16).tobytes(), label="encode cache clip"
+    )
+
+
+class TTSCache:
+    """
+    Cache audio TTS theo nội dung (clip đã nén Ogg Opus), lưu trên đĩa local với giới hạn
+    dung lượng (LRU theo mtime), có thể mirror sang S3 để các node khác dùng lại.
+    get_samples/put_samples đổi qua lại với PCM int16 mono ở ASSEMBLER_SAMPLE_RATE.
+    """
+
+    def __init__(self, cache_dir=TTS_CACHE_DIR, max_bytes=TTS_CACHE_MAX_BYTES, s3_bucket=TTS_CACHE_S3_BUCKET, extension=".opus"):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.s3_bucket = s3_bucket
+        self.extension = extension
+        self._lock = threading.Lock()
+        self._size = None
+        self.stats = {"hits": 0, "s3_hits": 0, "misses": 0, "evictions": 0}
+
+    def _local_path(self, key):
+        return os.path.join(self.cache_dir, key[:2], key + self.extension)
+
+    def _s3_key(self, key):
+        return f"{TTS_CACHE_S3_PREFIX}/{key[:2]}/{key}{self.extension}"
+
+    def _read(self, path):
+        with open(path, "rb") as f:
+            return f.read()
+
+    def get(self, key):
+        """Trả về bytes audio đã cache, hoặc None nếu cache miss."""
+        local_path = self._local_path(key)
+        if os.path.exists(local_path):
+            try:
+                data = self._read(local_path)
+                os.utime(local_path)  # Đánh dấu vừa dùng cho LRU
+                self.stats["hits"] += 1
+                return data
+            except OSError as e:
+                logger.warning(f"TTS cache read failed for {key}: {e}")
+
+        if self.s3_bucket and self._download_from_s3(key, local_path):
+            self.stats["s3_hits"] += 1
+            return self._read(local_path)
+
+        self.stats["misses"] += 1
+        return None
+
+    def get_samples(self, key):
+        """Clip đã cache giải nén về PCM int16, hoặc None nếu cache miss/clip hỏng."""
+        data = self.get(key)
+        if data is None:
+            return None
+        try:
+            return decode_bytes_to_pcm(data)
+        except Exception as e:
+            logger.warning(f"TTS cache decode failed for {key}: {e}")
+            return None
+
+    def put_samples(self, key, samples):
+        """Nén PCM vừa tổng hợp rồi lưu vào cache."""
+        if os.path.exists(self._local_path(key)):
+            return
+        try:
+            data = encode_clip(samples)
+        except Exception as e:
+            logger.warning(f"TTS cache encode failed for {key}: {e}")
+            return
+        self.put(key, data)
+
+    def put(self, key, data):
+        """Lưu bytes audio vừa tổng hợp vào cache (và S3 nếu có cấu hình)."""
+        local_path = self._local_path(key)
+        if os.path.exists(local_path):
+            return
+        try:
+            os.makedirs(os.path.dirname(local_path), exist_ok=True)
+            tmp_path = self._tmp_path(local_path)
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, local_path)
+        except OSError as e:
+            logger.warning(f"TTS cache write failed for {key}: {e}")
+            return
+
+        with self._lock:
+            self._add_size(local_path)
+            if self._size > self.max_bytes:
+                self._evict()
+
+        if self.s3_bucket:
+            self._upload_to_s3(key, local_path)
+
+    def _tmp_path(self, local_path):
+        return f"{local_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+
+    def _add_size(self, local_path):
+        """Cộng file vừa thêm vào tổng dung lượng; lần đầu thì quét thư mục (đã gồm file này)."""
+        if self._size is None:
+            self._size = sum(size for _, _, size in self._entries())
+        else:
+            self._size += os.path.getsize(local_path)
+
+    def _entries(self):
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if not name.endswith(self.extension):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                yield path, stat.st_mtime, stat.st_size
+
+    def _evict(self):
+        """Xóa các file ít dùng nhất cho đến khi dưới giới hạn dung lượng."""
+        for path, _, size in sorted(self._entries(), key=lambda entry: entry[1]):
+            if self._size <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                self._size -= size
+                self.stats["evictions"] += 1
+            except OSError:
+                continue
+
+    def _download_from_s3(self, key, local_path):
+        from app.modules.s3_process import get_s3_client
+        from botocore.exceptions import ClientError
+
+        # Tải ra file tạm rồi os.replace như put: get đồng thời không đọc phải file đang ghi dở
+        tmp_path = self._tmp_path(local_path)
+        try:
+            os.makedirs(os.path.dirname(local_path), exist_ok=True)
+            get_s3_client().download_file(Bucket=self.s3_bucket, Key=self._s3_key(key), Filename=tmp_path)
+            os.replace(tmp_path, local_path)
+            with self._lock:
+                self._add_size(local_path)
+            return True
+        except ClientError:
+            return False
+        except Exception as e:
+            logger.warning(f"TTS cache S3 download failed for {key}: {e}")
+            return False
+        finally:
+            if os.path.exists(tmp_path):
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+
+    def _upload_to_s3(self, key, local_path):
+        from app.modules.s3_process import get_s3_client
+
+        try:
+            get_s3_client().upload_file(Filename=local_path, Bucket=self.s3_bucket, Key=self._s3_key(key))
+        except Exception as e:
+            logger.warning(f"TTS cache S3 upload failed for {key}: {e}")
+
+
+_cache = None
+
+
+def get_tts_cache():
+    """Cache dùng chung cho toàn process."""
+    global _cache
+    if _cache is None:
+        _cache = TTSCache()
+    return _cache
@@ -241,6 +241,31 @@ def delete_file_from_s3(file_url: str, bucket_name: str) -> bool:
         # However, the function signature implies it can raise, so let's make it do so.
         raise RuntimeError(f"Unexpected error deleting S3 object {filename}: {str(e)}") from e
 
+def s3_object_exists(s3_key: str, bucket_name: str) -> bool:
+    """
+    Check whether an object exists (HEAD request, nothing is downloaded).
+    Raises: ClientError for errors other than "not found"
+    """
+    try:
+        get_s3_client().head_object(Bucket=bucket_name, Key=s3_key)
+        return True
+    except ClientError as e:
+        if e.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey', 'NotFound'):
+            return False
+        raise
+
+def presigned_url_for(file_url: str, bucket_name: str, expires_in: int = 3600) -> str:
+    """
+    Fresh pre-signed GET URL for a stored file (the URL saved in the database may have expired),
+    e.g. to let ffmpeg read the object directly without downloading it first.
+    """
+    s3_key = urllib.parse.unquote(urllib.parse.urlparse(file_url).path.split("/")[-1])
+    return get_s3_client().generate_presigned_url(
+        'get_object',
+        Params={'Bucket': bucket_name, 'Key': s3_key},
+        ExpiresIn=expires_in
+    )
+
 def download_file_from_s3(file_url: str, bucket_name: str, download_path: str) -> bool:
     """
     Download a file from S3 to the specified path.
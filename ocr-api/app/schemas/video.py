@@ -6,13 +6,26 @@ class VideoBase(BaseModel):
     file_name: str
     file_url: str
 
-class VideoUpdate(BaseModel):
+class VideoMedia(BaseModel):
+    duration: Optional[float] = None
+    fps: Optional[str] = None
+    width: Optional[int] = None
+    height: Optional[int] = None
+    video_codec: Optional[str] = None
+    audio_codec: Optional[str] = None
+    keyframe_interval: Optional[float] = None
+    file_size: Optional[int] = None
+    content_hash: Optional[str] = None
+
+class VideoUpdate(VideoMedia):
     file_name: Optional[str] = None
     file_url: Optional[str] = None
+    source_url: Optional[str] = None
 
-class Video(VideoBase):
+class Video(VideoBase, VideoMedia):
     video_id: str
     user_id: str
+    source_url: Optional[str] = None
     created_at: datetime
 
 
@@ -47,6 +60,10 @@ class VideoTTSBase(BaseModel):
     video_tts_url: str
     srt_id: str
     video_id: str
+    audio_url: Optional[str] = None
+    voice: Optional[str] = None
+    render_key: Optional[str] = None
+    srt_url: Optional[str] = None
 
 class VideoTTSUpdate(VideoTTSBase):
     video_tts_name: Optional[str] = None
@@ -61,3 +78,19 @@ class VideoTTS(VideoTTSBase):
 
     class Config:
         from_attributes = True
+
+class SubtitleTrackBase(BaseModel):
+    language: str
+    srt_url: str
+    srt_id: str
+    video_id: str
+
+class SubtitleTrackCreate(SubtitleTrackBase):
+    pass
+
+class SubtitleTrack(SubtitleTrackBase):
+    track_id: str
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
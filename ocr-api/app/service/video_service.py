@@ -1,7 +1,7 @@
 from sqlalchemy.orm import Session
-from sqlalchemy.exc import SQLAlchemyError
-from app.models.video import Video, SRT, VIDEO_TTS
-from app.schemas.video import VideoUpdate, SRTCreate, SRTUpdate, VideoTTSCreate, VideoTTSUpdate, VideoTTS
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+from app.models.video import Video, SRT, VIDEO_TTS, SubtitleTrack
+from app.schemas.video import VideoUpdate, SRTCreate, SRTUpdate, VideoTTSCreate, VideoTTSUpdate, VideoTTS, SubtitleTrackCreate
 from fastapi import HTTPException, status
 from typing import List, Optional
 from app.core.config import get_settings
@@ -109,6 +109,9 @@ def update_video(
         db_video.file_url = video.file_url
     else:
         db_video.file_url = old_video_url
+    # update source_url if it is not None
+    if video.source_url is not None:
+        db_video.source_url = video.source_url
     db.commit()
     db.refresh(db_video)
     return db_video
@@ -211,4 +214,68 @@ def get_video_tts_by_id(
         db: Session, 
         video_tts_id: str
         ):
-    return db.query(VIDEO_TTS).filter(VIDEO_TTS.video_tts_id == video_tts_id).first()
\ No newline at end of file
+    return db.query(VIDEO_TTS).filter(VIDEO_TTS.video_tts_id == video_tts_id).first()
+
+def get_video_tts_by_render_key(
+        db: Session,
+        video_id: str,
+        render_key: str
+        ):
+    """Video TTS mới nhất của video có cùng render key (cùng stream video, có thể khác giọng)."""
+    return (
+        db.query(VIDEO_TTS)
+        .filter(VIDEO_TTS.video_id == video_id, VIDEO_TTS.render_key == render_key)
+        .order_by(VIDEO_TTS.created_at.desc())
+        .first()
+    )
+
+def get_subtitle_tracks(
+        db: Session,
+        video_id: str
+        ):
+    return db.query(SubtitleTrack).filter(SubtitleTrack.video_id == video_id).all()
+
+def get_subtitle_track(
+        db: Session,
+        video_id: str,
+        language: str
+        ):
+    return db.query(SubtitleTrack).filter(
+        SubtitleTrack.video_id == video_id,
+        SubtitleTrack.language == language
+    ).first()
+
+def upsert_subtitle_track(
+        db: Session,
+        track: SubtitleTrackCreate
+        ) -> SubtitleTrack:
+    """
+    Tạo mới hoặc cập nhật URL của track theo (video_id, language). (video_id, language) là unique:
+    nếu request khác vừa tạo cùng track thì cập nhật track đó.
+    """
+    try:
+        db_track = get_subtitle_track(db, track.video_id, track.language)
+        if db_track:
+            db_track.srt_url = track.srt_url
+            db_track.srt_id = track.srt_id
+            db.commit()
+        else:
+            try:
+                db_track = SubtitleTrack(**track.dict())
+                db.add(db_track)
+                db.commit()
+            except IntegrityError:
+                db.rollback()
+                db_track = get_subtitle_track(db, track.video_id, track.language)
+                if not db_track:
+                    raise
+                db_track.srt_url = track.srt_url
+                db_track.srt_id = track.srt_id
+                db.commit()
+        db.refresh(db_track)
+        logger.info(f"Saved subtitle track {db_track.track_id} ({track.language}) for video {track.video_id}")
+        return db_track
+    except SQLAlchemyError as e:
+        logger.error(f"Database error in upsert_subtitle_track for video {track.video_id}, language {track.language}: {str(e)}")
+        db.rollback()
+        raise HTTPException(status_code=500, detail=f"Database error while saving subtitle track: {str(e)}")
@@ -0,0 +1,188 @@
+"""
+Benchmark tầng dịch (batch_translate_text / translation broker) với server LLM giả lập.
+
+Ví dụ:
+    python scripts/benchmark_translation.py --spawn-stub --videos 8 --cues 300 --mode broker
+    python scripts/benchmark_translation.py --stub-url http://127.0.0.1:8765 --mode direct
+
+In ra lines/s, số lần gọi LLM trên mỗi video và độ trễ p50/p95/p99 để so sánh các thay đổi offline.
+Ở chế độ broker bộ nhớ dịch tắt mặc định (bật bằng --broker-memory, số memory hit in riêng).
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.modules.module.module_translation_backend import TranslationBackend, StubBackend, set_translation_backend  # noqa: E402
+from app.modules.module.module_translate import batch_translate_text  # noqa: E402
+from app.modules.module.module_translation_broker import TranslationBroker, TranslationMemory  # noqa: E402
+
+
+class TimedBackend(TranslationBackend):
+    """Bọc backend thật để đếm số lần gọi và đo độ trễ từng lần."""
+
+    name = "timed"
+
+    def __init__(self, inner):
+        self.inner = inner
+        self.latencies = []
+        self.failures = 0
+        self._lock = threading.Lock()
+
+    def generate(self, prompt, target_lang="vi"):
+        started = time.perf_counter()
+        try:
+            return self.inner.generate(prompt, target_lang)
+        except Exception:
+            with self._lock:
+                self.failures += 1
+            raise
+        finally:
+            with self._lock:
+                self.latencies.append(time.perf_counter() - started)
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def make_video_lines(video_index, cues):
+    # Một phần câu lặp lại giữa các video, giống phụ đề thật (lời chào, tên nhân vật...)
+    return [
+        f"Line {i % 50} of a common scene" if i % 5 == 0 else f"Video {video_index} subtitle line {i}"
+        for i in range(cues)
+    ]
+
+
+def run_direct(videos, batch_size):
+    """Mỗi video tự gọi batch_translate_text trong thread riêng (cách cũ)."""
+    video_latencies = []
+
+    def job(lines):
+        started = time.perf_counter()
+        batch_translate_text(lines, batch_size=batch_size)
+        video_latencies.append(time.perf_counter() - started)
+
+    with ThreadPoolExecutor(max_workers=len(videos)) as pool:
+        list(pool.map(job, videos))
+    return video_latencies
+
+
+async def run_broker(videos, batch_size, wait_ms, max_lines, max_calls, use_memory=False):
+    """
+    Tất cả video gửi batch qua một broker dùng chung. Mặc định tắt bộ nhớ dịch (max_entries=0)
+    để số lần gọi LLM chỉ phản ánh việc gộp batch, so sánh công bằng với chế độ direct.
+    Trả về (độ trễ từng video, broker.stats).
+    """
+    memory = TranslationMemory() if use_memory else TranslationMemory(max_entries=0)
+    broker = TranslationBroker(max_wait=wait_ms / 1000, max_lines=max_lines, max_calls=max_calls, memory=memory)
+    video_latencies = []
+
+    async def job(lines):
+        started = time.perf_counter()
+        for i in range(0, len(lines), batch_size):
+            await broker.translate(lines[i:i + batch_size])
+        video_latencies.append(time.perf_counter() - started)
+
+    await asyncio.gather(*[job(lines) for lines in videos])
+    return video_latencies, broker.stats
+
+
+def spawn_stub(args):
+    stub_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "llm_stub_server.py")
+    process = subprocess.Popen([
+        sys.executable, stub_path,
+        "--port", str(args.stub_port),
+        "--latency-ms", str(args.latency_ms),
+        "--rate-limit-rate", str(args.rate_limit_rate),
+        "--error-rate", str(args.error_rate),
+        "--malformed-rate", str(args.malformed_rate),
+    ])
+    url = f"http://127.0.0.1:{args.stub_port}"
+    for _ in range(50):
+        try:
+            if requests.get(f"{url}/health", timeout=1).ok:
+                return process, url
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError("Stub server did not start")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Translation throughput benchmark against the local LLM stub")
+    parser.add_argument("--mode", choices=["direct", "broker"], default="broker")
+    parser.add_argument("--videos", type=int, default=4, help="Số video (job) chạy đồng thời")
+    parser.add_argument("--cues", type=int, default=200, help="Số cue mỗi video")
+    parser.add_argument("--batch-size", type=int, default=20)
+    parser.add_argument("--broker-wait-ms", type=float, default=200)
+    parser.add_argument("--broker-max-lines", type=int, default=40)
+    parser.add_argument("--broker-max-calls", type=int, default=4)
+    parser.add_argument("--broker-memory", action="store_true",
+                        help="Bật bộ nhớ dịch của broker (memory hit được in riêng, không tính là gộp batch)")
+    parser.add_argument("--stub-url", default="http://127.0.0.1:8765")
+    parser.add_argument("--spawn-stub", action="store_true", help="Tự khởi động llm_stub_server.py")
+    parser.add_argument("--stub-port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=500)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--malformed-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    stub_process = None
+    stub_url = args.stub_url
+    if args.spawn_stub:
+        stub_process, stub_url = spawn_stub(args)
+
+    try:
+        backend = TimedBackend(StubBackend(stub_url))
+        set_translation_backend(backend)
+        videos = [make_video_lines(i, args.cues) for i in range(args.videos)]
+        total_lines = args.videos * args.cues
+
+        broker_stats = None
+        started = time.perf_counter()
+        if args.mode == "direct":
+            video_latencies = run_direct(videos, args.batch_size)
+        else:
+            video_latencies, broker_stats = asyncio.run(run_broker(
+                videos, args.batch_size, args.broker_wait_ms, args.broker_max_lines, args.broker_max_calls,
+                use_memory=args.broker_memory
+            ))
+        elapsed = time.perf_counter() - started
+
+        calls = len(backend.latencies)
+        print(f"mode={args.mode} videos={args.videos} cues/video={args.cues}")
+        print(f"wall time        : {elapsed:.2f}s")
+        print(f"throughput       : {total_lines / elapsed:.1f} lines/s")
+        print(f"LLM calls        : {calls} ({calls / args.videos:.1f} per video, {backend.failures} failed)")
+        if broker_stats is not None:
+            memory_hits = broker_stats["memory_hits"]
+            print(f"memory hits      : {memory_hits} lines ({memory_hits / total_lines:.1%}, "
+                  f"memory {'on' if args.broker_memory else 'off'})")
+        print(f"call latency     : p50={percentile(backend.latencies, 50):.3f}s "
+              f"p95={percentile(backend.latencies, 95):.3f}s p99={percentile(backend.latencies, 99):.3f}s")
+        print(f"video latency    : mean={statistics.mean(video_latencies):.2f}s "
+              f"p95={percentile(video_latencies, 95):.2f}s max={max(video_latencies):.2f}s")
+    finally:
+        if stub_process is not None:
+            stub_process.terminate()
+            stub_process.wait()
+
+
+if __name__ == "__main__":
+    main()
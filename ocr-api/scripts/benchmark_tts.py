@@ -0,0 +1,120 @@
+"""
+Benchmark tầng TTS (generate_audio_from_srt) với engine TTS offline, không cần mạng.
+
+Ví dụ:
+    python scripts/benchmark_tts.py --cues 300 --latency-ms 400 --jitter-ms 150
+    TTS_CONCURRENCY=16 python scripts/benchmark_tts.py --cues 300 --latency-ms 400 --engine tone
+
+In ra cues/s, độ trễ p50/p95/p99 mỗi request tổng hợp (một cue hoặc một batch) và tỉ lệ cache hit
+để so sánh các thay đổi offline.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class Timer:
+    def __init__(self):
+        self.latencies = []
+        self._lock = threading.Lock()
+
+    def record(self, started):
+        with self._lock:
+            self.latencies.append(time.perf_counter() - started)
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def format_srt_time(ms):
+    hours, ms = divmod(ms, 3600000)
+    minutes, ms = divmod(ms, 60000)
+    seconds, ms = divmod(ms, 1000)
+    return f"{hours:02d}:{minutes:02d}:{seconds:02d},{ms:03d}"
+
+
+def write_synthetic_srt(path, cues, cue_ms, gap_ms):
+    # Câu lặp lại một phần để cache hit giống phụ đề thật
+    with open(path, "w", encoding="utf-8") as srt_file:
+        for i in range(cues):
+            start = i * (cue_ms + gap_ms)
+            text = f"Câu thoại chung số {i % 20}" if i % 4 == 0 else f"Đây là câu phụ đề thứ {i} của video"
+            srt_file.write(f"{i + 1}\n{format_srt_time(start)} --> {format_srt_time(start + cue_ms)}\n{text}\n\n")
+    return cues * (cue_ms + gap_ms) / 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="TTS throughput benchmark against the local TTS engine")
+    parser.add_argument("--cues", type=int, default=200)
+    parser.add_argument("--cue-ms", type=int, default=2500)
+    parser.add_argument("--gap-ms", type=int, default=300)
+    parser.add_argument("--latency-ms", type=float, default=300)
+    parser.add_argument("--jitter-ms", type=float, default=100)
+    parser.add_argument("--engine", choices=["auto", "espeak", "tone"], default="tone")
+    parser.add_argument("--keep-cache", action="store_true", help="Dùng TTS cache hiện có thay vì thư mục cache rỗng")
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix="tts_bench_")
+    if not args.keep_cache:
+        os.environ["TTS_CACHE_DIR"] = os.path.join(work_dir, "cache")
+        os.environ.pop("TTS_CACHE_S3_BUCKET", None)
+
+    # Import sau khi đặt biến môi trường cache
+    from app.modules.module.module_tts_backend import LocalTTSBackend, TTSBackend, set_tts_backend
+    from app.modules.module.module_tts_cache import get_tts_cache
+    from app.modules.module.module_text_to_speech_v2 import generate_audio_from_srt
+
+    timer = Timer()
+    inner = LocalTTSBackend(args.latency_ms, args.jitter_ms, args.engine, seed=0)
+
+    class TimedTTSBackend(TTSBackend):
+        name = "timed"
+
+        @property
+        def version(self):
+            return inner.version
+
+        async def synthesize(self, text, voice, rate):
+            started = time.perf_counter()
+            try:
+                return await inner.synthesize(text, voice, rate)
+            finally:
+                timer.record(started)
+
+        async def synthesize_batch(self, texts, voice, rate):
+            started = time.perf_counter()
+            try:
+                return await inner.synthesize_batch(texts, voice, rate)
+            finally:
+                timer.record(started)
+
+    set_tts_backend(TimedTTSBackend())
+    srt_path = os.path.join(work_dir, "bench.srt")
+    duration_s = write_synthetic_srt(srt_path, args.cues, args.cue_ms, args.gap_ms)
+
+    started = time.perf_counter()
+    output = generate_audio_from_srt(srt_path, work_dir, "1", duration_s)
+    elapsed = time.perf_counter() - started
+
+    stats = get_tts_cache().stats
+    print(f"engine={inner.version} cues={args.cues} latency={args.latency_ms}±{args.jitter_ms}ms")
+    print(f"output           : {output}")
+    print(f"wall time        : {elapsed:.2f}s")
+    print(f"throughput       : {args.cues / elapsed:.1f} cues/s")
+    print(f"synth requests   : {len(timer.latencies)} (cache hits={stats['hits'] + stats['s3_hits']}, misses={stats['misses']})")
+    print(f"synth latency    : p50={percentile(timer.latencies, 50):.3f}s "
+          f"p95={percentile(timer.latencies, 95):.3f}s p99={percentile(timer.latencies, 99):.3f}s")
+
+
+if __name__ == "__main__":
+    main()
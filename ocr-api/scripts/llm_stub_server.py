@@ -0,0 +1,112 @@
+"""
+Server LLM giả lập để benchmark / load-test tầng dịch mà không cần gọi Gemini thật.
+
+Trả về "bản dịch" xác định (deterministic) cho từng dòng đánh số trong prompt, có thể cấu hình
+độ trễ, tỉ lệ lỗi 500, tỉ lệ 429 và tỉ lệ output sai định dạng.
+
+Chạy:
+    python scripts/llm_stub_server.py --port 8765 --latency-ms 800 --rate-limit-rate 0.05
+Sau đó đặt TRANSLATION_BACKEND=stub TRANSLATION_STUB_URL=http://127.0.0.1:8765
+"""
+import argparse
+import asyncio
+import random
+import re
+
+import uvicorn
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+# Tag có dấu tiếng Việt để kết quả "vi" vượt qua is_valid_vietnamese
+TARGET_TAGS = {"vi": "[dịch]"}
+
+
+class GenerateRequest(BaseModel):
+    prompt: str
+    target_lang: str = "vi"
+
+
+def translate_prompt(prompt, target_lang):
+    """Dịch giả: giữ số thứ tự và gắn tag ngôn ngữ đích vào từng dòng."""
+    tag = TARGET_TAGS.get(target_lang, f"[{target_lang}]")
+    lines = []
+    for line in prompt.split("\n"):
+        match = re.match(r"(\d+)\.\s*(.*)", line)
+        if match:
+            lines.append(f"{match.group(1)}. {tag} {match.group(2)}")
+    return "\n".join(lines)
+
+
+def malform(text, rng):
+    """Output sai định dạng: mất số thứ tự, thiếu dòng hoặc thêm lời giải thích."""
+    lines = text.split("\n")
+    choice = rng.choice(["unnumbered", "truncated", "chatty"])
+    if choice == "unnumbered":
+        return "\n".join(re.sub(r"^\d+\.\s*", "", line) for line in lines)
+    if choice == "truncated":
+        return "\n".join(lines[:max(1, len(lines) // 2)])
+    return "Đây là bản dịch của bạn:\n" + text + "\nHy vọng hữu ích!"
+
+
+def create_stub_app(latency_ms=500, jitter_ms=100, error_rate=0.0, rate_limit_rate=0.0, malformed_rate=0.0, seed=0):
+    app = FastAPI(title="LLM stub")
+    rng = random.Random(seed)
+    stats = {"requests": 0, "errors": 0, "rate_limited": 0, "malformed": 0}
+
+    @app.post("/generate")
+    async def generate(request: GenerateRequest):
+        stats["requests"] += 1
+        delay = max(0.0, latency_ms + rng.uniform(-jitter_ms, jitter_ms)) / 1000
+        await asyncio.sleep(delay)
+
+        roll = rng.random()
+        if roll < rate_limit_rate:
+            stats["rate_limited"] += 1
+            return JSONResponse(status_code=429, content={"error": "Resource has been exhausted"})
+        if roll < rate_limit_rate + error_rate:
+            stats["errors"] += 1
+            return JSONResponse(status_code=500, content={"error": "Internal error"})
+
+        text = translate_prompt(request.prompt, request.target_lang)
+        if rng.random() < malformed_rate:
+            stats["malformed"] += 1
+            text = malform(text, rng)
+        return {"text": text}
+
+    @app.get("/stats")
+    async def get_stats():
+        return stats
+
+    @app.get("/health")
+    async def health():
+        return {"status": "healthy"}
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stub LLM server for translation benchmarks")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=500)
+    parser.add_argument("--jitter-ms", type=float, default=100)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--malformed-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    app = create_stub_app(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        malformed_rate=args.malformed_rate,
+        seed=args.seed,
+    )
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,12 @@
+from app.modules.module.module_soft_subtitles import soft_subtitles_command
+
+
+def test_non_mp4_upload_is_muxed_into_mp4():
+    tracks = [("vi.srt", "vi", "vi"), ("original.srt", "und", "original")]
+    command = soft_subtitles_command("source_clip.mkv", tracks, "clip.mkv")
+
+    assert command[command.index("-c:s") + 1] == "mov_text"
+    # mov_text chỉ có trong MP4/MOV: container phải được ép là MP4 dù đuôi file là .mkv
+    assert command[-3:] == ["-f", "mp4", "clip.mkv"]
+    assert command.count("-i") == 3
+    assert "language=vie" in command
@@ -0,0 +1,80 @@
+import asyncio
+
+from app.modules.module import module_text_to_speech_v2 as tts
+
+
+class FakeCache:
+    def __init__(self):
+        self.entries = {}
+        self.misses = 0
+
+    def get_samples(self, key):
+        if key not in self.entries:
+            self.misses += 1
+            return None
+        return self.entries[key]
+
+    def put_samples(self, key, samples):
+        self.entries[key] = samples
+
+
+class FakeBackend:
+    version = "fake-1"
+
+    async def synthesize(self, text, voice, rate):
+        return [len(text)]
+
+    async def synthesize_batch(self, texts, voice, rate):
+        return [[len(text)] for text in texts]
+
+
+def make_cues(texts):
+    cues = []
+    for index, text in enumerate(texts):
+        # Độ dài cue khác nhau để các cue rơi vào nhiều rate khác nhau
+        cues.append((index, index * 3000, 1500 + (index % 4) * 500, text))
+    return cues
+
+
+def synthesize_track(cues):
+    async def run():
+        for group, group_voice, rate in tts.group_cues_for_batch(cues, "vi-VN-HoaiMyNeural", batch_size=20):
+            if rate is None:
+                await tts.text_to_speech(group[0][3], group[0][2], group_voice)
+            else:
+                await tts.text_to_speech_batch([text for _, _, _, text in group], group_voice, rate)
+
+    asyncio.run(run())
+
+
+def test_editing_one_cue_misses_only_that_cue(monkeypatch):
+    cache = FakeCache()
+    monkeypatch.setattr(tts, "get_tts_cache", lambda: cache)
+    monkeypatch.setattr(tts, "get_tts_backend", lambda: FakeBackend())
+
+    texts = [f"Câu phụ đề số {index} trong video" for index in range(60)]
+    synthesize_track(make_cues(texts))
+    assert cache.misses == len(texts)
+
+    cache.misses = 0
+    texts[17] = "Câu phụ đề đã được sửa lại"
+    synthesize_track(make_cues(texts))
+    assert cache.misses == 1
+
+
+def test_inserting_a_cue_misses_only_that_cue(monkeypatch):
+    cache = FakeCache()
+    monkeypatch.setattr(tts, "get_tts_cache", lambda: cache)
+    monkeypatch.setattr(tts, "get_tts_backend", lambda: FakeBackend())
+
+    texts = [f"Câu phụ đề số {index} trong video" for index in range(60)]
+    cues = make_cues(texts)
+    synthesize_track(cues)
+
+    cache.misses = 0
+    # Chèn cue mới ở giữa: các cue sau đổi index nhưng giữ nguyên text và độ dài
+    inserted = cues[:10] + [(10, 29000, 1000, "Câu mới chèn vào")] + [
+        (index + 1, start_ms, duration, text) for index, start_ms, duration, text in cues[10:]
+    ]
+    synthesize_track(inserted)
+    assert cache.misses == 1